@@ -0,0 +1,393 @@
+# This script checks that a rewritten feature stage returns the same features as the implementation it replaces.
+# The stage is run from a legacy git revision and from a candidate (a revision or the working tree) on the same
+# inputs, built from recorded pickles or synthetic seasons, and every column of the outputs is compared. Each side
+# runs in its own interpreter with its own copy of nhl_mlmodel first on the path, so the import of this module
+# must only need the modules every revision has.
+#
+# usage: python -m benchmarks.equivalence [--legacy REV] [--candidate REV] [--stages add_pdo get_diff_df_teams ...]
+#                                         [--data-dir data | --seasons 3] [--repeat 1] [--rtol 1e-6] [--atol 1e-9]
+
+import argparse
+import contextlib
+import io
+import json
+from nhl_mlmodel.power_rankings import power_rankings
+from nhl_mlmodel.process_data import process_data
+import numpy as np
+import os
+import pandas as pd
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+import warnings
+
+# stages that can be compared and the columns identifying a row of their output
+STAGE_KEYS = {'add_pdo': ['game_id', 'team'],
+              'add_rolling': ['game_id', 'team'],
+              'get_diff_df_teams': ['game_id'],
+              'get_diff_df_goalies': ['game_id'],
+              'ratings': ['game_id']}
+
+# period of the add_rolling stage, the longest rolling window of get_diff_df
+ROLLING_PERIOD = 82
+
+# root of the working tree, used as the candidate when no candidate revision is given
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def prepare_inputs(team_stats: list, goalie_stats: list, games_info: list) -> Dict[str, pd.DataFrame]:
+    """
+    creates the input of every stage the way build_dataframes does. the inputs are built once with the working
+    tree and pickled so both implementations get exactly the same dataframes
+    ...
+
+    Parameters
+    ----------
+    team_stats: list
+        NhlTeam of every game
+    goalie_stats: list
+        NhlGoalie of every game
+    games_info: list
+        NhlGame of every game
+
+    Returns
+    -------
+    inputs: Dict[str, pd.DataFrame]
+        numerical team and goalie stats before add_pdo, team and goalie stats ready for get_diff_df and
+        the games dataframe
+    """
+    teams_df, goalies_df = process_data.convert_numerical(process_data.make_teams_df(team_stats),
+                                                          process_data.make_goalies_df(goalie_stats))
+    inputs = {'teams_numerical': teams_df.copy(), 'goalies_numerical': goalies_df.copy()}
+
+    teams_df = process_data.add_sh_per(process_data.add_pdo(teams_df, goalies_df))
+    teams_df, goalies_df, games_df = process_data.clean_frames(teams_df, goalies_df,
+                                                               process_data.make_games_df(games_info))
+
+    inputs.update(teams=teams_df, goalies=goalies_df, games=games_df)
+    return inputs
+
+def run_stage(name: str, inputs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    runs one stage with the nhl_mlmodel that was imported. only functions that exist in every revision are
+    called so that legacy revisions can run the same stages
+    ...
+
+    Parameters
+    ----------
+    name: str
+        stage name, one of STAGE_KEYS
+    inputs: Dict[str, pd.DataFrame]
+        inputs returned by prepare_inputs. the stages may modify them
+
+    Returns
+    -------
+    output: pd.DataFrame
+        output of the stage
+    """
+    if name == 'add_pdo':
+        return process_data.add_pdo(inputs['teams_numerical'], inputs['goalies_numerical'])
+    if name == 'add_rolling':
+        df = inputs['teams'].sort_values(by='date', kind='mergesort').reset_index(drop=True)
+        stat_columns = [c for c in df.columns if 'int' in str(df[c].dtype) or 'float' in str(df[c].dtype)]
+        return process_data.add_rolling(ROLLING_PERIOD, df, stat_columns)
+    if name == 'get_diff_df_teams':
+        return process_data.get_diff_df(inputs['teams'], 'teams')
+    if name == 'get_diff_df_goalies':
+        return process_data.get_diff_df(inputs['goalies'], 'goalies', is_goalie=True)
+    if name == 'ratings':
+        df = inputs['games']
+        for rating_system in [power_rankings.fast_elo_ratings, power_rankings.slow_elo_ratings,
+                              power_rankings.glicko, power_rankings.trueskill]:
+            df = rating_system(df)
+        return df
+
+    raise ValueError(f'unknown stage {name}')
+
+def run_stage_file(name: str, inputs_path: str, output_path: str, repeat: int):
+    '''runs a stage on pickled inputs and pickles the output with the fastest run time, or the error'''
+    with open(inputs_path, 'rb') as f:
+        inputs = pickle.load(f)
+
+    result = {'seconds': None, 'output': None, 'error': None}
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            for _ in range(repeat):
+                stage_inputs = {k: v.copy() for k, v in inputs.items()}
+                start = time.perf_counter()
+                output = run_stage(name, stage_inputs)
+                seconds = time.perf_counter() - start
+                if result['seconds'] is None or seconds < result['seconds']:
+                    result['seconds'] = seconds
+        result['output'] = output
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+
+    with open(output_path, 'wb') as f:
+        pickle.dump(result, f)
+
+def checkout(revision: str, directory: str) -> str:
+    """
+    extracts nhl_mlmodel at a git revision
+    ...
+
+    Parameters
+    ----------
+    revision: str
+        git revision (ex. HEAD, 42e9aa4)
+    directory: str
+        directory the package is extracted to
+
+    Returns
+    -------
+    source_dir: str
+        directory to put first on the path to import that revision
+    """
+    os.makedirs(directory, exist_ok=True)
+    archive = subprocess.run(['git', 'archive', revision, 'nhl_mlmodel'], cwd=REPO_DIR, capture_output=True,
+                             check=True).stdout
+    subprocess.run(['tar', '-x', '-C', directory], input=archive, check=True)
+    return directory
+
+def run_source(name: str, source_dir: str, inputs_path: str, output_path: str, repeat: int) -> dict:
+    '''runs a stage in a new interpreter that imports nhl_mlmodel from source_dir'''
+    code = (f'import sys; sys.path[:0] = [{source_dir!r}, {REPO_DIR!r}]; '
+            f'from benchmarks import equivalence; '
+            f'equivalence.run_stage_file({name!r}, {inputs_path!r}, {output_path!r}, {repeat})')
+    subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(inputs_path), check=True)
+
+    with open(output_path, 'rb') as f:
+        return pickle.load(f)
+
+def align(legacy: pd.DataFrame, candidate: pd.DataFrame, keys: List[str]) -> (pd.DataFrame, pd.DataFrame, int,
+                                                                                int):
+    """
+    matches the rows of two outputs by their key columns. rows with the same key are matched in order
+    ...
+
+    Parameters
+    ----------
+    legacy: pd.DataFrame
+        legacy output
+    candidate: pd.DataFrame
+        candidate output
+    keys: List[str]
+        columns identifying a row. positions are used when a key is missing from an output
+
+    Returns
+    -------
+    legacy: pd.DataFrame
+        legacy rows that are in both outputs
+    candidate: pd.DataFrame
+        candidate rows in the same order
+    legacy_only: int
+        number of legacy rows without a candidate row
+    candidate_only: int
+        number of candidate rows without a legacy row
+    """
+    if not all(k in legacy.columns and k in candidate.columns for k in keys):
+        n = min(len(legacy), len(candidate))
+        return (legacy.iloc[:n].reset_index(drop=True), candidate.iloc[:n].reset_index(drop=True),
+                len(legacy) - n, len(candidate) - n)
+
+    def index(df):
+        df = df.sort_values(by=keys, kind='mergesort').reset_index(drop=True)
+        df['_occurrence'] = df.groupby(keys).cumcount()
+        return df.set_index(keys + ['_occurrence'])
+
+    legacy, candidate = index(legacy), index(candidate)
+    common = legacy.index.intersection(candidate.index)
+
+    return (legacy.loc[common].reset_index(), candidate.loc[common].reset_index(),
+            len(legacy) - len(common), len(candidate) - len(common))
+
+def compare_frames(legacy: pd.DataFrame, candidate: pd.DataFrame, keys: List[str]=None, rtol: float=1e-6,
+                   atol: float=1e-9) -> (pd.DataFrame, dict):
+    """
+    compares every column of two outputs. numeric columns are equal when every value is within
+    atol + rtol * |legacy value| and the NaNs are in the same rows, other columns must match exactly
+    ...
+
+    Parameters
+    ----------
+    legacy: pd.DataFrame
+        output of the legacy implementation
+    candidate: pd.DataFrame
+        output of the candidate implementation
+    keys: List[str]
+        columns identifying a row (ex. ['game_id']). None compares rows by position
+    rtol: float
+        relative tolerance
+    atol: float
+        absolute tolerance
+
+    Returns
+    -------
+    report: pd.DataFrame
+        one row per column with its status, max_abs_diff, max_rel_diff, nan_mismatches (values that are NaN in
+        only one output), mismatches (values out of tolerance) and the dtype in each output
+    rows: dict
+        number of rows of each output and of the rows only found in one of them
+    """
+    keys = keys or []
+    matched_legacy, matched_candidate, legacy_only, candidate_only = align(legacy, candidate, keys)
+    rows = {'legacy': len(legacy), 'candidate': len(candidate), 'legacy_only': legacy_only,
+            'candidate_only': candidate_only}
+
+    report = []
+    for column in list(legacy.columns) + [c for c in candidate.columns if c not in legacy.columns]:
+        entry = {'column': column, 'status': 'ok', 'max_abs_diff': np.nan, 'max_rel_diff': np.nan,
+                 'nan_mismatches': 0, 'mismatches': 0,
+                 'legacy_dtype': str(legacy[column].dtype) if column in legacy.columns else None,
+                 'candidate_dtype': str(candidate[column].dtype) if column in candidate.columns else None}
+
+        if column not in candidate.columns:
+            entry['status'] = 'missing'
+        elif column not in legacy.columns:
+            entry['status'] = 'extra'
+        else:
+            a, b = matched_legacy[column], matched_candidate[column]
+            a_nan, b_nan = a.isna().to_numpy(), b.isna().to_numpy()
+            entry['nan_mismatches'] = int((a_nan != b_nan).sum())
+            both = ~a_nan & ~b_nan
+
+            numeric = all(pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s) for s in (a, b))
+            if numeric:
+                x = a.to_numpy(dtype=np.float64)[both]
+                y = b.to_numpy(dtype=np.float64)[both]
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    diff = np.where(x == y, 0.0, np.abs(x - y))
+                    rel = np.where(diff == 0, 0.0, diff / np.abs(x))
+                if len(diff):
+                    entry['max_abs_diff'] = float(np.nanmax(diff)) if not np.isnan(diff).all() else np.inf
+                    entry['max_rel_diff'] = float(np.nanmax(rel)) if not np.isnan(rel).all() else np.inf
+                entry['mismatches'] = int((~(diff <= atol + rtol * np.abs(x))).sum())
+            else:
+                entry['mismatches'] = int((a.to_numpy()[both] != b.to_numpy()[both]).sum())
+
+            if entry['nan_mismatches'] or entry['mismatches']:
+                entry['status'] = 'differs'
+
+        report.append(entry)
+
+    return pd.DataFrame(report), rows
+
+def compare_stage(name: str, inputs_path: str, legacy_dir: str, candidate_dir: str, repeat: int, rtol: float,
+                  atol: float) -> dict:
+    """
+    runs a stage with both implementations and compares the outputs
+    ...
+
+    Parameters
+    ----------
+    name: str
+        stage name
+    inputs_path: str
+        pickled inputs returned by prepare_inputs
+    legacy_dir: str
+        directory nhl_mlmodel is imported from for the legacy run
+    candidate_dir: str
+        directory nhl_mlmodel is imported from for the candidate run
+    repeat: int
+        runs per implementation, the fastest is kept
+    rtol: float
+        relative tolerance
+    atol: float
+        absolute tolerance
+
+    Returns
+    -------
+    result: dict
+        stage, times, speedup, equivalent, rows and the column report, or the error of a failed run
+    """
+    tmp = os.path.dirname(inputs_path)
+    legacy = run_source(name, legacy_dir, inputs_path, os.path.join(tmp, f'{name}_legacy.pkl'), repeat)
+    candidate = run_source(name, candidate_dir, inputs_path, os.path.join(tmp, f'{name}_candidate.pkl'), repeat)
+
+    result = {'stage': name, 'legacy_s': legacy['seconds'], 'candidate_s': candidate['seconds']}
+    if legacy['error'] or candidate['error']:
+        result.update(equivalent=False, error=legacy['error'] or candidate['error'],
+                      failed='legacy' if legacy['error'] else 'candidate')
+        return result
+
+    report, rows = compare_frames(legacy['output'], candidate['output'], STAGE_KEYS[name], rtol, atol)
+    result.update(speedup=legacy['seconds'] / max(candidate['seconds'], 1e-9), rows=rows,
+                  equivalent=bool((report.status == 'ok').all() and rows['legacy_only'] == 0 and
+                                  rows['candidate_only'] == 0),
+                  report=report)
+    return result
+
+def print_result(result: dict, verbose: bool):
+    '''prints the timing of a stage and the columns that differ'''
+    if 'error' in result:
+        print(f'{result["stage"]:22s}{result["failed"]} failed: {result["error"]}')
+        return
+
+    report = result['report']
+    rows = result['rows']
+    print(f'{result["stage"]:22s}legacy {result["legacy_s"]:8.2f} s  candidate {result["candidate_s"]:8.2f} s  '
+          f'{result["speedup"]:6.2f}x  {"EQUIVALENT" if result["equivalent"] else "DIFFERS"}')
+    print(f'{"":22s}rows {rows["legacy"]} legacy, {rows["candidate"]} candidate, {rows["legacy_only"]} only in '
+          f'legacy, {rows["candidate_only"]} only in candidate. {(report.status == "ok").sum()} of '
+          f'{len(report)} columns ok')
+
+    shown = report if verbose else report[report.status != 'ok']
+    if len(shown):
+        print(shown.to_string(index=False, max_rows=50))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='compare the features of a legacy and a candidate implementation')
+    parser.add_argument('--legacy', default='HEAD', help='git revision of the legacy implementation')
+    parser.add_argument('--candidate', help='git revision of the candidate implementation (default working tree)')
+    parser.add_argument('--stages', nargs='+', default=list(STAGE_KEYS), choices=list(STAGE_KEYS),
+                        help='stages to compare')
+    parser.add_argument('--data-dir', default='data',
+                        help='directory with team_stats.pkl, goalie_stats.pkl and games_info.pkl')
+    parser.add_argument('--seasons', type=int, help='use this many synthetic seasons instead of the pickles')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per implementation, the fastest is kept')
+    parser.add_argument('--rtol', type=float, default=1e-6, help='relative tolerance')
+    parser.add_argument('--atol', type=float, default=1e-9, help='absolute tolerance')
+    parser.add_argument('--verbose', action='store_true', help='print every column, not only the ones that differ')
+    parser.add_argument('--json', action='store_true', help='print one json line per stage')
+    args = parser.parse_args()
+
+    if args.seasons is not None:
+        from benchmarks import synthetic
+        lists = synthetic.make_seasons(args.seasons)
+    else:
+        lists = []
+        for name in ['team_stats', 'goalie_stats', 'games_info']:
+            with open(os.path.join(args.data_dir, name + '.pkl'), 'rb') as f:
+                lists.append(pickle.load(f))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # the stages print progress and pandas warns about chained assignment, neither is useful here
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            inputs = prepare_inputs(*lists)
+        inputs_path = os.path.join(tmp, 'inputs.pkl')
+        with open(inputs_path, 'wb') as f:
+            pickle.dump(inputs, f)
+
+        legacy_dir = checkout(args.legacy, os.path.join(tmp, 'legacy'))
+        candidate_dir = REPO_DIR if args.candidate is None else checkout(args.candidate,
+                                                                         os.path.join(tmp, 'candidate'))
+
+        results = []
+        for stage in args.stages:
+            result = compare_stage(stage, inputs_path, legacy_dir, candidate_dir, args.repeat, args.rtol,
+                                   args.atol)
+            results.append(result)
+
+            if args.json:
+                summary = {k: v for k, v in result.items() if k != 'report'}
+                if 'report' in result:
+                    summary['differences'] = result['report'][result['report'].status != 'ok'].to_dict('records')
+                print(json.dumps(summary, default=str), flush=True)
+            else:
+                print_result(result, args.verbose)
+
+    sys.exit(0 if all(r['equivalent'] for r in results) else 1)
@@ -0,0 +1,121 @@
+# This script measures the cold start import time of each entry point of the package with python -X importtime
+# and lists the slowest imports of each, so that a heavy dependency added at module level shows up as a regression.
+#
+# usage: python -m benchmarks.import_time [--repeat 5] [--top 5] [--json]
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# modules run by the command line and by the scheduled jobs
+ENTRY_POINTS = ['nhl_mlmodel.runner',
+                'nhl_mlmodel.predict_games.predict_games',
+                'nhl_mlmodel.update_data.update_data',
+                'nhl_mlmodel.process_data.process_data',
+                'nhl_mlmodel.train_xgb.train_xgb',
+                'nhl_mlmodel.model_server.model_server',
+                'nhl_mlmodel.power_rankings.power_rankings',
+                'nhl_mlmodel.sb_evaluation.sb_evaluation',
+                'nhl_mlmodel.betting.betting']
+
+# a line of -X importtime output: "import time: self [us] | cumulative | imported package"
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+def import_report(code: str) -> Dict[str, int]:
+    """
+    runs code in a new interpreter and parses the -X importtime report
+    ...
+
+    Parameters
+    ----------
+    code: str
+        code to run (ex. 'import nhl_mlmodel.runner')
+
+    Returns
+    -------
+    cumulative: Dict[str, int]
+        cumulative import time of every imported module in microseconds
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, check=True)
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match is not None:
+            cumulative[match.group(4)] = int(match.group(2))
+
+    return cumulative
+
+def measure(module: str, repeat: int) -> Tuple[int, Dict[str, int]]:
+    """
+    imports a module in a new interpreter repeat times and keeps the fastest run, which has the least
+    noise from the os
+    ...
+
+    Parameters
+    ----------
+    module: str
+        module to import
+    repeat: int
+        number of imports
+
+    Returns
+    -------
+    total: int
+        cumulative import time of the module in microseconds
+    cumulative: Dict[str, int]
+        cumulative import time of every module it imported
+    """
+    runs = [import_report(f'import {module}') for _ in range(repeat)]
+    cumulative = min(runs, key=lambda r: r.get(module, 0))
+    return cumulative.get(module, 0), cumulative
+
+def slowest(module: str, cumulative: Dict[str, int], startup: set, top: int) -> List[Tuple[str, int]]:
+    """
+    returns the slowest top level packages imported by a module
+    ...
+
+    Parameters
+    ----------
+    module: str
+        module that was imported
+    cumulative: Dict[str, int]
+        import times returned by measure
+    startup: set
+        modules imported by the interpreter before the module, they are not listed
+    top: int
+        number of packages to return
+
+    Returns
+    -------
+    slowest: List[Tuple[str, int]]
+        (package, microseconds) sorted from slowest
+    """
+    packages = [(name, us) for name, us in cumulative.items()
+                if '.' not in name and name not in startup and name != module.split('.')[0]]
+    return sorted(packages, key=lambda p: p[1], reverse=True)[:top]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='measure the import time of the package entry points')
+    parser.add_argument('--repeat', type=int, default=5, help='imports per module, the fastest is reported')
+    parser.add_argument('--top', type=int, default=5, help='number of slowest imports listed per module')
+    parser.add_argument('--json', action='store_true', help='print one json line per module')
+    args = parser.parse_args()
+
+    # modules the interpreter imports on startup (site, encodings, ...) are the same for every entry point
+    startup = set(import_report('pass'))
+
+    for module in ENTRY_POINTS:
+        total, cumulative = measure(module, args.repeat)
+        heaviest = slowest(module, cumulative, startup, args.top)
+
+        if args.json:
+            print(json.dumps({'module': module, 'import_ms': total / 1000,
+                              'slowest': {name: us / 1000 for name, us in heaviest}}))
+        else:
+            print(f'{module:45s}{total / 1000:9.1f} ms   ' +
+                  ', '.join(f'{name} {us / 1000:.0f}' for name, us in heaviest))
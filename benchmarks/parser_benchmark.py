@@ -0,0 +1,134 @@
+# This script times the html parsing of recorded covers.com matchup pages and dailyfaceoff.com starting goalie
+# pages with the original full page BeautifulSoup parse and with each backend of the scrapers, and checks that
+# every backend returns the same result.
+#
+# usage: python -m benchmarks.parser_benchmark --covers-dir data/covers_cache --goalies-dir data/goalies_cache
+
+import argparse
+from bs4 import BeautifulSoup
+import datetime as dt
+import glob
+from nhl_mlmodel.covers_scraper import covers_scraper
+from nhl_mlmodel.nhl_scraper import nhl_scraper
+import os
+import time
+from typing import Callable, List
+
+def time_parser(parse: Callable, pages: List, repeat: int) -> (float, list):
+    """
+    times a parser over a list of pages
+    ...
+
+    Parameters
+    ----------
+    parse: Callable
+        function taking one page
+    pages: List
+        recorded pages
+    repeat: int
+        number of times every page is parsed
+
+    Returns
+    -------
+    ms_per_page: float
+        mean parse time per page in milliseconds
+    results: list
+        result of the last parse of each page
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = [parse(p) for p in pages]
+    elapsed = time.perf_counter() - start
+
+    return 1000 * elapsed / (repeat * len(pages)), results
+
+def legacy_matchups(page) -> list:
+    '''parses a matchups page the way nhl_games_date did before the parser backends'''
+    date, html = page
+    games = []
+    for g in BeautifulSoup(html, features='html.parser').find_all('div', {'class': 'cmg_matchup_game_box'}):
+        try:
+            h_score = g.find('div', {'class': 'cmg_matchup_list_score_home'}).get_text(strip=True)
+            a_score = g.find('div', {'class': 'cmg_matchup_list_score_away'}).get_text(strip=True)
+        except:
+            h_score = ''
+            a_score = ''
+        games.append((date.strftime('%Y-%m-%d'), g['data-event-id'], g['data-home-team-shortname-search'],
+                      g['data-away-team-shortname-search'], g['data-game-odd'], h_score, a_score))
+    return games
+
+def backend_matchups(backend: str) -> Callable:
+    '''returns a function parsing a matchups page with one backend of covers_scraper.parse_matchups'''
+    def parse(page):
+        date, html = page
+        return [tuple(vars(g).values()) for g in covers_scraper.parse_matchups(html, date, backend)]
+    return parse
+
+def goalie_teams(src) -> List[tuple]:
+    '''returns (home team, away team) for every game box of a starting goalies page'''
+    games = []
+    for box in BeautifulSoup(src, 'lxml').find_all('div', {'class': 'starting-goalies-card stat-card'}):
+        text = box.text
+        teams = sorted((text.find(t), t) for t in nhl_scraper.TEAM_NAMES.values() if t in text)
+        if len(teams) == 2:
+            games.append((teams[1][1], teams[0][1]))
+    return games
+
+def legacy_goalies(page) -> tuple:
+    '''parses a starting goalies page the way get_starting_goalies did before the parser backends'''
+    src, home_team, away_team = page
+    goalie_boxes = BeautifulSoup(src, 'lxml').find_all('div', {'class': 'starting-goalies-card stat-card'})
+    for count, box in enumerate(goalie_boxes):
+        if home_team and away_team in box.text:
+            goalie_box = goalie_boxes[count]
+    h4 = goalie_box.find_all('h4')
+    return h4[2].text, h4[1].text
+
+def backend_goalies(backend: str) -> Callable:
+    '''returns a function parsing a starting goalies page with one backend of parse_starting_goalies'''
+    def parse(page):
+        src, home_team, away_team = page
+        return nhl_scraper.parse_starting_goalies(src, home_team, away_team, backend)
+    return parse
+
+def run(name: str, pages: List, legacy: Callable, backends: Callable, repeat: int):
+    '''times the legacy parser and every backend on the pages and prints the results'''
+    legacy_ms, expected = time_parser(legacy, pages, repeat)
+    print(f'{name}: {len(pages)} pages')
+    print(f'  {"legacy":8s}{legacy_ms:9.2f} ms/page')
+
+    for backend in ['bs4', 'lxml']:
+        ms, results = time_parser(backends(backend), pages, repeat)
+        status = 'same output' if results == expected else 'OUTPUT DIFFERS'
+        print(f'  {backend:8s}{ms:9.2f} ms/page  {legacy_ms / ms:5.1f}x  {status}')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='benchmark the html parsers of the scrapers')
+    parser.add_argument('--covers-dir', default='data/covers_cache',
+                        help='directory of recorded covers.com matchup pages named YYYY-MM-DD.html')
+    parser.add_argument('--goalies-dir', default='data/goalies_cache',
+                        help='directory of recorded dailyfaceoff.com starting goalie pages')
+    parser.add_argument('--repeat', type=int, default=3, help='number of times every page is parsed')
+    args = parser.parse_args()
+
+    covers_paths = sorted(glob.glob(os.path.join(args.covers_dir, '*.html')))
+    if covers_paths:
+        pages = []
+        for path in covers_paths:
+            with open(path, encoding='utf-8') as f:
+                date = dt.datetime.strptime(os.path.basename(path)[:10], '%Y-%m-%d')
+                pages.append((date, f.read()))
+        run('covers matchups', pages, legacy_matchups, backend_matchups, args.repeat)
+    else:
+        print(f'no recorded pages in {args.covers_dir}')
+
+    goalies_paths = sorted(glob.glob(os.path.join(args.goalies_dir, '*.html')))
+    if goalies_paths:
+        pages = []
+        for path in goalies_paths:
+            with open(path, 'rb') as f:
+                src = f.read()
+            pages += [(src, home_team, away_team) for home_team, away_team in goalie_teams(src)]
+        run('starting goalies', pages, legacy_goalies, backend_goalies, args.repeat)
+    else:
+        print(f'no recorded pages in {args.goalies_dir}')
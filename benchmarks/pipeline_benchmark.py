@@ -0,0 +1,213 @@
+# This script times every stage of the pipeline on synthetic seasons at several scales and appends the results,
+# tagged with the git revision, to a json lines file so that performance changes can be compared across commits.
+# The feature stages are the ones recorded by build_dataframes, add_pdo is also timed on its own.
+#
+# usage: python -m benchmarks.pipeline_benchmark [--seasons 3 6 9] [--repeat 1] [--output benchmarks/results.jsonl]
+#                                                [--compare REVISION]
+
+import argparse
+import contextlib
+import datetime as dt
+import io
+import json
+from benchmarks import synthetic
+from nhl_mlmodel.instrument import instrument
+from nhl_mlmodel.model_server import model_server
+from nhl_mlmodel.process_data import process_data
+from nhl_mlmodel.train_xgb import helpers as xgb_helpers
+from nhl_mlmodel.walk_forward import walk_forward
+import numpy as np
+import os
+import pandas as pd
+import platform
+import subprocess
+import tempfile
+from typing import Dict, List
+import warnings
+
+# stages reported, in pipeline order
+STAGES = ['add_pdo', 'make_dataframes', 'rolling_teams', 'rolling_goalies', 'rest', 'ratings', 'win_percentage',
+          'features', 'train', 'predict']
+
+# the 82 game rolling stats of backup goalies need about two seasons of history, games without them are dropped
+MIN_SEASONS = 3
+
+# fixed parameters so that training time only depends on the data
+TRAIN_PARAMS = {'learning_rate': 0.05, 'max_depth': 5}
+
+def git_revision() -> str:
+    """
+    returns the short hash of the checked out commit, with -dirty appended when tracked files are modified
+    ...
+
+    Returns
+    -------
+    revision: str
+        short commit hash, or unknown outside of a git repository
+    """
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True,
+                                text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+    return revision + ('-dirty' if status.strip() else '')
+
+def time_add_pdo(team_stats, goalie_stats):
+    '''times add_pdo alone on the numerical team and goalie dataframes'''
+    teams_df, goalies_df = process_data.convert_numerical(process_data.make_teams_df(team_stats),
+                                                          process_data.make_goalies_df(goalie_stats))
+    with instrument.stage('add_pdo'):
+        process_data.add_pdo(teams_df, goalies_df)
+
+def time_model(games_df: pd.DataFrame):
+    '''times training a booster with fixed parameters and predicting every game with the model server'''
+    train_df, valid_df, _ = walk_forward.chronological_split(games_df, valid_size=len(games_df) // 5, test_size=0)
+    features = walk_forward.feature_columns(games_df)
+
+    with instrument.stage('train', games=len(train_df)):
+        dtrain, dvalid = xgb_helpers.build_dmatrices(train_df[features], train_df.home_team_win,
+                                                     valid_df[features], valid_df.home_team_win)
+        booster = xgb_helpers.train_booster(TRAIN_PARAMS, dtrain, dvalid)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, 'model.ubj')
+        model_server.export_booster(booster, model_path)
+        server = model_server.ModelServer(model_path)
+        with instrument.stage('predict', games=len(games_df)):
+            server.predict(games_df)
+
+def run_pipeline(lists: tuple, n_workers: int) -> Dict[str, dict]:
+    """
+    runs the feature stages, training and prediction once on the scraped style lists
+    ...
+
+    Parameters
+    ----------
+    lists: tuple
+        team stats, goalie stats and game information lists
+    n_workers: int
+        number of processes used to create the rolling stats
+
+    Returns
+    -------
+    stages: Dict[str, dict]
+        instrument record of every stage by stage name
+    """
+    first = len(instrument.records())
+
+    # the stages print progress and pandas warns about chained assignment, neither is useful here
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        time_add_pdo(lists[0], lists[1])
+        with instrument.stage('features') as record:
+            _, _, games_df = process_data.build_dataframes(*lists, n_workers=n_workers)
+            record['rows'] = len(games_df)
+        time_model(games_df)
+
+    return {r['stage'].split('/')[-1]: r for r in instrument.records()[first:]}
+
+def benchmark(seasons: int, repeat: int, n_workers: int, seed: int=0) -> List[dict]:
+    """
+    times the pipeline on synthetic seasons and keeps the fastest run of every stage
+    ...
+
+    Parameters
+    ----------
+    seasons: int
+        number of synthetic seasons
+    repeat: int
+        number of runs
+    n_workers: int
+        number of processes used to create the rolling stats
+    seed: int
+        seed of the synthetic seasons
+
+    Returns
+    -------
+    results: List[dict]
+        one result per stage
+    """
+    if seasons < MIN_SEASONS:
+        raise ValueError(f'at least {MIN_SEASONS} seasons are needed to have games with every rolling feature')
+
+    lists = synthetic.make_seasons(seasons, seed=seed)
+    runs = [run_pipeline(lists, n_workers) for _ in range(repeat)]
+
+    results = []
+    for name in STAGES:
+        fastest = min((run[name] for run in runs), key=lambda r: r['wall_s'])
+        results.append({'seasons': seasons, 'games': len(lists[2]), 'rows': runs[0]['features']['rows'],
+                        'stage': name, 'wall_s': fastest['wall_s'], 'cpu_s': fastest['cpu_s']})
+    return results
+
+def environment() -> dict:
+    '''returns the revision, date and library versions saved with every result'''
+    import xgboost
+    return {'revision': git_revision(), 'date': dt.datetime.now().isoformat(timespec='seconds'),
+            'host': platform.node(), 'python': platform.python_version(), 'numpy': np.__version__,
+            'pandas': pd.__version__, 'xgboost': xgboost.__version__}
+
+def load_results(path: str) -> List[dict]:
+    '''reads the results appended to a json lines file'''
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def compare(results: List[dict], history: List[dict], baseline: str):
+    """
+    prints the speedup of every stage against the latest results of a baseline revision
+    ...
+
+    Parameters
+    ----------
+    results: List[dict]
+        results of this run
+    history: List[dict]
+        results read from the output file
+    baseline: str
+        revision to compare against (ex. 42e9aa4)
+    """
+    reference = {(r['seasons'], r['stage']): r['wall_s'] for r in history if r['revision'] == baseline}
+    if not reference:
+        print(f'no results for revision {baseline}')
+        return
+
+    print(f'\nspeedup against {baseline}')
+    for r in results:
+        before = reference.get((r['seasons'], r['stage']))
+        if before is not None:
+            print(f'{r["seasons"]:3d} seasons  {r["stage"]:16s}{before:9.2f} s ->{r["wall_s"]:9.2f} s'
+                  f'{before / max(r["wall_s"], 1e-9):7.2f}x')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='time the pipeline stages on synthetic seasons')
+    parser.add_argument('--seasons', type=int, nargs='+', default=[3, 6, 9], help='numbers of seasons to time')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per scale, the fastest run of each stage is kept')
+    parser.add_argument('--workers', type=int, default=1, help='number of processes used for the rolling stats')
+    parser.add_argument('--output', default='benchmarks/results.jsonl', help='json lines file results are added to')
+    parser.add_argument('--compare', help='revision in the output file to compare against')
+    args = parser.parse_args()
+
+    env = environment()
+    print(f'revision {env["revision"]}, python {env["python"]}, pandas {env["pandas"]}, '
+          f'xgboost {env["xgboost"]}')
+
+    results = []
+    for seasons in args.seasons:
+        scale = benchmark(seasons, args.repeat, args.workers)
+        print(f'\n{seasons} seasons, {scale[0]["games"]} games, {scale[0]["rows"]} with every feature')
+        for r in scale:
+            print(f'  {r["stage"]:16s}{r["wall_s"]:9.2f} s')
+        results += [dict(env, **r) for r in scale]
+
+    history = load_results(args.output)
+    with open(args.output, 'a') as f:
+        for r in results:
+            f.write(json.dumps(r) + '\n')
+
+    if args.compare:
+        compare(results, history, args.compare)
@@ -0,0 +1,323 @@
+# This module generates deterministic synthetic nhl seasons in the same form as the scrapers return them, so the
+# pipeline can be benchmarked and tested without the network. Teams have a strength that drifts between seasons
+# and every team keeps a starter, a backup and a third goalie who is called up when the starter is injured.
+#
+# usage: team_stats, goalie_stats, games_info = synthetic.make_seasons(4, seed=0)
+
+import datetime as dt
+from nhl_mlmodel.nhl_scraper import nhl_scraper
+import numpy as np
+from typing import Dict, List, Tuple
+
+# 31 teams of the scraper and seattle as the 32nd
+TEAMS = sorted(nhl_scraper.TEAM_NAMES) + ['SEA']
+
+# games per team per season
+SEASON_GAMES = 82
+
+# mean shots per team per game and league save percentage
+MEAN_SHOTS = 30
+MEAN_SAVE_PERCENTAGE = 0.91
+
+# share of starts of the starter when rested, and of the backup on the second night of a back to back
+STARTER_SHARE = 0.72
+BACK_TO_BACK_BACKUP_SHARE = 0.85
+
+# first goalie id, ids of new goalies increase from it
+FIRST_GOALIE_ID = 8470000
+
+def make_schedule(rng: np.random.Generator, teams: List[str], year: int) -> List[Tuple[dt.datetime, str, str]]:
+    """
+    creates the schedule of a season where every team plays SEASON_GAMES games, about half at home. the teams with
+    the fewest games played are scheduled first so no team falls behind, and back to backs happen when a rested
+    team is not available
+    ...
+
+    Parameters
+    ----------
+    rng: np.random.Generator
+        random generator
+    teams: List[str]
+        team abbreviations
+    year: int
+        first year of the season (ex. 2019 for 20192020)
+
+    Returns
+    -------
+    schedule: List[Tuple[dt.datetime, str, str]]
+        (date, home team, away team) sorted by date
+    """
+    played = dict.fromkeys(teams, 0)
+    home = dict.fromkeys(teams, 0)
+    yesterday = set()
+    games_per_day = len(teams) * SEASON_GAMES / 2 / 175
+    date = dt.datetime(year, 10, 7, 23, 0)
+    schedule = []
+
+    while sum(played[t] < SEASON_GAMES for t in teams) >= 2:
+        remaining = [t for t in teams if played[t] < SEASON_GAMES]
+        n_games = min(len(remaining) // 2, max(1, rng.poisson(games_per_day)))
+
+        # fewest games played first, teams that played yesterday count as two games ahead and ties are
+        # broken at random
+        priority = [played[t] + 2 * (t in yesterday) for t in remaining]
+        order = np.lexsort((rng.random(len(remaining)), priority))
+        today = [remaining[i] for i in rng.permutation(order[:2 * n_games])]
+        yesterday = set(today)
+
+        for a, b in zip(today[::2], today[1::2]):
+            # the team with fewer home games hosts so home and away games stay balanced
+            if home[a] > home[b] or (home[a] == home[b] and rng.random() < 0.5):
+                a, b = b, a
+            schedule.append((date, a, b))
+            home[a] += 1
+            played[a] += 1
+            played[b] += 1
+
+        date += dt.timedelta(days=1)
+
+    return schedule
+
+def new_goalie(rng: np.random.Generator, goalie_ids: List[int], quality: float=0.0) -> dict:
+    '''creates a goalie with a new id and a save percentage around the league mean shifted by quality'''
+    goalie_id = FIRST_GOALIE_ID + len(goalie_ids)
+    goalie_ids.append(goalie_id)
+    return {'goalie_id': goalie_id, 'goalie_name': f'Goalie {goalie_id}',
+            'save_percentage': MEAN_SAVE_PERCENTAGE + quality + rng.normal(0, 0.005),
+            'last_played': None}
+
+def pick_starter(rng: np.random.Generator, crease: List[dict], date: dt.datetime, injured: bool) -> Tuple[int, int]:
+    """
+    picks the starting goalie of a team. the starter plays most games, the backup plays the second night of
+    back to backs and the third goalie replaces the starter while he is injured
+    ...
+
+    Parameters
+    ----------
+    rng: np.random.Generator
+        random generator
+    crease: List[dict]
+        starter, backup and third goalie of the team
+    date: dt.datetime
+        date of the game
+    injured: bool
+        True if the starter is injured
+
+    Returns
+    -------
+    starter: int
+        position in crease of the starting goalie
+    reliever: int
+        position in crease of the goalie on the bench
+    """
+    first, second = (1, 2) if injured else (0, 1)
+    last_played = crease[first]['last_played']
+    back_to_back = last_played is not None and (date - last_played).days <= 1
+
+    if back_to_back:
+        starts = rng.random() >= BACK_TO_BACK_BACKUP_SHARE
+    else:
+        starts = rng.random() < STARTER_SHARE
+
+    return (first, second) if starts else (second, first)
+
+def split_shots(rng: np.random.Generator, shots: int, power_plays: int, penalty_kills: int) -> Dict[str, int]:
+    '''splits the shots of a team into even strength, power play and short handed shots'''
+    power_play = min(shots, rng.poisson(1.6 * power_plays))
+    short_handed = min(shots - power_play, rng.poisson(0.3 * penalty_kills))
+    return {'even': shots - power_play - short_handed, 'power_play': power_play, 'short_handed': short_handed}
+
+def goalie_line(date, game_id, team, is_home_team, goalie, minutes, faced, goals, decision) -> nhl_scraper.NhlGoalie:
+    '''creates the stats of one goalie from the shots and goals he faced by situation'''
+    shots = sum(faced.values())
+    saves = shots - sum(goals.values())
+    even_saves = faced['even'] - goals['even']
+
+    return nhl_scraper.NhlGoalie(
+        date=date, game_id=game_id, team=team, is_home_team=is_home_team, goalie_name=goalie['goalie_name'],
+        goalie_id=goalie['goalie_id'], timeOnIce=f'{minutes}:00', assists=0, goals=0, pim=0, shots=shots,
+        saves=saves, powerPlaySaves=faced['short_handed'] - goals['short_handed'],
+        shortHandedSaves=faced['power_play'] - goals['power_play'], evenSaves=even_saves,
+        shortHandedShotsAgainst=faced['power_play'], evenShotsAgainst=faced['even'],
+        powerPlayShotsAgainst=faced['short_handed'], decision=decision,
+        savePercentage=100 * saves / shots if shots else 0.0,
+        evenStrengthSavePercentage=100 * even_saves / faced['even'] if faced['even'] else 0.0)
+
+def play_game(rng: np.random.Generator, date: dt.datetime, game_id: int, home_team: str, away_team: str,
+              strength: Dict[str, float], creases: Dict[str, List[dict]], injured: Dict[str, bool]) \
+        -> Tuple[List[nhl_scraper.NhlTeam], List[nhl_scraper.NhlGoalie], nhl_scraper.NhlGame]:
+    """
+    simulates one game. shots depend on the strength of the teams, goals on the save percentage of the goalies,
+    ties are decided by one overtime goal and a starter who allows many goals is sometimes pulled
+    ...
+
+    Parameters
+    ----------
+    rng: np.random.Generator
+        random generator
+    date: dt.datetime
+        date of the game
+    game_id: int
+        statsapi style game id
+    home_team: str
+        home team abbreviation
+    away_team: str
+        away team abbreviation
+    strength: Dict[str, float]
+        strength of every team this season
+    creases: Dict[str, List[dict]]
+        goalies of every team
+    injured: Dict[str, bool]
+        True for the teams whose starter is injured
+
+    Returns
+    -------
+    team_stats: List[nhl_scraper.NhlTeam]
+        home and away team stats
+    goalie_stats: List[nhl_scraper.NhlGoalie]
+        stats of every goalie who played
+    game: nhl_scraper.NhlGame
+        game information
+    """
+    teams = [home_team, away_team]
+    edge = strength[home_team] - strength[away_team] + 0.05
+    shots = [max(15, rng.poisson(MEAN_SHOTS * np.exp(0.1 * edge))),
+             max(15, rng.poisson(MEAN_SHOTS * np.exp(-0.1 * edge)))]
+    power_plays = [rng.poisson(3.0), rng.poisson(3.0)]
+    starters = [pick_starter(rng, creases[t], date, injured[t]) for t in teams]
+
+    # shots and goals of each team by situation, goals are allowed by the goalie of the other team
+    faced = [split_shots(rng, shots[i], power_plays[i], power_plays[1 - i]) for i in range(2)]
+    goals = []
+    for i in range(2):
+        save_percentage = creases[teams[1 - i]][starters[1 - i][0]]['save_percentage']
+        goals.append({k: rng.binomial(n, 1 - save_percentage + (0.05 if k == 'power_play' else 0))
+                      for k, n in faced[i].items()})
+
+    # overtime is decided by one even strength goal
+    totals = [sum(g.values()) for g in goals]
+    if totals[0] == totals[1]:
+        winner = 0 if rng.random() < 0.5 + edge / 4 else 1
+        faced[winner]['even'] += 1
+        goals[winner]['even'] += 1
+        shots[winner] += 1
+        totals[winner] += 1
+    home_team_win = totals[0] > totals[1]
+
+    team_stats = []
+    goalie_stats = []
+    faceoffs = round(rng.normal(50, 5), 1)
+    for i, team in enumerate(teams):
+        crease = creases[team]
+        starter, reliever = starters[i]
+        against = 1 - i
+        won = home_team_win if i == 0 else not home_team_win
+        decision = 'W' if won else 'L'
+
+        # a starter who allows five or more goals is pulled a third of the time
+        if totals[against] >= 5 and rng.random() < 0.33:
+            share = rng.uniform(0.35, 0.75)
+            minutes = int(60 * share)
+            starter_faced = {k: int(round(n * share)) for k, n in faced[against].items()}
+            starter_goals = {k: int(rng.hypergeometric(goals[against][k], n - goals[against][k], starter_faced[k]))
+                             for k, n in faced[against].items()}
+            relief_faced = {k: faced[against][k] - n for k, n in starter_faced.items()}
+            relief_goals = {k: goals[against][k] - n for k, n in starter_goals.items()}
+            goalie_stats.append(goalie_line(date, game_id, team, i == 0, crease[starter], minutes, starter_faced,
+                                            starter_goals, decision))
+            goalie_stats.append(goalie_line(date, game_id, team, i == 0, crease[reliever], 60 - minutes,
+                                            relief_faced, relief_goals, ''))
+            crease[reliever]['last_played'] = date
+        else:
+            goalie_stats.append(goalie_line(date, game_id, team, i == 0, crease[starter], 60, faced[against],
+                                            goals[against], decision))
+        crease[starter]['last_played'] = date
+
+        power_play_goals = goals[i]['power_play']
+        power_play_percentage = 100 * power_play_goals / power_plays[i] if power_plays[i] else 0.0
+        team_stats.append(nhl_scraper.NhlTeam(
+            date=date, game_id=game_id, team=team, is_home_team=i == 0, home_team_win=home_team_win,
+            goals=totals[i], pim=2 * power_plays[against] + 2 * rng.poisson(0.5), shots=shots[i],
+            powerPlayPercentage=f'{power_play_percentage:.1f}', powerPlayGoals=float(power_play_goals),
+            powerPlayOpportunities=float(power_plays[i]),
+            faceOffWinPercentage=f'{faceoffs if i == 0 else 100 - faceoffs:.1f}', blocked=rng.poisson(14),
+            takeaways=rng.poisson(7), giveaways=rng.poisson(9), hits=rng.poisson(22),
+            goalie_id=crease[starter]['goalie_id'], goalie_name=crease[starter]['goalie_name']))
+
+    home_goalie = creases[home_team][starters[0][0]]
+    away_goalie = creases[away_team][starters[1][0]]
+    game = nhl_scraper.NhlGame(date=date, game_id=game_id, home_team=home_team, away_team=away_team,
+                               home_team_win=home_team_win, home_goalie_id=home_goalie['goalie_id'],
+                               away_goalie_id=away_goalie['goalie_id'], home_goalie_name=home_goalie['goalie_name'],
+                               away_goalie_name=away_goalie['goalie_name'])
+
+    return team_stats, goalie_stats, game
+
+def make_seasons(n_seasons: int, n_teams: int=32, first_year: int=2010, seed: int=0) \
+        -> Tuple[List[nhl_scraper.NhlTeam], List[nhl_scraper.NhlGoalie], List[nhl_scraper.NhlGame]]:
+    """
+    generates the team stats, goalie stats and game information of consecutive regular seasons. the same
+    arguments always return the same games
+    ...
+
+    Parameters
+    ----------
+    n_seasons: int
+        number of seasons
+    n_teams: int
+        number of teams, at most 32
+    first_year: int
+        first year of the first season
+    seed: int
+        seed of the random generator
+
+    Returns
+    -------
+    team_stats: List[nhl_scraper.NhlTeam]
+        two entries per game
+    goalie_stats: List[nhl_scraper.NhlGoalie]
+        one entry per goalie who played in a game
+    games_info: List[nhl_scraper.NhlGame]
+        one entry per game
+    """
+    if not 2 <= n_teams <= len(TEAMS):
+        raise ValueError(f'n_teams must be between 2 and {len(TEAMS)}')
+
+    rng = np.random.default_rng(seed)
+    teams = TEAMS[:n_teams]
+    goalie_ids = []
+    strength = {t: rng.normal(0, 0.25) for t in teams}
+    creases = {t: [new_goalie(rng, goalie_ids, 0.005), new_goalie(rng, goalie_ids, -0.005),
+                   new_goalie(rng, goalie_ids, -0.01)] for t in teams}
+    team_stats, goalie_stats, games_info = [], [], []
+
+    for year in range(first_year, first_year + n_seasons):
+        if year > first_year:
+            # strengths regress to the mean and goalies move on between seasons
+            strength = {t: 0.7 * s + rng.normal(0, 0.12) for t, s in strength.items()}
+            for t in teams:
+                if rng.random() < 0.1:
+                    creases[t][0] = new_goalie(rng, goalie_ids, 0.005)
+                if rng.random() < 0.25:
+                    creases[t][1] = new_goalie(rng, goalie_ids, -0.005)
+
+        schedule = make_schedule(rng, teams, year)
+
+        # half of the starters miss two to four weeks in the middle of the season
+        injuries = {t: None for t in teams}
+        for t in teams:
+            if rng.random() < 0.5:
+                start = schedule[0][0] + dt.timedelta(days=int(rng.integers(20, 140)))
+                injuries[t] = (start, start + dt.timedelta(days=int(rng.integers(14, 29))))
+
+        for number, (date, home_team, away_team) in enumerate(schedule, 1):
+            injured = {t: injuries[t] is not None and injuries[t][0] <= date < injuries[t][1]
+                       for t in (home_team, away_team)}
+            game_id = int(f'{year}02{number:04d}')
+            teams_played, goalies_played, game = play_game(rng, date, game_id, home_team, away_team, strength,
+                                                           creases, injured)
+            team_stats += teams_played
+            goalie_stats += goalies_played
+            games_info.append(game)
+
+    return team_stats, goalie_stats, games_info
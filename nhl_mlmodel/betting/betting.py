@@ -0,0 +1,333 @@
+# This module defines the betting backtest of the model predictions against the covers.com moneylines.
+# Every staking strategy of a grid is simulated at once on (games x strategies) arrays, and large grids are split
+# into chunks that are simulated in parallel.
+
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+from nhl_mlmodel.odds import odds
+import numpy as np
+import os
+import pandas as pd
+from typing import List
+
+# staking strategies. flat stakes a fixed fraction of the starting bankroll on every bet, kelly stakes a
+# fraction of the kelly criterion of the current bankroll
+STRATEGIES = ['flat', 'kelly']
+
+def betting_frame(predictions: pd.DataFrame, odds_df: pd.DataFrame, index_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    joins model predictions to the covers.com moneylines and keeps the games with a moneyline and a
+    final score, sorted by date
+    ...
+
+    Parameters
+    ----------
+    predictions: pd.DataFrame
+        dataframe returned by predict_games.make_predictions or predict_range
+    odds_df: pd.DataFrame
+        odds dataframe
+    index_df: pd.DataFrame
+        join index returned by odds.build_game_index
+
+    Returns
+    -------
+    bets_df: pd.DataFrame
+        predictions with home_ml, home_score, away_score and home_team_win added
+    """
+    bets_df = odds.sportsbook_baseline(odds.attach_odds(predictions, odds_df, index_df), exclude_tossups=False)
+    return bets_df.sort_values(by='date', kind='mergesort').reset_index(drop=True)
+
+def strategy_grid(edges: List[float], flat_stakes: List[float]=None, kelly_fractions: List[float]=None) -> pd.DataFrame:
+    """
+    makes a grid of staking strategies
+    ...
+
+    Parameters
+    ----------
+    edges: List[float]
+        minimum difference between the model probability and the implied probability to place a bet
+    flat_stakes: List[float]
+        fractions of the starting bankroll staked per bet by the flat strategies
+    kelly_fractions: List[float]
+        fractions of the kelly criterion staked by the kelly strategies (1 is full kelly)
+
+    Returns
+    -------
+    grid: pd.DataFrame
+        one row per strategy with strategy, edge, stake (flat) and fraction (kelly)
+    """
+    rows = [('flat', e, s, np.nan) for e, s in itertools.product(edges, flat_stakes or [])]
+    rows += [('kelly', e, np.nan, f) for e, f in itertools.product(edges, kelly_fractions or [])]
+    return pd.DataFrame(rows, columns=['strategy', 'edge', 'stake', 'fraction'])
+
+def home_bets(proba, home_ml, outcomes) -> (np.ndarray, np.ndarray, np.ndarray, np.ndarray):
+    """
+    prices a bet on the home team of every game. covers only lists the home moneyline, so the odds store
+    has no away price and the away team is never bet on
+    ...
+
+    Parameters
+    ----------
+    proba: array like
+        model probability of the home team winning
+    home_ml: array like
+        home moneyline
+    outcomes: array like
+        True if the home team won
+
+    Returns
+    -------
+    edge: np.ndarray
+        model probability minus the implied probability of the home moneyline
+    probability: np.ndarray
+        model probability of the home team winning
+    odds_won: np.ndarray
+        profit per unit staked on the home team (decimal odds - 1)
+    returns: np.ndarray
+        profit per unit staked given the outcome (odds_won or -1)
+    """
+    proba = np.asarray(proba, dtype=np.float64)
+    outcomes = np.asarray(outcomes, dtype=bool)
+
+    edge = proba - odds.implied_probability(home_ml)
+    odds_won = odds.american_to_decimal(home_ml) - 1
+
+    return edge, proba, odds_won, np.where(outcomes, odds_won, -1.0)
+
+def simulate(proba, home_ml, outcomes, grid: pd.DataFrame) -> (np.ndarray, np.ndarray):
+    """
+    simulates every strategy of a grid over games in chronological order. kelly stakes compound on the
+    bankroll after the previous game
+    ...
+
+    Parameters
+    ----------
+    proba: array like
+        model probability of the home team winning
+    home_ml: array like
+        home moneyline
+    outcomes: array like
+        True if the home team won
+    grid: pd.DataFrame
+        strategies returned by strategy_grid
+
+    Returns
+    -------
+    bankroll: np.ndarray
+        bankroll after every game, shape (n_games, n_strategies). the starting bankroll is 1
+    staked: np.ndarray
+        amount staked on every game, shape (n_games, n_strategies)
+    """
+    edge, probability, odds_won, returns = home_bets(proba, home_ml, outcomes)
+    kelly = np.clip((odds_won * probability - (1 - probability)) / odds_won, 0, None)
+
+    is_kelly = (grid['strategy'] == 'kelly').to_numpy()
+    bet = edge[:, None] > grid['edge'].to_numpy()[None, :]
+    fractions = np.where(is_kelly[None, :], kelly[:, None] * grid['fraction'].to_numpy()[None, :],
+                         grid['stake'].to_numpy()[None, :])
+    fractions = np.where(bet, fractions, 0.0)
+
+    # flat stakes are fractions of the starting bankroll so the bankroll is a running sum
+    staked = fractions.copy()
+    bankroll = 1 + np.cumsum(fractions * returns[:, None], axis=0)
+
+    # kelly stakes are fractions of the current bankroll so the bankroll is a running product
+    if is_kelly.any():
+        growth = np.cumprod(1 + fractions[:, is_kelly] * returns[:, None], axis=0)
+        before = np.vstack([np.ones((1, growth.shape[1])), growth[:-1]])
+        bankroll[:, is_kelly] = growth
+        staked[:, is_kelly] = fractions[:, is_kelly] * before
+
+    return bankroll, staked
+
+def drawdown(bankroll: np.ndarray) -> np.ndarray:
+    """
+    calculates the drawdown from the highest bankroll reached so far
+    ...
+
+    Parameters
+    ----------
+    bankroll: np.ndarray
+        bankroll after every game returned by simulate
+
+    Returns
+    -------
+    drawdown: np.ndarray
+        fraction below the running maximum (0 at a new high, -0.2 at 20% below it)
+    """
+    peak = np.maximum(np.maximum.accumulate(bankroll, axis=0), 1)
+    return bankroll / peak - 1
+
+def roi(bankroll: np.ndarray, staked: np.ndarray) -> np.ndarray:
+    """
+    calculates the running return on investment, the profit divided by the total amount staked
+    ...
+
+    Parameters
+    ----------
+    bankroll: np.ndarray
+        bankroll after every game returned by simulate
+    staked: np.ndarray
+        amount staked on every game returned by simulate
+
+    Returns
+    -------
+    roi: np.ndarray
+        running roi, NaN before the first bet
+    """
+    total_staked = np.cumsum(staked, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(total_staked > 0, (bankroll - 1) / total_staked, np.nan)
+
+def summarize(grid: pd.DataFrame, bankroll: np.ndarray, staked: np.ndarray) -> pd.DataFrame:
+    """
+    summarizes the result of every strategy
+    ...
+
+    Parameters
+    ----------
+    grid: pd.DataFrame
+        strategies returned by strategy_grid
+    bankroll: np.ndarray
+        bankroll after every game returned by simulate
+    staked: np.ndarray
+        amount staked on every game returned by simulate
+
+    Returns
+    -------
+    results_df: pd.DataFrame
+        grid with the number of bets, amount staked, final bankroll, roi and max drawdown added. without games
+        every strategy has no bets and a final bankroll of 1
+    """
+    results_df = grid.reset_index(drop=True).copy()
+    if len(bankroll) == 0:
+        # without games every strategy keeps the starting bankroll
+        return results_df.assign(bets=0, staked=0.0, final_bankroll=1.0, roi=np.nan, max_drawdown=0.0)
+
+    results_df['bets'] = (staked > 0).sum(axis=0)
+    results_df['staked'] = staked.sum(axis=0)
+    results_df['final_bankroll'] = bankroll[-1]
+    results_df['roi'] = roi(bankroll, staked)[-1]
+    results_df['max_drawdown'] = drawdown(bankroll).min(axis=0)
+    return results_df
+
+def curves(bets_df: pd.DataFrame, strategy: dict) -> pd.DataFrame:
+    """
+    returns the bankroll, roi and drawdown curves of one strategy
+    ...
+
+    Parameters
+    ----------
+    bets_df: pd.DataFrame
+        dataframe returned by betting_frame
+    strategy: dict
+        one row of strategy_grid (ex. {'strategy': 'kelly', 'edge': 0.02, 'fraction': 0.25})
+
+    Returns
+    -------
+    curves_df: pd.DataFrame
+        date, game_id, staked, bankroll, roi and drawdown after every game
+    """
+    grid = pd.DataFrame([dict({'stake': np.nan, 'fraction': np.nan}, **strategy)])
+    bankroll, staked = simulate(bets_df['xgb_home_win_percent'], bets_df['home_ml'], bets_df['home_team_win'],
+                                grid)
+
+    return pd.DataFrame({'date': bets_df['date'], 'game_id': bets_df['game_id'], 'staked': staked[:, 0],
+                         'bankroll': bankroll[:, 0], 'roi': roi(bankroll, staked)[:, 0],
+                         'drawdown': drawdown(bankroll)[:, 0]})
+
+# game arrays held by each worker process of run_grid
+_worker_data = None
+
+def init_worker(arrays):
+    '''This function keeps the game arrays in each worker process'''
+    global _worker_data
+    _worker_data = arrays
+
+def run_chunk(grid):
+    '''This function simulates one chunk of the grid in a worker process'''
+    proba, home_ml, outcomes = _worker_data
+    return summarize(grid, *simulate(proba, home_ml, outcomes, grid))
+
+def run_grid(bets_df: pd.DataFrame, grid: pd.DataFrame, n_workers: int=4,
+             chunk_size: int=250) -> pd.DataFrame:
+    """
+    backtests every strategy of a grid, simulating chunks of the grid in parallel on a process pool
+    ...
+
+    Parameters
+    ----------
+    bets_df: pd.DataFrame
+        dataframe returned by betting_frame
+    grid: pd.DataFrame
+        strategies returned by strategy_grid
+    n_workers: int
+        number of chunks to simulate at the same time. 1 simulates in this process
+    chunk_size: int
+        number of strategies per chunk. bounds the memory of the (games x strategies) arrays
+
+    Returns
+    -------
+    results_df: pd.DataFrame
+        dataframe returned by summarize for the whole grid, sorted by roi
+    """
+    arrays = (bets_df['xgb_home_win_percent'].to_numpy(dtype=np.float64),
+              bets_df['home_ml'].to_numpy(dtype=np.float64),
+              bets_df['home_team_win'].to_numpy(dtype=bool))
+    chunks = [grid.iloc[i:i + chunk_size] for i in range(0, len(grid), chunk_size)]
+
+    if n_workers == 1:
+        init_worker(arrays)
+        results = [run_chunk(c) for c in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=init_worker, initargs=(arrays,)) as executor:
+            results = list(executor.map(run_chunk, chunks))
+
+    return pd.concat(results, ignore_index=True).sort_values(by='roi', ascending=False, kind='mergesort')
+
+def run_betting(data_dir: str, n_workers: int=4) -> pd.DataFrame:
+    """
+    backtests a grid of strategies on the stored predictions and odds and saves the curves of the best
+    strategy to betting_curves.csv
+    ...
+
+    Parameters
+    ----------
+    data_dir: str
+        root data directory
+    n_workers: int
+        number of chunks of the grid to simulate at the same time
+
+    Returns
+    -------
+    results_df: pd.DataFrame
+        dataframe returned by run_grid
+    """
+    from nhl_mlmodel.storage import storage
+
+    predictions = storage.read_frame('predictions', data_dir)
+    bets_df = betting_frame(predictions, odds.read_odds(data_dir), odds.read_game_index(data_dir))
+
+    grid = strategy_grid(edges=np.round(np.arange(0, 0.1, 0.0025), 4).tolist(),
+                         flat_stakes=[0.005, 0.01, 0.02, 0.05],
+                         kelly_fractions=np.round(np.arange(0.05, 1.01, 0.05), 2).tolist())
+
+    if len(bets_df) == 0:
+        print(f'none of the {len(predictions)} stored predictions has a moneyline and a final score, run '
+              f'predict --start and evaluate sportsbook for the seasons to backtest')
+        return run_grid(bets_df, grid, n_workers=1)
+
+    results_df = run_grid(bets_df, grid, n_workers=n_workers)
+    print(results_df.head(20))
+
+    best = results_df.iloc[0][['strategy', 'edge', 'stake', 'fraction']].to_dict()
+    curves(bets_df, best).to_csv(os.path.join(data_dir, 'betting_curves.csv'), index=False)
+
+    return results_df
+
+if __name__ == '__main__':
+    '''This module will backtest betting strategies on the stored predictions and odds'''
+    from nhl_mlmodel.config import config
+    settings = config.load()
+
+    run_betting(settings.data_dir, n_workers=settings.n_workers)
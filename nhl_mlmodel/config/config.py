@@ -0,0 +1,106 @@
+# This module defines the settings shared by every stage of the pipeline.
+# Settings are read from environment variables so a scheduler can point the stages at a data root and set the
+# worker counts without editing code. The command line options of runner.py override them.
+
+import os
+
+# environment variables read by load
+DATA_DIR_ENV = 'NHL_MLMODEL_DATA'
+WORKERS_ENV = 'NHL_MLMODEL_WORKERS'
+CACHE_ENV = 'NHL_MLMODEL_CACHE'
+METRICS_ENV = 'NHL_MLMODEL_METRICS'
+
+class Config:
+    """
+    settings of a pipeline run
+
+    ...
+
+    Parameters
+    ----------
+    data_dir: str
+        root data directory holding the pickles, the game database and the stored datasets
+    n_workers: int
+        number of processes used by the parallel stages (rolling stats, hyperopt, backtests)
+    use_cache: bool
+        keep the covers.com pages, dmatrices and backtest arrays in cache directories under data_dir
+    metrics_path: str
+        json lines file the stage timings are appended to. None does not write them
+    """
+    def __init__(self, data_dir: str, n_workers: int=1, use_cache: bool=True, metrics_path: str=None):
+        self.data_dir = os.path.abspath(os.path.expanduser(data_dir))
+        self.n_workers = max(1, int(n_workers))
+        self.use_cache = use_cache
+        self.metrics_path = metrics_path
+
+    def path(self, *parts: str) -> str:
+        """
+        returns a path under the data directory
+        ...
+
+        Parameters
+        ----------
+        parts: str
+            path components (ex. 'xgb_model_opt.ubj')
+
+        Returns
+        -------
+        path: str
+            absolute path
+        """
+        return os.path.join(self.data_dir, *parts)
+
+    def cache_dir(self, name: str) -> str:
+        """
+        returns the cache directory of a stage, or None when caching is disabled
+        ...
+
+        Parameters
+        ----------
+        name: str
+            name of the cache (ex. 'covers_cache')
+
+        Returns
+        -------
+        path: str
+            absolute path or None
+        """
+        return self.path(name) if self.use_cache else None
+
+    def __repr__(self):
+        return f'Config(data_dir={self.data_dir!r}, n_workers={self.n_workers}, use_cache={self.use_cache}, ' \
+               f'metrics_path={self.metrics_path!r})'
+
+def load(data_dir: str=None, n_workers: int=None, use_cache: bool=None, metrics_path: str=None) -> Config:
+    """
+    creates the settings from the arguments, falling back to the environment variables and then to
+    the defaults (./data, all cpus, cache enabled)
+    ...
+
+    Parameters
+    ----------
+    data_dir: str
+        root data directory. defaults to $NHL_MLMODEL_DATA or ./data
+    n_workers: int
+        number of processes. defaults to $NHL_MLMODEL_WORKERS or the number of cpus
+    use_cache: bool
+        enable the caches. defaults to $NHL_MLMODEL_CACHE (0 disables) or True
+    metrics_path: str
+        json lines file for the stage timings. defaults to $NHL_MLMODEL_METRICS or None
+
+    Returns
+    -------
+    config: Config
+        settings of the run
+    """
+    if data_dir is None:
+        data_dir = os.environ.get(DATA_DIR_ENV, 'data')
+    if n_workers is None:
+        n_workers = int(os.environ.get(WORKERS_ENV, os.cpu_count() or 1))
+    if use_cache is None:
+        use_cache = os.environ.get(CACHE_ENV, '1').lower() not in ('0', 'false', 'no')
+
+    if metrics_path is None:
+        metrics_path = os.environ.get(METRICS_ENV)
+
+    return Config(data_dir, n_workers, use_cache, metrics_path)
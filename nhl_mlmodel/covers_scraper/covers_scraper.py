@@ -1,11 +1,22 @@
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from concurrent.futures import ThreadPoolExecutor
 import datetime as dt
 from nhl_mlmodel.covers_scraper import helpers
+from nhl_mlmodel.instrument import instrument
+from nhl_mlmodel.nhl_scraper import nhl_scraper
+import os
 import re
 import requests
 import sys
+import threading
+import time
 from typing import List
 
+try:
+    from lxml import html as lxml_html
+except ImportError:  # BeautifulSoup is used to parse pages when lxml is not installed
+    lxml_html = None
+
 # Class Definitions
 # ------------------
 
@@ -43,9 +54,59 @@ class NhlGame:
         self.home_score = home_score
         self.away_score = away_score
 
+    def to_dict(self):
+        return {
+            'date': self.date,
+            'game_id': self.game_id,
+            'home_team': self.home_team,
+            'away_team': self.away_team,
+            'home_ml': self.home_ml,
+            'home_score': self.home_score,
+            'away_score': self.away_score
+        }
+
 # Function Definitions
 # --------------------
 
+def xpath_class(tag: str, class_name: str) -> str:
+    """
+    returns an xpath selecting the tags that have class_name as one of their classes, the same elements
+    BeautifulSoup's find_all(tag, {'class': class_name}) returns
+
+    ...
+
+    Parameters
+    ----------
+    tag: str
+        tag name (ex. 'div')
+    class_name: str
+        one class of the tag
+
+    Returns
+    -------
+    str
+        xpath expression
+    """
+    return f"//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]"
+
+def element_text(element) -> str:
+    """
+    returns the text of an lxml element the way BeautifulSoup's get_text(strip=True) does
+
+    ...
+
+    Parameters
+    ----------
+    element: lxml.html.HtmlElement
+        element to get the text of
+
+    Returns
+    -------
+    str
+        stripped text
+    """
+    return ''.join(t.strip() for t in element.itertext())
+
 def get_nhl_dates(season: int) -> List[dt.datetime]:
     """
     returns a list of all dates NHL games were played in the specified season
@@ -82,31 +143,52 @@ def get_nhl_dates(season: int) -> List[dt.datetime]:
     print(f'Number of days NHL regular season played in {season}: ', len(dates))
     return dates
 
-def nhl_games_date(date: dt.datetime) -> List[NhlGame]:
+def parse_matchups(html: str, date: dt.datetime, backend: str=None) -> List[NhlGame]:
     """
-    creates a list of NhlGame objects for all games played on the date provided
+    creates a list of NhlGame objects from a covers.com matchups page
 
     ...
 
     Parameters
     ----------
+    html: str
+        body of the matchups page
     date: dt.datetime
-        datetime object for which we want to
+        date of the page
+    backend: str
+        'lxml' selects the game boxes with xpath on an lxml tree, 'bs4' parses only the game boxes with
+        BeautifulSoup. None uses lxml when it is installed
 
     Returns
     -------
     list[NhlGame]
         a list of NhlGame objects
     """
-    games = []
+    if backend is None:
+        backend = 'lxml' if lxml_html is not None else 'bs4'
 
-    # retrieve the covers.com webpage for the date provided
+    games = []
     date = date.strftime('%Y-%m-%d')
-    url = f'https://www.covers.com/sports/nhl/matchups?selectedDate={date}'
-    resp = requests.get(url)
 
-    # parse the page, and retrieve all the game boxes on the page
-    scraped_games = BeautifulSoup(resp.text, features='html.parser').findAll('div', {'class': 'cmg_matchup_game_box'})
+    if backend == 'lxml':
+        for g in lxml_html.fromstring(html).xpath(xpath_class('div', 'cmg_matchup_game_box')):
+            try:
+                h_score = element_text(g.xpath('.' + xpath_class('div', 'cmg_matchup_list_score_home'))[0])
+                a_score = element_text(g.xpath('.' + xpath_class('div', 'cmg_matchup_list_score_away'))[0])
+            except IndexError:  # If a score cannot be found leave as blank
+                h_score = ''
+                a_score = ''
+
+            games.append(NhlGame(date, g.get('data-event-id'), g.get('data-home-team-shortname-search'),
+                                 g.get('data-away-team-shortname-search'), g.get('data-game-odd'), h_score, a_score))
+        return games
+
+    # parse only the game boxes on the page. the strainer can see the raw class attribute, so the class is
+    # looked up in its split value to also match boxes that have other classes
+    strainer = SoupStrainer('div', {'class': lambda c: c is not None and
+                                    'cmg_matchup_game_box' in (c if isinstance(c, list) else c.split())})
+    scraped_games = BeautifulSoup(html, features='html.parser', parse_only=strainer).find_all(
+        'div', {'class': 'cmg_matchup_game_box'})
 
     # iterate through all the game boxes and retrieve required information for NhlGame object
     for g in scraped_games:
@@ -128,5 +210,175 @@ def nhl_games_date(date: dt.datetime) -> List[NhlGame]:
 
     return games
 
+def nhl_games_date(date: dt.datetime) -> List[NhlGame]:
+    """
+    creates a list of NhlGame objects for all games played on the date provided
+
+    ...
+
+    Parameters
+    ----------
+    date: dt.datetime
+        datetime object for which we want to
+
+    Returns
+    -------
+    list[NhlGame]
+        a list of NhlGame objects
+    """
+    return parse_matchups(fetch_matchups_page(date), date)
+
+class RateLimiter:
+    """
+    spaces out requests shared between threads so that no more than a set number are started per second
+
+    ...
+
+    Parameters
+    ----------
+    requests_per_second: float
+        maximum number of requests started per second
+    """
+    def __init__(self, requests_per_second: float):
+        self.interval = 1 / requests_per_second
+        self.next_time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        # reserve the next slot while holding the lock, then sleep until it outside of the lock
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_time)
+            self.next_time = slot + self.interval
+        time.sleep(max(0., slot - now))
+
+def cache_path(date: dt.datetime, cache_dir: str) -> str:
+    """
+    returns the file the matchups page of a date is cached in
+
+    ...
+
+    Parameters
+    ----------
+    date: dt.datetime
+        date of the page
+    cache_dir: str
+        directory of the page cache
+
+    Returns
+    -------
+    str
+        path of the cached page (ex. cache_dir/2019-10-02.html)
+    """
+    return os.path.join(cache_dir, date.strftime('%Y-%m-%d') + '.html')
+
+def fetch_matchups_page(date: dt.datetime, cache_dir: str=None, session: requests.Session=None,
+                        rate_limiter: RateLimiter=None) -> str:
+    """
+    retrieves the covers.com matchups page of a date. pages of dates that are over are saved in cache_dir
+    and read from there afterwards since their odds and scores no longer change
+
+    ...
+
+    Parameters
+    ----------
+    date: dt.datetime
+        date of the page
+    cache_dir: str
+        directory of the page cache. None disables the cache
+    session: requests.Session
+        session to make the request with. None uses requests.get
+    rate_limiter: RateLimiter
+        limiter shared by concurrent requests
+
+    Returns
+    -------
+    str
+        body of the matchups page
+    """
+    if cache_dir is not None and os.path.exists(cache_path(date, cache_dir)):
+        instrument.count('covers_cache_hits')
+        with open(cache_path(date, cache_dir), encoding='utf-8') as f:
+            return f.read()
+
+    if rate_limiter is not None:
+        rate_limiter.wait()
+
+    url = f'https://www.covers.com/sports/nhl/matchups?selectedDate={date.strftime("%Y-%m-%d")}'
+    resp = (session or requests).get(url)
+    instrument.count('http_requests')
+    resp.raise_for_status()
+
+    # late games finish after midnight so only pages from before yesterday are final
+    if cache_dir is not None and date.date() < dt.date.today() - dt.timedelta(days=1):
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = cache_path(date, cache_dir) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(resp.text)
+        os.replace(tmp_path, cache_path(date, cache_dir))
+
+    return resp.text
+
+def crawl_dates(dates: List[dt.datetime], cache_dir: str=None, max_workers: int=8,
+                requests_per_second: float=2.) -> List[NhlGame]:
+    """
+    creates a list of NhlGame objects for all games played on the dates provided. pages are downloaded
+    concurrently, rate limited and cached
+
+    ...
+
+    Parameters
+    ----------
+    dates: List[dt.datetime]
+        dates to retrieve games for
+    cache_dir: str
+        directory of the page cache. None disables the cache
+    max_workers: int
+        number of pages downloaded at the same time
+    requests_per_second: float
+        maximum number of requests started per second
+
+    Returns
+    -------
+    list[NhlGame]
+        a list of NhlGame objects in date order
+    """
+    session = nhl_scraper.make_session(pool_maxsize=max_workers)
+    rate_limiter = RateLimiter(requests_per_second)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pages = list(executor.map(lambda d: fetch_matchups_page(d, cache_dir, session, rate_limiter), dates))
+
+    games = []
+    for d, html in zip(dates, pages):
+        games += parse_matchups(html, d)
+
+    return games
+
+def crawl_season(season: int, cache_dir: str=None, max_workers: int=8,
+                 requests_per_second: float=2.) -> List[NhlGame]:
+    """
+    creates a list of NhlGame objects for all games played in a season
+
+    ...
+
+    Parameters
+    ----------
+    season: int
+        the two years of the season (ex. 20192020)
+    cache_dir: str
+        directory of the page cache. None disables the cache
+    max_workers: int
+        number of pages downloaded at the same time
+    requests_per_second: float
+        maximum number of requests started per second
+
+    Returns
+    -------
+    list[NhlGame]
+        a list of NhlGame objects in date order
+    """
+    return crawl_dates(get_nhl_dates(season), cache_dir, max_workers, requests_per_second)
+
 if __name__ == '__main__':
     sys.exit()
\ No newline at end of file
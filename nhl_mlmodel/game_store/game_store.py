@@ -0,0 +1,361 @@
+# This module defines the functions for the local game database.
+# Team games, goalie games, game info and predictions are kept in one sqlite file keyed on game id so that
+# daily updates only insert the newly finished games instead of rewriting the full history.
+
+import datetime as dt
+import inspect
+from nhl_mlmodel.nhl_scraper import nhl_scraper
+import os
+import pandas as pd
+import pickle
+import sqlite3
+from typing import List, Set
+
+# table name: (record class, primary key columns, columns stored as booleans)
+TABLES = {
+    'team_games': (nhl_scraper.NhlTeam, ['game_id', 'is_home_team'], ['is_home_team', 'home_team_win']),
+    'goalie_games': (nhl_scraper.NhlGoalie, ['game_id', 'goalie_id'], ['is_home_team']),
+    'games': (nhl_scraper.NhlGame, ['game_id'], ['home_team_win']),
+}
+
+PREDICTION_COLUMNS = ['game_id', 'date', 'home_team', 'away_team', 'home_goalie_id', 'away_goalie_id',
+                      'home_goalie_name', 'away_goalie_name', 'xgb_home_win', 'xgb_home_win_percent',
+                      'predicted_at']
+
+INDEXES = {
+    'team_games': [['date'], ['team', 'date']],
+    'goalie_games': [['date'], ['goalie_id', 'date'], ['team', 'date']],
+    'games': [['date'], ['home_team', 'date'], ['away_team', 'date']],
+    'predictions': [['date']],
+}
+
+def table_columns(table: str) -> List[str]:
+    """
+    returns the columns of a table in the order they are stored
+    ...
+
+    Parameters
+    ----------
+    table: str
+        table name
+
+    Returns
+    -------
+    columns: List[str]
+        column names
+    """
+    if table == 'predictions':
+        return PREDICTION_COLUMNS
+
+    return list(inspect.signature(TABLES[table][0]).parameters)
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """
+    opens the game database and creates the tables and indexes if they do not exist yet
+    ...
+
+    Parameters
+    ----------
+    db_path: str
+        path to the sqlite database file (ex. data/games.db)
+
+    Returns
+    -------
+    conn: sqlite3.Connection
+        open connection to the database
+    """
+    conn = sqlite3.connect(db_path)
+    # write ahead logging keeps the database readable and intact if a write is interrupted
+    conn.execute('PRAGMA journal_mode=WAL')
+
+    with conn:
+        for table, (cls, primary_key, bool_columns) in TABLES.items():
+            columns = ', '.join(table_columns(table))
+            conn.execute(f'CREATE TABLE IF NOT EXISTS {table} ({columns}, PRIMARY KEY ({", ".join(primary_key)}))')
+
+        columns = ', '.join(PREDICTION_COLUMNS)
+        conn.execute(f'CREATE TABLE IF NOT EXISTS predictions ({columns}, PRIMARY KEY (game_id))')
+
+        for table, indexes in INDEXES.items():
+            for index in indexes:
+                name = f'idx_{table}_' + '_'.join(index)
+                conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({", ".join(index)})')
+
+    return conn
+
+def to_sql_value(value):
+    """
+    converts a python, numpy or pandas value to a value sqlite can store
+    ...
+
+    Parameters
+    ----------
+    value:
+        value to convert
+
+    Returns
+    -------
+    value:
+        None, int, float, str or iso formatted datetime string
+    """
+    if value is None:
+        return None
+    if isinstance(value, dt.datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    # dates are stored at midnight so they compare and sort with the datetimes
+    if isinstance(value, dt.date):
+        return value.strftime('%Y-%m-%d 00:00:00')
+    if hasattr(value, 'item'):  # numpy scalars
+        value = value.item()
+    if isinstance(value, float) and value != value:  # NaN
+        return None
+    return value
+
+def upsert(conn: sqlite3.Connection, table: str, records: List[dict]) -> int:
+    """
+    inserts records into a table, replacing rows that already exist with the same primary key.
+    running the same upsert twice leaves the table unchanged.
+    ...
+
+    Parameters
+    ----------
+    conn: sqlite3.Connection
+        open connection to the database
+    table: str
+        table name
+    records: List[dict]
+        records to insert. keys must match the table columns
+
+    Returns
+    -------
+    count: int
+        number of records written
+    """
+    columns = table_columns(table)
+    primary_key = TABLES[table][1] if table in TABLES else ['game_id']
+    updates = ', '.join(f'{c}=excluded.{c}' for c in columns if c not in primary_key)
+
+    sql = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))}) ' \
+          f'ON CONFLICT ({", ".join(primary_key)}) DO UPDATE SET {updates}'
+    rows = [[to_sql_value(r.get(c)) for c in columns] for r in records]
+    conn.executemany(sql, rows)
+
+    return len(rows)
+
+def upsert_games(conn: sqlite3.Connection, team_stats: List[nhl_scraper.NhlTeam],
+                 goalie_stats: List[nhl_scraper.NhlGoalie], games_info: List[nhl_scraper.NhlGame]) -> int:
+    """
+    writes scraped team, goalie and game records in a single transaction. if any insert fails nothing
+    is written.
+    ...
+
+    Parameters
+    ----------
+    conn: sqlite3.Connection
+        open connection to the database
+    team_stats: List[nhl_scraper.NhlTeam]
+        list of NhlTeam objects
+    goalie_stats: List[nhl_scraper.NhlGoalie]
+        list of NhlGoalie objects
+    games_info: List[nhl_scraper.NhlGame]
+        list of NhlGame objects
+
+    Returns
+    -------
+    count: int
+        number of games written
+    """
+    with conn:
+        upsert(conn, 'team_games', [t.to_dict() for t in team_stats])
+        upsert(conn, 'goalie_games', [g.to_dict() for g in goalie_stats])
+        count = upsert(conn, 'games', [g.to_dict() for g in games_info])
+
+    return count
+
+def upsert_predictions(conn: sqlite3.Connection, predict_df: pd.DataFrame) -> int:
+    """
+    writes model predictions. predicting a game again replaces its previous prediction
+    ...
+
+    Parameters
+    ----------
+    conn: sqlite3.Connection
+        open connection to the database
+    predict_df: pd.DataFrame
+        dataframe returned by predict_games.make_predictions
+
+    Returns
+    -------
+    count: int
+        number of predictions written
+    """
+    predict_df = predict_df.assign(game_id=predict_df['game_id'].astype(int),
+                                   predicted_at=dt.datetime.utcnow().replace(microsecond=0))
+    records = predict_df.to_dict('records')
+
+    with conn:
+        count = upsert(conn, 'predictions', records)
+
+    return count
+
+def query(conn: sqlite3.Connection, table: str, start_date: dt.datetime=None, end_date: dt.datetime=None,
+          team: str=None, goalie_id: int=None) -> List[dict]:
+    """
+    retrieves records from a table filtered by date range, team or goalie. records are returned in
+    date order.
+    ...
+
+    Parameters
+    ----------
+    conn: sqlite3.Connection
+        open connection to the database
+    table: str
+        table name
+    start_date: dt.datetime
+        only return games on or after this date
+    end_date: dt.datetime
+        only return games before this date
+    team: str
+        only return games played by this team abbreviation
+    goalie_id: int
+        only return games played by this goalie
+
+    Returns
+    -------
+    records: List[dict]
+        list of records with the same keys as the objects to_dict()
+    """
+    columns = table_columns(table)
+    conditions = []
+    params = []
+
+    if start_date is not None:
+        conditions.append('date >= ?')
+        params.append(to_sql_value(start_date))
+    if end_date is not None:
+        conditions.append('date < ?')
+        params.append(to_sql_value(end_date))
+    if team is not None:
+        if table in ['games', 'predictions']:
+            conditions.append('(home_team = ? OR away_team = ?)')
+            params += [team, team]
+        else:
+            conditions.append('team = ?')
+            params.append(team)
+    if goalie_id is not None:
+        if table in ['games', 'predictions']:
+            conditions.append('(home_goalie_id = ? OR away_goalie_id = ?)')
+            params += [goalie_id, goalie_id]
+        else:
+            conditions.append('goalie_id = ?')
+            params.append(goalie_id)
+
+    sql = f'SELECT {", ".join(columns)} FROM {table}'
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += ' ORDER BY date, rowid'
+
+    bool_columns = TABLES[table][2] if table in TABLES else ['xgb_home_win']
+    records = []
+    for row in conn.execute(sql, params):
+        r = dict(zip(columns, row))
+        # fromisoformat also reads dates stored without a time
+        r['date'] = dt.datetime.fromisoformat(r['date'])
+        for c in bool_columns:
+            if r[c] is not None:
+                r[c] = bool(r[c])
+        records.append(r)
+
+    return records
+
+def load_team_stats(conn: sqlite3.Connection, **filters) -> List[nhl_scraper.NhlTeam]:
+    """
+    retrieves NhlTeam objects from the database. accepts the same filters as query
+    ...
+
+    Parameters
+    ----------
+    conn: sqlite3.Connection
+        open connection to the database
+
+    Returns
+    -------
+    team_stats: List[nhl_scraper.NhlTeam]
+        list of NhlTeam objects
+    """
+    return [nhl_scraper.NhlTeam(**r) for r in query(conn, 'team_games', **filters)]
+
+def load_goalie_stats(conn: sqlite3.Connection, **filters) -> List[nhl_scraper.NhlGoalie]:
+    """
+    retrieves NhlGoalie objects from the database. accepts the same filters as query
+    ...
+
+    Parameters
+    ----------
+    conn: sqlite3.Connection
+        open connection to the database
+
+    Returns
+    -------
+    goalie_stats: List[nhl_scraper.NhlGoalie]
+        list of NhlGoalie objects
+    """
+    return [nhl_scraper.NhlGoalie(**r) for r in query(conn, 'goalie_games', **filters)]
+
+def load_games_info(conn: sqlite3.Connection, **filters) -> List[nhl_scraper.NhlGame]:
+    """
+    retrieves NhlGame objects from the database. accepts the same filters as query
+    ...
+
+    Parameters
+    ----------
+    conn: sqlite3.Connection
+        open connection to the database
+
+    Returns
+    -------
+    games_info: List[nhl_scraper.NhlGame]
+        list of NhlGame objects
+    """
+    return [nhl_scraper.NhlGame(**r) for r in query(conn, 'games', **filters)]
+
+def stored_game_ids(conn: sqlite3.Connection) -> Set[int]:
+    """
+    retrieves the ids of all games in the database
+    ...
+
+    Parameters
+    ----------
+    conn: sqlite3.Connection
+        open connection to the database
+
+    Returns
+    -------
+    game_ids: Set[int]
+        set of game ids
+    """
+    return {r[0] for r in conn.execute('SELECT game_id FROM games')}
+
+def import_pickles(conn: sqlite3.Connection, data_dir: str) -> int:
+    """
+    loads the pickled team_stats, goalie_stats and games_info lists into the database
+    ...
+
+    Parameters
+    ----------
+    conn: sqlite3.Connection
+        open connection to the database
+    data_dir: str
+        directory containing team_stats.pkl, goalie_stats.pkl and games_info.pkl
+
+    Returns
+    -------
+    count: int
+        number of games written
+    """
+    lists = []
+    for name in ['team_stats', 'goalie_stats', 'games_info']:
+        with open(os.path.join(data_dir, name + '.pkl'), 'rb') as f:
+            lists.append(pickle.load(f))
+
+    return upsert_games(conn, *lists)
@@ -0,0 +1,229 @@
+# This module defines the timers, counters and profiling used to see where the runtime of the pipeline goes.
+# Stages are timed with the stage context manager, which also records the counters incremented while the stage
+# ran (http requests, cache hits, rows) and optionally the peak traced memory and a cProfile or sampling profile.
+# Every finished stage is written as one json line so runs can be compared over time.
+
+import collections
+import contextlib
+import datetime as dt
+import json
+import os
+import threading
+import time
+import tracemalloc
+from typing import Dict, List
+
+# profilers supported by configure. sampling needs pyinstrument
+PROFILERS = ['cprofile', 'sampling']
+
+_lock = threading.Lock()
+_counters = collections.Counter()
+_records: List[dict] = []
+
+# stages currently running in this process, outermost first. stages are only opened from the main thread
+_stack: List[dict] = []
+
+_settings = {'path': None, 'trace_memory': False, 'profiler': None, 'profile_stages': None, 'profile_dir': None}
+
+def configure(path: str=None, trace_memory: bool=False, profiler: str=None, profile_stages: List[str]=None,
+              profile_dir: str=None):
+    """
+    sets where stage records are written and what is measured. instrumentation that is not configured
+    only keeps the records in memory
+    ...
+
+    Parameters
+    ----------
+    path: str
+        json lines file the stage records are appended to. None keeps them in memory only
+    trace_memory: bool
+        record the peak memory allocated by python in every stage with tracemalloc. slows the run down
+    profiler: str
+        'cprofile' or 'sampling' to profile stages. None disables profiling
+    profile_stages: List[str]
+        names of the stages to profile. None profiles the outermost stage
+    profile_dir: str
+        directory the profiles are saved to (ex. train.prof, train.html)
+    """
+    if profiler is not None and profiler not in PROFILERS:
+        raise ValueError(f'unknown profiler {profiler}')
+
+    _settings.update(path=path, trace_memory=trace_memory, profiler=profiler, profile_stages=profile_stages,
+                     profile_dir=profile_dir)
+
+def count(name: str, n: int=1):
+    """
+    increments a counter. thread safe so it can be called from the crawler threads
+    ...
+
+    Parameters
+    ----------
+    name: str
+        counter name (ex. 'http_requests')
+    n: int
+        amount to add
+    """
+    with _lock:
+        _counters[name] += n
+
+def counters() -> Dict[str, int]:
+    """
+    returns the current value of every counter
+    ...
+
+    Returns
+    -------
+    counters: Dict[str, int]
+        counter values since the process started
+    """
+    with _lock:
+        return dict(_counters)
+
+def records() -> List[dict]:
+    """
+    returns the records of the stages finished in this process
+    ...
+
+    Returns
+    -------
+    records: List[dict]
+        stage records in the order the stages finished
+    """
+    return list(_records)
+
+def progress(label: str, done: int, total: int, every: int=500):
+    """
+    prints the progress of a loop every `every` items and at the end
+    ...
+
+    Parameters
+    ----------
+    label: str
+        what is being processed (ex. 'team stats')
+    done: int
+        number of items processed
+    total: int
+        total number of items
+    every: int
+        print interval
+    """
+    if done % every == 0 or done == total:
+        print(f'{100 * done / max(total, 1):.1f} percent done retrieving {label} ({done}/{total}).')
+
+def emit(record: dict):
+    """
+    keeps a stage record and appends it to the json lines file
+    ...
+
+    Parameters
+    ----------
+    record: dict
+        stage record
+    """
+    _records.append(record)
+
+    if _settings['path'] is not None:
+        line = json.dumps(record, default=str)
+        with _lock, open(_settings['path'], 'a') as f:
+            f.write(line + '\n')
+
+def _start_profiler(name: str):
+    '''This function starts the configured profiler if the stage should be profiled'''
+    profile_stages = _settings['profile_stages']
+    if _settings['profiler'] is None or (profile_stages is None and _stack) or \
+            (profile_stages is not None and name not in profile_stages):
+        return None
+
+    if _settings['profiler'] == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+    return profiler
+
+def _save_profile(profiler, path: str) -> str:
+    '''This function stops a profiler and saves its profile next to the stage name'''
+    os.makedirs(_settings['profile_dir'] or '.', exist_ok=True)
+    path = os.path.join(_settings['profile_dir'] or '.', path.replace('/', '.'))
+
+    if _settings['profiler'] == 'cprofile':
+        profiler.disable()
+        path += '.prof'
+        profiler.dump_stats(path)
+    else:
+        profiler.stop()
+        path += '.html'
+        with open(path, 'w') as f:
+            f.write(profiler.output_html())
+    return path
+
+@contextlib.contextmanager
+def stage(name: str, **fields):
+    """
+    times a stage of the pipeline and emits a record when it finishes. stages can be nested, the record
+    name is the path of the enclosing stages (ex. 'features/rolling_teams')
+    ...
+
+    Parameters
+    ----------
+    name: str
+        name of the stage
+    fields:
+        extra values added to the record (ex. season=20202021)
+
+    Yields
+    ------
+    record: dict
+        the record of the stage. values added to it while the stage runs are emitted with it
+    """
+    path = '/'.join([s['name'] for s in _stack] + [name])
+    record = dict(fields, stage=path, start=dt.datetime.now().isoformat(timespec='seconds'), pid=os.getpid())
+
+    # the peak of the enclosing stage is saved before the peak is reset for this stage
+    tracing = _settings['trace_memory']
+    started_tracing = tracing and not tracemalloc.is_tracing()
+    if tracing:
+        if started_tracing:
+            tracemalloc.start()
+        if _stack:
+            _stack[-1]['peak'] = max(_stack[-1]['peak'], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+
+    profiler = _start_profiler(name)
+    frame = {'name': name, 'peak': 0}
+    _stack.append(frame)
+    start_counters = counters()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    status = 'ok'
+
+    try:
+        yield record
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        record['wall_s'] = round(time.perf_counter() - wall, 4)
+        record['cpu_s'] = round(time.process_time() - cpu, 4)
+        record['status'] = status
+
+        end_counters = counters()
+        record['counters'] = {k: v - start_counters.get(k, 0) for k, v in end_counters.items()
+                              if v != start_counters.get(k, 0)}
+
+        if profiler is not None:
+            record['profile'] = _save_profile(profiler, path)
+
+        _stack.pop()
+        if tracing:
+            peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+            record['peak_mb'] = round(peak / 2 ** 20, 2)
+            if _stack:
+                _stack[-1]['peak'] = max(_stack[-1]['peak'], peak)
+            if started_tracing:
+                tracemalloc.stop()
+
+        emit(record)
@@ -0,0 +1,413 @@
+# This module defines the scoring and calibration metrics used to evaluate the model and the sportsbooks.
+# Every metric accepts probabilities for one model (n_games,) or several models (n_games, n_models) and an
+# optional group label per game (ex. the backtest window), so many models and windows are scored at once with
+# numpy instead of one sklearn call per series. Plotting is optional and only imports matplotlib when used.
+
+import numpy as np
+import pandas as pd
+from typing import List, Tuple
+
+def _prepare(y, proba, groups=None) -> (np.ndarray, np.ndarray, np.ndarray, np.ndarray):
+    """
+    converts the inputs of a metric to arrays
+    ...
+
+    Parameters
+    ----------
+    y: array like
+        1 or True if the home team won, shape (n_games,)
+    proba: array like
+        predicted probabilities, shape (n_games,) or (n_games, n_models)
+    groups: array like
+        group label of each game. None puts every game in one group
+
+    Returns
+    -------
+    y: np.ndarray
+        float64 outcomes, shape (n_games, 1)
+    proba: np.ndarray
+        float64 probabilities, shape (n_games, n_models)
+    group_index: np.ndarray
+        group number of each game
+    labels: np.ndarray
+        the sorted group labels
+    """
+    y = np.asarray(y, dtype=np.float64).reshape(-1, 1)
+    proba = np.asarray(proba, dtype=np.float64)
+    if proba.ndim == 1:
+        proba = proba.reshape(-1, 1)
+
+    if groups is None:
+        return y, proba, np.zeros(len(y), dtype=np.int64), np.array([0])
+
+    labels, group_index = np.unique(np.asarray(groups), return_inverse=True)
+    return y, proba, group_index, labels
+
+def _group_mean(values: np.ndarray, group_index: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    averages the rows of values within each group
+    ...
+
+    Parameters
+    ----------
+    values: np.ndarray
+        shape (n_games, n_models)
+    group_index: np.ndarray
+        group number of each game
+    n_groups: int
+        number of groups
+
+    Returns
+    -------
+    means: np.ndarray
+        shape (n_groups, n_models)
+    """
+    counts = np.bincount(group_index, minlength=n_groups).reshape(-1, 1)
+    sums = np.stack([np.bincount(group_index, weights=values[:, m], minlength=n_groups)
+                     for m in range(values.shape[1])], axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / counts
+
+def _squeeze(result: np.ndarray, groups) -> np.ndarray:
+    '''returns a scalar or model array when no groups were given'''
+    if groups is None:
+        result = result[0]
+        return result[0] if result.shape == (1,) else result
+    return result[:, 0] if result.shape[1] == 1 else result
+
+def pointwise_losses(y, proba, metric: str) -> np.ndarray:
+    """
+    calculates the loss of each game. averaging the losses gives the metric
+    ...
+
+    Parameters
+    ----------
+    y: array like
+        outcomes, shape (n_games,)
+    proba: array like
+        predicted probabilities, shape (n_games,) or (n_games, n_models)
+    metric: str
+        'brier', 'log_loss' or 'accuracy'
+
+    Returns
+    -------
+    losses: np.ndarray
+        shape (n_games, n_models)
+    """
+    y, proba, _, _ = _prepare(y, proba)
+
+    if metric == 'brier':
+        return (proba - y) ** 2
+    if metric == 'log_loss':
+        proba = np.clip(proba, 1e-15, 1 - 1e-15)
+        return -(y * np.log(proba) + (1 - y) * np.log(1 - proba))
+    if metric == 'accuracy':
+        return ((proba > 0.5) == (y > 0.5)).astype(np.float64)
+    raise ValueError(f'unknown metric {metric}')
+
+def brier_score(y, proba, groups=None):
+    """
+    calculates the brier score, the mean squared difference between the probability and the outcome
+    ...
+
+    Parameters
+    ----------
+    y: array like
+        outcomes, shape (n_games,)
+    proba: array like
+        predicted probabilities, shape (n_games,) or (n_games, n_models)
+    groups: array like
+        group label of each game (ex. backtest window)
+
+    Returns
+    -------
+    score: float or np.ndarray
+        one score per model and group, shape (n_groups, n_models) with the empty dimensions removed
+    """
+    _, _, group_index, labels = _prepare(y, proba, groups)
+    losses = pointwise_losses(y, proba, 'brier')
+    return _squeeze(_group_mean(losses, group_index, len(labels)), groups)
+
+def log_loss(y, proba, groups=None):
+    """
+    calculates the log loss. probabilities are clipped to avoid infinite losses
+    ...
+
+    Parameters
+    ----------
+    y: array like
+        outcomes, shape (n_games,)
+    proba: array like
+        predicted probabilities, shape (n_games,) or (n_games, n_models)
+    groups: array like
+        group label of each game (ex. backtest window)
+
+    Returns
+    -------
+    score: float or np.ndarray
+        one score per model and group
+    """
+    _, _, group_index, labels = _prepare(y, proba, groups)
+    losses = pointwise_losses(y, proba, 'log_loss')
+    return _squeeze(_group_mean(losses, group_index, len(labels)), groups)
+
+def accuracy(y, proba, groups=None):
+    """
+    calculates the fraction of games where the favoured team (probability above 0.5) won
+    ...
+
+    Parameters
+    ----------
+    y: array like
+        outcomes, shape (n_games,)
+    proba: array like
+        predicted probabilities, shape (n_games,) or (n_games, n_models)
+    groups: array like
+        group label of each game (ex. backtest window)
+
+    Returns
+    -------
+    score: float or np.ndarray
+        one score per model and group
+    """
+    _, _, group_index, labels = _prepare(y, proba, groups)
+    losses = pointwise_losses(y, proba, 'accuracy')
+    return _squeeze(_group_mean(losses, group_index, len(labels)), groups)
+
+def reliability_bins(y, proba, n_bins: int=15, groups=None) -> (np.ndarray, np.ndarray, np.ndarray):
+    """
+    splits the probabilities into n_bins equal width bins and calculates the mean probability and the
+    fraction of home wins in each bin. uses the same bins as sklearn's calibration_curve
+    ...
+
+    Parameters
+    ----------
+    y: array like
+        outcomes, shape (n_games,)
+    proba: array like
+        predicted probabilities, shape (n_games,) or (n_games, n_models)
+    n_bins: int
+        number of bins
+    groups: array like
+        group label of each game (ex. backtest window)
+
+    Returns
+    -------
+    mean_predicted: np.ndarray
+        mean probability in each bin, shape (n_groups, n_models, n_bins). NaN for empty bins
+    fraction_positive: np.ndarray
+        fraction of home wins in each bin. NaN for empty bins
+    counts: np.ndarray
+        number of games in each bin
+    """
+    y, proba, group_index, labels = _prepare(y, proba, groups)
+    n_groups, n_models = len(labels), proba.shape[1]
+
+    edges = np.linspace(0., 1., n_bins + 1)
+    bin_index = np.searchsorted(edges[1:-1], proba)
+
+    # one flat index per (group, model, bin) so every bin of every series is summed with one bincount
+    flat = (group_index.reshape(-1, 1) * n_models + np.arange(n_models)) * n_bins + bin_index
+    size = n_groups * n_models * n_bins
+    counts = np.bincount(flat.ravel(), minlength=size)
+    proba_sums = np.bincount(flat.ravel(), weights=proba.ravel(), minlength=size)
+    y_sums = np.bincount(flat.ravel(), weights=np.broadcast_to(y, proba.shape).ravel(), minlength=size)
+
+    shape = (n_groups, n_models, n_bins)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_predicted = (proba_sums / counts).reshape(shape)
+        fraction_positive = (y_sums / counts).reshape(shape)
+
+    return mean_predicted, fraction_positive, counts.reshape(shape)
+
+def expected_calibration_error(y, proba, n_bins: int=15, groups=None):
+    """
+    calculates the expected calibration error, the average distance between the mean probability and
+    the fraction of home wins of each bin weighted by the number of games in the bin
+    ...
+
+    Parameters
+    ----------
+    y: array like
+        outcomes, shape (n_games,)
+    proba: array like
+        predicted probabilities, shape (n_games,) or (n_games, n_models)
+    n_bins: int
+        number of bins
+    groups: array like
+        group label of each game (ex. backtest window)
+
+    Returns
+    -------
+    ece: float or np.ndarray
+        one error per model and group
+    """
+    mean_predicted, fraction_positive, counts = reliability_bins(y, proba, n_bins, groups)
+    gaps = np.nan_to_num(np.abs(mean_predicted - fraction_positive))
+    ece = (gaps * counts).sum(axis=2) / counts.sum(axis=2)
+    return _squeeze(ece, groups)
+
+def bootstrap_ci(y, proba, metric: str='brier', n_boot: int=1000, alpha: float=0.05,
+                 seed: int=42, chunk_size: int=200) -> (np.ndarray, np.ndarray):
+    """
+    calculates a bootstrap confidence interval for a metric. every resample is drawn at once and the
+    same resamples are used for every model so the intervals can be compared
+    ...
+
+    Parameters
+    ----------
+    y: array like
+        outcomes, shape (n_games,)
+    proba: array like
+        predicted probabilities, shape (n_games,) or (n_games, n_models)
+    metric: str
+        'brier', 'log_loss' or 'accuracy'
+    n_boot: int
+        number of resamples
+    alpha: float
+        1 - confidence level (0.05 gives a 95% interval)
+    seed: int
+        random seed
+    chunk_size: int
+        number of resamples averaged at once, limits the memory used to chunk_size * n_games * n_models losses
+
+    Returns
+    -------
+    low: float or np.ndarray
+        lower bound for each model
+    high: float or np.ndarray
+        upper bound for each model
+    """
+    losses = pointwise_losses(y, proba, metric)
+    rng = np.random.default_rng(seed)
+    samples = rng.integers(0, len(losses), size=(n_boot, len(losses)))
+
+    # mean loss of every resample, shape (n_boot, n_models)
+    means = np.concatenate([losses[samples[i:i + chunk_size]].mean(axis=1) for i in range(0, n_boot, chunk_size)])
+    low, high = np.quantile(means, [alpha / 2, 1 - alpha / 2], axis=0)
+
+    if len(low) == 1:
+        return low[0], high[0]
+    return low, high
+
+def evaluate(y, proba, names: List[str]=None, groups=None, n_bins: int=15) -> pd.DataFrame:
+    """
+    scores several models over several groups at once
+    ...
+
+    Parameters
+    ----------
+    y: array like
+        outcomes, shape (n_games,)
+    proba: array like
+        predicted probabilities, shape (n_games,) or (n_games, n_models)
+    names: List[str]
+        model names. defaults to model_0, model_1, ...
+    groups: array like
+        group label of each game (ex. backtest window)
+    n_bins: int
+        number of bins for the expected calibration error
+
+    Returns
+    -------
+    scores_df: pd.DataFrame
+        one row per group and model with the number of games, brier score, log loss, accuracy and
+        expected calibration error
+    """
+    y_, proba_, group_index, labels = _prepare(y, proba, groups)
+    n_groups, n_models = len(labels), proba_.shape[1]
+    names = names if names is not None else [f'model_{m}' for m in range(n_models)]
+
+    scores = {}
+    for metric in ['brier', 'log_loss', 'accuracy']:
+        scores[metric] = _group_mean(pointwise_losses(y, proba, metric), group_index, n_groups)
+
+    mean_predicted, fraction_positive, counts = reliability_bins(y, proba, n_bins, groups)
+    gaps = np.nan_to_num(np.abs(mean_predicted - fraction_positive))
+    scores['ece'] = (gaps * counts).sum(axis=2) / counts.sum(axis=2)
+
+    scores_df = pd.DataFrame({'group': np.repeat(labels, n_models),
+                              'model': np.tile(names, n_groups),
+                              'games': np.repeat(np.bincount(group_index, minlength=n_groups), n_models)})
+    for metric, values in scores.items():
+        scores_df[metric] = values.ravel()
+
+    if groups is None:
+        scores_df = scores_df.drop(columns=['group'])
+    return scores_df
+
+def cal_curve(data: List[Tuple[list, list, list, str]], bins: int, path: str=None) -> pd.DataFrame:
+    """
+    prints the accuracy and brier score of each series and, if a path is given, saves a calibration
+    plot. the series can cover different games
+    ...
+
+    Parameters
+    ----------
+    data: List[Tuple[list, list, list, str]]
+        (outcomes, predictions, probabilities, name) for each series
+    bins: int
+        number of bins of the calibration curve
+    path: str
+        file to save the figure to. None skips plotting
+
+    Returns
+    -------
+    scores_df: pd.DataFrame
+        one row per series with its accuracy and brier score
+    """
+    rows = []
+    for y_test, y_pred, y_proba, name in data:
+        brier = brier_score(y_test, y_proba)
+        acc = np.mean(np.asarray(y_test, dtype=bool) == np.asarray(y_pred, dtype=bool))
+        print("{}\t\tAccuracy:{:.4f}\t Brier Loss: {:.4f}".format(name, acc, brier))
+        rows.append({'name': name, 'accuracy': acc, 'brier': brier})
+
+    if path is not None:
+        plot_calibration([(y_test, y_proba, name) for y_test, _, y_proba, name in data], bins, path)
+
+    return pd.DataFrame(rows)
+
+def plot_calibration(data: List[Tuple[list, list, str]], bins: int, path: str):
+    """
+    saves a calibration plot (reliability curve and histogram of the probabilities) of several series
+    ...
+
+    Parameters
+    ----------
+    data: List[Tuple[list, list, str]]
+        (outcomes, probabilities, name) for each series
+    bins: int
+        number of bins
+    path: str
+        file to save the figure to
+    """
+    # obtained from:
+    #https://scikit-learn.org/stable/auto_examples/calibration/plot_calibration_curve.html
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(12, 8))
+    ax1 = plt.subplot2grid((3, 1), (0, 0), rowspan=2)
+    ax2 = plt.subplot2grid((3, 1), (2, 0))
+
+    ax1.plot([0, 1], [0, 1], "k:", label="Perfectly calibrated")
+
+    for y_test, y_proba, name in data:
+        mean_predicted, fraction_positive, counts = reliability_bins(y_test, y_proba, bins)
+        nonempty = counts[0, 0] > 0
+        ax1.plot(mean_predicted[0, 0][nonempty], fraction_positive[0, 0][nonempty],
+                 label="%s (%1.4f)" % (name, brier_score(y_test, y_proba)))
+        ax2.hist(y_proba, range=(0, 1), bins=bins, label=name, histtype="step", lw=2)
+
+    ax1.set_ylabel("Fraction of positives")
+    ax1.set_ylim([-0.05, 1.05])
+    ax1.legend(loc="lower right")
+    ax1.set_title('Calibration plots  (reliability curve)')
+
+    ax2.set_xlabel("Mean predicted value")
+    ax2.set_ylabel("Count")
+    ax2.legend(loc="lower right")
+
+    plt.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
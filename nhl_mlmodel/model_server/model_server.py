@@ -0,0 +1,282 @@
+# This module defines the model server used to make predictions.
+# The model is loaded once per process and kept in memory so that repeated predictions (for example when
+# starting goalies are confirmed during the day) do not pay for unpickling the model again. xgboost is only
+# imported when a model is loaded or exported so that reading the feature schema stays cheap.
+
+import json
+import numpy as np
+import os
+import pandas as pd
+import pickle
+from typing import Dict, List, Tuple
+
+class ModelServer:
+    """
+    keeps a trained xgboost model loaded for repeated predictions
+
+    ...
+
+    Parameters
+    ----------
+    model_path: str
+        path to the pickled XGBClassifier (.pkl) or a booster exported with export_booster (.json, .ubj)
+    """
+    def __init__(self, model_path: str):
+        self.model_path = model_path
+        self.mtime = model_mtime(model_path)
+
+        if model_path.endswith('.pkl'):
+            with open(model_path, 'rb') as f:
+                model = pickle.load(f)
+            self.booster = model.get_booster()
+
+            # only use the trees up to the best iteration when the model was trained with early stopping
+            try:
+                best_iteration = int(model.best_iteration)
+            except AttributeError:
+                best_iteration = None
+        else:
+            self.booster, schema = load_booster(model_path)
+            best_iteration = schema['best_iteration']
+
+        self.feature_names: List[str] = self.booster.feature_names
+        self.iteration_range = (0, 0) if best_iteration is None else (0, best_iteration + 1)
+
+        # maps the column order of a dataframe to the positions of the model features
+        self._column_index: Dict[Tuple[str, ...], np.ndarray] = {}
+
+    def feature_matrix(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        selects the model features from a dataframe in the order the model was trained with
+        ...
+
+        Parameters
+        ----------
+        df: pd.DataFrame
+            dataframe containing at least the model features
+
+        Returns
+        -------
+        X: np.ndarray
+            float32 array with one column per model feature
+        """
+        key = tuple(df.columns)
+        index = self._column_index.get(key)
+
+        if index is None:
+            positions = {c: i for i, c in enumerate(df.columns)}
+            index = np.array([positions[c] for c in self.feature_names])
+            self._column_index[key] = index
+
+        return df.iloc[:, index].to_numpy(dtype=np.float32)
+
+    def predict(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        predicts the outcome of games. the class and probability are both derived from one margin
+        calculation
+        ...
+
+        Parameters
+        ----------
+        df: pd.DataFrame
+            dataframe containing at least the model features
+
+        Returns
+        -------
+        home_win: np.ndarray
+            True if the home team is predicted to win
+        home_win_percent: np.ndarray
+            predicted probability of the home team winning
+        """
+        margin = self.booster.inplace_predict(self.feature_matrix(df), predict_type='margin',
+                                              iteration_range=self.iteration_range)
+        home_win_percent = 1 / (1 + np.exp(-margin))
+
+        return margin > 0, home_win_percent
+
+def schema_path(model_path: str) -> str:
+    """
+    returns the path of the feature schema saved next to an exported booster
+    ...
+
+    Parameters
+    ----------
+    model_path: str
+        path to the exported booster (ex. xgb_model_opt.ubj)
+
+    Returns
+    -------
+    path: str
+        path to the feature schema (ex. xgb_model_opt.features.json)
+    """
+    return os.path.splitext(model_path)[0] + '.features.json'
+
+def export_booster(model, model_path: str, metadata: dict=None) -> str:
+    """
+    saves the booster of a trained model in xgboost's native format along with a feature schema.
+    the format is chosen by the extension, .json or .ubj
+    ...
+
+    Parameters
+    ----------
+    model: xgb.XGBClassifier or xgb.Booster
+        trained model
+    model_path: str
+        path to save the booster to
+    metadata: dict
+        extra information to keep in the schema (ex. the date the model was trained through)
+
+    Returns
+    -------
+    schema_path: str
+        path the feature schema was saved to
+    """
+    import xgboost as xgb
+
+    booster = model.get_booster() if isinstance(model, xgb.XGBModel) else model
+    booster.save_model(model_path)
+
+    try:
+        best_iteration = int(model.best_iteration)
+    except AttributeError:
+        best_iteration = None
+
+    schema = {'feature_names': booster.feature_names,
+              'feature_types': booster.feature_types,
+              'best_iteration': best_iteration}
+    schema.update(metadata or {})
+
+    with open(schema_path(model_path), 'w') as f:
+        json.dump(schema, f)
+
+    return schema_path(model_path)
+
+def load_booster(model_path: str) -> Tuple['xgb.Booster', dict]:
+    """
+    loads a booster saved with export_booster
+    ...
+
+    Parameters
+    ----------
+    model_path: str
+        path to the exported booster
+
+    Returns
+    -------
+    booster: xgb.Booster
+        loaded booster
+    schema: dict
+        feature names, feature types and best iteration of the model
+    """
+    import xgboost as xgb
+
+    with open(schema_path(model_path)) as f:
+        schema = json.load(f)
+
+    booster = xgb.Booster(model_file=model_path)
+    booster.feature_names = schema['feature_names']
+    booster.feature_types = schema['feature_types']
+
+    return booster, schema
+
+def model_features(model_path: str) -> List[str]:
+    """
+    returns the features a model was trained on without loading the model
+    ...
+
+    Parameters
+    ----------
+    model_path: str
+        path to an exported booster
+
+    Returns
+    -------
+    features: List[str]
+        feature names in the order the model expects them
+    """
+    with open(schema_path(model_path)) as f:
+        return json.load(f)['feature_names']
+
+def model_params(model_path: str) -> dict:
+    """
+    returns the tuned xgboost parameters saved in the schema of a model exported by train, without loading the
+    model
+    ...
+
+    Parameters
+    ----------
+    model_path: str
+        path to an exported booster
+
+    Returns
+    -------
+    params: dict
+        xgboost parameters the model was trained with
+    """
+    with open(schema_path(model_path)) as f:
+        return json.load(f)['params']
+
+def check_feature_version(model_path: str, feature_version: int):
+    """
+    raises an error if a model was trained on another version of the features than the one built now. models
+    exported before the features were versioned are version 1
+    ...
+
+    Parameters
+    ----------
+    model_path: str
+        path to an exported booster
+    feature_version: int
+        version of the features that will be passed to the model (process_data.FEATURE_VERSION)
+    """
+    with open(schema_path(model_path)) as f:
+        model_version = json.load(f).get('feature_version', 1)
+
+    if model_version != feature_version:
+        raise ValueError(f'{model_path} was trained on version {model_version} of the features but the features '
+                         f'are now version {feature_version}, run train to retrain the model')
+
+def model_mtime(model_path: str) -> Tuple[float, float]:
+    """
+    returns the modification times of a model and its feature schema, used to detect that either was replaced
+    ...
+
+    Parameters
+    ----------
+    model_path: str
+        path to the pickled XGBClassifier or exported booster
+
+    Returns
+    -------
+    mtimes: Tuple[float, float]
+        modification time of the model and of the schema. the schema time is None when there is no schema
+    """
+    path = schema_path(model_path)
+    return os.path.getmtime(model_path), os.path.getmtime(path) if os.path.exists(path) else None
+
+# servers that have been loaded in this process keyed by model path
+_servers: Dict[str, ModelServer] = {}
+
+def get_server(model_path: str) -> ModelServer:
+    """
+    returns the model server for a model path, loading the model the first time it is requested or
+    when the model file or its feature schema has been replaced since it was loaded
+    ...
+
+    Parameters
+    ----------
+    model_path: str
+        path to the pickled XGBClassifier or exported booster
+
+    Returns
+    -------
+    server: ModelServer
+        loaded model server
+    """
+    server = _servers.get(model_path)
+
+    if server is None or server.mtime != model_mtime(model_path):
+        server = ModelServer(model_path)
+        _servers[model_path] = server
+
+    return server
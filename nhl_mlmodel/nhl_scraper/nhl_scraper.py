@@ -1,6 +1,7 @@
 # This module defines the functions to scrape the NHL.com API
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import datetime as dt
+from nhl_mlmodel.instrument import instrument
 import json
 import requests
 from urllib3.util.retry import Retry
@@ -8,6 +9,48 @@ from requests.adapters import HTTPAdapter
 import sys
 from typing import List
 
+try:
+    from lxml import html as lxml_html
+except ImportError:  # BeautifulSoup is used to parse pages when lxml is not installed
+    lxml_html = None
+
+# team abbreviations in our dataframes and the team names used on daily faceoff
+TEAM_NAMES = {'MIN':'Minnesota Wild','TOR':'Toronto Maple Leafs',
+              'PIT':'Pittsburgh Penguins', 'COL':'Colorado Avalanche',
+              'EDM':'Edmonton Oilers', 'CAR':'Carolina Hurricanes',
+              'CBJ':'Columbus Blue Jackets', 'NJD':'New Jersey Devils',
+              'DET':'Detroit Red Wings', 'OTT':'Ottawa Senators',
+              'BOS':'Boston Bruins', 'SJS':'San Jose Sharks',
+              'BUF':'Buffalo Sabres','NYI':'New York Islanders',
+              'WSH':'Washington Capitals','TBL':'Tampa Bay Lightning',
+              'STL':'St Louis Blues', 'NSH':'Nashville Predators',
+              'CHI':'Chicago Blackhawks', 'VAN':'Vancouver Canucks',
+              'CGY':'Calgary Flames', 'PHI':'Philadelphia Flyers',
+              'LAK':'Los Angeles Kings', 'MTL':'Montreal Canadiens',
+              'ANA':'Anaheim Ducks', 'DAL':'Dallas Stars',
+              'NYR':'New York Rangers', 'FLA':'Florida Panthers',
+              'WPG':'Winnipeg Jets', 'ARI':'Arizona Coyotes',
+              'VGK':'Vegas Golden Knights'}
+
+# statsapi game endpoints. feed/live holds the game data, boxscore, linescore and every play of a game, the
+# boxscore endpoint and the schedule of one game hold only the parts the scrapers read
+FEED_URL = 'https://statsapi.web.nhl.com/api/v1/game/{}/feed/live'
+BOXSCORE_URL = 'https://statsapi.web.nhl.com/api/v1/game/{}/boxscore'
+GAME_SCHEDULE_URL = 'https://statsapi.web.nhl.com/api/v1/schedule?gamePk={}'
+
+# 'feed' downloads feed/live, 'boxscore' downloads only the endpoints holding the parts a record type reads
+FETCH_MODES = ['feed', 'boxscore']
+DEFAULT_FETCH_MODE = 'boxscore'
+
+# parts of the feed read by each record type. none of them needs the play by play
+RECORD_PARTS = {'team_stats': ['datetime', 'boxscore', 'linescore'],
+                'goalie_stats': ['datetime', 'teams', 'boxscore'],
+                'player_stats': ['datetime', 'teams', 'boxscore'],
+                'game_info': ['datetime', 'boxscore', 'linescore'],
+                'prediction': ['datetime', 'teams', 'boxscore'],
+                'team': ['teams'],
+                'date': ['datetime']}
+
 class NhlTeam:
     """
         represents a game played in the nhl by 1 team
@@ -306,6 +349,115 @@ class NhlGame:
             'away_goalie_name': self.away_goalie_name
         }
 
+def make_session(pool_maxsize: int=10) -> requests.Session:
+    """
+    creates a session that retries failed connections, reads and server errors with a backoff, to avoid max
+    retry errors. shared by the nhl and covers scrapers
+    ...
+
+    Parameters
+    ----------
+    pool_maxsize: int
+        number of connections kept open per host, at least the number of threads using the session
+
+    Returns
+    -------
+    session: requests.Session
+        session with the retry adapter mounted
+    """
+    session = requests.Session()
+    retry = Retry(connect=3, read=3, status=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=pool_maxsize)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    return session
+
+def get_json(session: requests.Session, url: str):
+    """
+    downloads and decodes a json document. the bytes are decoded directly so requests does not have to
+    guess the encoding of the text
+    ...
+
+    Parameters
+    ----------
+    session: requests.Session
+        session used for the request
+    url: str
+        url of the document
+
+    Returns
+    -------
+    json_data:
+        decoded document
+    """
+    resp = session.get(url)
+    instrument.count('http_requests')
+    instrument.count('http_bytes', len(resp.content))
+
+    return json.loads(resp.content)
+
+def fetch_game(game_id: int, record: str, mode: str=None, session: requests.Session=None) -> dict:
+    """
+    retrieves the data of a game needed by one record type. in boxscore mode the boxscore endpoint and the
+    schedule of the game (hydrated with the linescore or the teams when they are needed) are downloaded
+    instead of feed/live, and assembled into a dict with the same keys as the feed so the scrapers read
+    both the same way
+    ...
+
+    Parameters
+    ----------
+    game_id: int
+        game id we are retrieving data for
+    record: str
+        record type, one of RECORD_PARTS (ex. 'team_stats')
+    mode: str
+        'feed' or 'boxscore'. None uses DEFAULT_FETCH_MODE
+    session: requests.Session
+        session used for the requests. None creates one
+
+    Returns
+    -------
+    json_data: dict
+        feed/live, or a dict holding gameData.datetime, gameData.teams, liveData.boxscore and
+        liveData.linescore as needed by the record type
+    """
+    mode = mode or DEFAULT_FETCH_MODE
+    if mode not in FETCH_MODES:
+        raise ValueError(f'unknown fetch mode {mode}')
+
+    session = session or make_session()
+    if mode == 'feed':
+        return get_json(session, FEED_URL.format(game_id))
+
+    parts = RECORD_PARTS[record]
+    json_data = {'gameData': {}, 'liveData': {}}
+
+    # the boxscore holds the team abbreviations so the teams do not have to be hydrated in the schedule
+    if 'boxscore' in parts:
+        boxscore = get_json(session, BOXSCORE_URL.format(game_id))
+        json_data['liveData']['boxscore'] = boxscore
+        json_data['gameData']['teams'] = {side: boxscore['teams'][side]['team'] for side in ['home', 'away']}
+
+    hydrate = []
+    if 'linescore' in parts:
+        hydrate.append('linescore')
+    if 'teams' in parts and 'boxscore' not in parts:
+        hydrate.append('team')
+
+    if 'datetime' in parts or hydrate:
+        url = GAME_SCHEDULE_URL.format(game_id) + (f'&hydrate={",".join(hydrate)}' if hydrate else '')
+        game = get_json(session, url)['dates'][0]['games'][0]
+
+        # gameDate is the scheduled start in the same format as gameData.datetime.dateTime
+        json_data['gameData']['datetime'] = {'dateTime': game['gameDate']}
+        if 'linescore' in hydrate:
+            json_data['liveData']['linescore'] = game['linescore']
+        if 'team' in hydrate:
+            json_data['gameData']['teams'] = {side: game['teams'][side]['team'] for side in ['home', 'away']}
+
+    return json_data
+
 def get_game_ids(season: int) -> List[int]:
     """
     retrieves all of the gameids for the specified season
@@ -322,16 +474,9 @@ def get_game_ids(season: int) -> List[int]:
     game_ids: List[int]
         list of game ids for the specified season
     """
-    session = requests.Session()
-    retry = Retry(connect=3, backoff_factor=0.5)
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-
     season_str: str = str(season)
     url: str = f"https://statsapi.web.nhl.com/api/v1/schedule?season={season_str}&gameType=R"
-    resp = session.get(url)
-    raw_schedule = json.loads(resp.text)
+    raw_schedule = get_json(make_session(), url)
     schedule = raw_schedule['dates']
     # Each entry in schedule is a day in the NHL. Each 'games' key contains all the games on that day.
     # Therefore we need a nested loop to retrieve all games
@@ -347,7 +492,7 @@ def get_game_ids(season: int) -> List[int]:
             game_ids.append(game_id)
     return game_ids
 
-def scrape_team_stats(game_id: int) -> List[NhlTeam]:
+def scrape_team_stats(game_id: int, mode: str=None) -> List[NhlTeam]:
     """
         returns two entries in a List. The first entry is for the home team and the second is the away team.
         Each entry represents 1 game played.
@@ -360,6 +505,8 @@ def scrape_team_stats(game_id: int) -> List[NhlTeam]:
         ----------
         game_id: int
             game id we are retrieving data for
+        mode: str
+            'feed' or 'boxscore', see fetch_game. None uses DEFAULT_FETCH_MODE
 
         Returns
         -------
@@ -367,15 +514,7 @@ def scrape_team_stats(game_id: int) -> List[NhlTeam]:
             list containing an entry for the home team and away team playing in the same game
         """
 
-    session = requests.Session()
-    retry = Retry(connect=3, backoff_factor=0.5)
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-
-    url = f'https://statsapi.web.nhl.com/api/v1/game/{str(game_id)}/feed/live'
-    resp = session.get(url)
-    json_data = json.loads(resp.text)
+    json_data = fetch_game(game_id, 'team_stats', mode)
 
     # RETRIEVE STATS REQUIRED
 
@@ -444,7 +583,7 @@ def scrape_team_stats(game_id: int) -> List[NhlTeam]:
 
     return teams
 
-def scrape_player_stats(game_id: int) -> List[NhlPlayer]:
+def scrape_player_stats(game_id: int, mode: str=None) -> List[NhlPlayer]:
     """
     retrieves all player stats for the specified game_id
 
@@ -455,6 +594,8 @@ def scrape_player_stats(game_id: int) -> List[NhlPlayer]:
     ----------
     game_id: int
         game_id for which all player stats will be retrieved
+    mode: str
+        'feed' or 'boxscore', see fetch_game. None uses DEFAULT_FETCH_MODE
 
     Returns
     -------
@@ -462,16 +603,7 @@ def scrape_player_stats(game_id: int) -> List[NhlPlayer]:
         list containing all players playing in the provided game
     """
 
-    # backoff strategy to avoid max retry errors
-    session = requests.Session()
-    retry = Retry(connect=3, backoff_factor=0.5)
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-
-    url = f'https://statsapi.web.nhl.com/api/v1/game/{str(game_id)}/feed/live'
-    resp = session.get(url)
-    json_data = json.loads(resp.text)
+    json_data = fetch_game(game_id, 'player_stats', mode)
 
     # RETRIEVE STATS REQUIRED
 
@@ -506,7 +638,7 @@ def scrape_player_stats(game_id: int) -> List[NhlPlayer]:
 
 
 
-def scrape_goalie_stats(game_id: int) -> List[NhlGoalie]:
+def scrape_goalie_stats(game_id: int, mode: str=None) -> List[NhlGoalie]:
     """
         retrieves a list of NhlGoalie containing goalie stats for all goalies that played in the game
         specified by game_id
@@ -519,22 +651,15 @@ def scrape_goalie_stats(game_id: int) -> List[NhlGoalie]:
         ----------
         game_id: int
             game id we are retrieving data for
+        mode: str
+            'feed' or 'boxscore', see fetch_game. None uses DEFAULT_FETCH_MODE
 
         Returns
         -------
         team_stats: List[NhlTeam]
             list containing an entry for the home team and away team playing in the same game
         """
-    # backoff strategy to avoid max retry errors
-    session = requests.Session()
-    retry = Retry(connect=3, backoff_factor=0.5)
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-
-    url = f'https://statsapi.web.nhl.com/api/v1/game/{str(game_id)}/feed/live'
-    resp = session.get(url)
-    json_data = json.loads(resp.text)
+    json_data = fetch_game(game_id, 'goalie_stats', mode)
 
     # RETRIEVE STATS REQUIRED
 
@@ -727,7 +852,7 @@ def scrape_goalie_stats(game_id: int) -> List[NhlGoalie]:
 
     return goalie_stats
 
-def scrape_game_info(game_id:int) -> NhlGame:
+def scrape_game_info(game_id:int, mode: str=None) -> NhlGame:
     """
         returns an NhlGame object with parameters for the game_id provided
 
@@ -739,21 +864,15 @@ def scrape_game_info(game_id:int) -> NhlGame:
         ----------
         game_id: int
             game id we are retrieving data for
+        mode: str
+            'feed' or 'boxscore', see fetch_game. None uses DEFAULT_FETCH_MODE
 
         Returns
         -------
         game: NhlGame
             NhlGame object with info for the game_id provided
         """
-    session = requests.Session()
-    retry = Retry(connect=3, backoff_factor=0.5)
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-
-    url = f'https://statsapi.web.nhl.com/api/v1/game/{str(game_id)}/feed/live'
-    resp = session.get(url)
-    json_data = json.loads(resp.text)
+    json_data = fetch_game(game_id, 'game_info', mode)
 
     # RETRIEVE INFO REQUIRED
 
@@ -796,7 +915,7 @@ def scrape_game_info(game_id:int) -> NhlGame:
                         away_goalie_name=away_team_starting_goalie_name)
     return game_info
 
-def scrape_prediction_game_info(game_id:int, string_date:str) -> NhlGame:
+def scrape_prediction_game_info(game_id:int, string_date:str, mode: str=None) -> NhlGame:
     """
     returns an NhlGame object with parameters for the game_id provided for prediction use
 
@@ -808,21 +927,15 @@ def scrape_prediction_game_info(game_id:int, string_date:str) -> NhlGame:
         ----------
         game_id: int
             game id we are retrieving data for
+        mode: str
+            'feed' or 'boxscore', see fetch_game. None uses DEFAULT_FETCH_MODE
 
         Returns
         -------
         game: NhlGame
             NhlGame object with info for the game_id provided
     """
-    session = requests.Session()
-    retry = Retry(connect=3, backoff_factor=0.5)
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-
-    url = f'https://statsapi.web.nhl.com/api/v1/game/{str(game_id)}/feed/live'
-    resp = session.get(url)
-    json_data = json.loads(resp.text)
+    json_data = fetch_game(game_id, 'prediction', mode)
 
     # RETRIEVE INFO REQUIRED
 
@@ -846,7 +959,7 @@ def scrape_prediction_game_info(game_id:int, string_date:str) -> NhlGame:
                         home_goalie_name=home_goalie_name, away_goalie_name=away_goalie_name)
     return game_info
 
-def scrape_prediction_team_stats(game_id: int, string_date:str) -> List[NhlTeam]:
+def scrape_prediction_team_stats(game_id: int, string_date:str, mode: str=None) -> List[NhlTeam]:
     """
         returns two entries in a List. The first entry is for the home team and the second is the away team.
         Each entry represents 1 game that will be played
@@ -859,6 +972,8 @@ def scrape_prediction_team_stats(game_id: int, string_date:str) -> List[NhlTeam]
         ----------
         game_id: int
             game id we are retrieving data for
+        mode: str
+            'feed' or 'boxscore', see fetch_game. None uses DEFAULT_FETCH_MODE
 
         Returns
         -------
@@ -866,15 +981,7 @@ def scrape_prediction_team_stats(game_id: int, string_date:str) -> List[NhlTeam]
             list containing an entry for the home team and away team playing in the same game
     """
 
-    session = requests.Session()
-    retry = Retry(connect=3, backoff_factor=0.5)
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-
-    url = f'https://statsapi.web.nhl.com/api/v1/game/{str(game_id)}/feed/live'
-    resp = session.get(url)
-    json_data = json.loads(resp.text)
+    json_data = fetch_game(game_id, 'prediction', mode)
 
     # RETRIEVE STATS REQUIRED
 
@@ -926,7 +1033,7 @@ def scrape_prediction_team_stats(game_id: int, string_date:str) -> List[NhlTeam]
 
     return teams
 
-def scrape_prediction_goalie_stats(game_id: int, string_date:str) -> List[NhlGoalie]:
+def scrape_prediction_goalie_stats(game_id: int, string_date:str, mode: str=None) -> List[NhlGoalie]:
     """
         retrieves a list of NhlGoalie containing goalie stats for all goalies that played in the game
         specified by game_id
@@ -939,22 +1046,15 @@ def scrape_prediction_goalie_stats(game_id: int, string_date:str) -> List[NhlGoa
         ----------
         game_id: int
             game id we are retrieving data for
+        mode: str
+            'feed' or 'boxscore', see fetch_game. None uses DEFAULT_FETCH_MODE
 
         Returns
         -------
         team_stats: List[NhlTeam]
             list containing an entry for the home team and away team playing in the same game
         """
-    # backoff strategy to avoid maxretry errors
-    session = requests.Session()
-    retry = Retry(connect=3, backoff_factor=0.5)
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-
-    url = f'https://statsapi.web.nhl.com/api/v1/game/{str(game_id)}/feed/live'
-    resp = session.get(url)
-    json_data = json.loads(resp.text)
+    json_data = fetch_game(game_id, 'prediction', mode)
 
     # RETRIEVE STATS REQUIRED
 
@@ -997,7 +1097,7 @@ def scrape_prediction_goalie_stats(game_id: int, string_date:str) -> List[NhlGoa
 
     return goalie_stats
 
-def retrieve_team(game_id: int, home: bool) -> str:
+def retrieve_team(game_id: int, home: bool, mode: str=None) -> str:
     """
     retrieves the team abbreviation playing in an NHL game
 
@@ -1009,6 +1109,8 @@ def retrieve_team(game_id: int, home: bool) -> str:
         game id we are retrieving data for
     home: bool
         if True retrieves the home team, False retrieves away
+    mode: str
+        'feed' or 'boxscore', see fetch_game. None uses DEFAULT_FETCH_MODE
 
     Returns
     -------
@@ -1016,9 +1118,7 @@ def retrieve_team(game_id: int, home: bool) -> str:
         team abbreviation
     """
 
-    url = f'https://statsapi.web.nhl.com/api/v1/game/{str(game_id)}/feed/live'
-    resp = requests.get(url)
-    json_data = json.loads(resp.text)
+    json_data = fetch_game(game_id, 'team', mode)
 
     if home:
         team = json_data['gameData']['teams']['home']['abbreviation']
@@ -1027,7 +1127,7 @@ def retrieve_team(game_id: int, home: bool) -> str:
 
     return team
 
-def retrieve_date(game_id: int) -> dt.datetime:
+def retrieve_date(game_id: int, mode: str=None) -> dt.datetime:
     """
     retrieves the date an NHL game was played
 
@@ -1037,15 +1137,15 @@ def retrieve_date(game_id: int) -> dt.datetime:
     ----------
     game_id: int
         game id we are retrieving data for
+    mode: str
+        'feed' or 'boxscore', see fetch_game. None uses DEFAULT_FETCH_MODE
 
     Returns
     -------
     date: dt.datetime
         date that NHL game was played
     """
-    url = f'https://statsapi.web.nhl.com/api/v1/game/{str(game_id)}/feed/live'
-    resp = requests.get(url)
-    json_data = json.loads(resp.text)
+    json_data = fetch_game(game_id, 'date', mode)
 
     date = json_data['gameData']['datetime']['dateTime']
     date = dt.datetime.strptime(date, '%Y-%m-%dT%H:%M:%SZ')
@@ -1102,6 +1202,7 @@ def get_starting_goalies(home_abv: str, away_abv: str, date: str) -> (str, str):
     # Need headers as daily faceoff will block the get request without one
     headers = {'User-Agent':'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/86.0.4240.193 Safari/537.36'}
     result = requests.get(url, headers=headers)
+    instrument.count('http_requests')
 
     # Parse the data
     src = result.content
@@ -1145,6 +1246,7 @@ def convert_player_to_id(team_name: str, player_name: str):
     """
     url = f'https://statsapi.web.nhl.com/api/v1/teams'
     resp = requests.get(url)
+    instrument.count('http_requests')
     json_data = json.loads(resp.text)
 
     for team in json_data['teams']:
@@ -1155,6 +1257,7 @@ def convert_player_to_id(team_name: str, player_name: str):
     # Use the team id to go to team page
     url = f'https://statsapi.web.nhl.com/api/v1/teams/{team_id}?expand=team.roster'
     resp = requests.get(url)
+    instrument.count('http_requests')
     json_data = json.loads(resp.text)
 
     team_roster = json_data['teams'][0]['roster']['roster']
@@ -1188,52 +1291,68 @@ def get_starting_goalies(home_abv, away_abv, date):
         away goalie name
     """
 
-    # First define a dictionary to translate team abbreviations in our df to the team names used on daily
-    # faceoff
-
-    team_translations = {'MIN':'Minnesota Wild','TOR':'Toronto Maple Leafs',
-                         'PIT':'Pittsburgh Penguins', 'COL':'Colorado Avalanche',
-                         'EDM':'Edmonton Oilers', 'CAR':'Carolina Hurricanes',
-                         'CBJ':'Columbus Blue Jackets', 'NJD':'New Jersey Devils',
-                         'DET':'Detroit Red Wings', 'OTT':'Ottawa Senators',
-                         'BOS':'Boston Bruins', 'SJS':'San Jose Sharks',
-                         'BUF':'Buffalo Sabres','NYI':'New York Islanders',
-                         'WSH':'Washington Capitals','TBL':'Tampa Bay Lightning',
-                         'STL':'St Louis Blues', 'NSH':'Nashville Predators',
-                         'CHI':'Chicago Blackhawks', 'VAN':'Vancouver Canucks',
-                         'CGY':'Calgary Flames', 'PHI':'Philadelphia Flyers',
-                         'LAK':'Los Angeles Kings', 'MTL':'Montreal Canadiens',
-                         'ANA':'Anaheim Ducks', 'DAL':'Dallas Stars',
-                         'NYR':'New York Rangers', 'FLA':'Florida Panthers',
-                         'WPG':'Winnipeg Jets', 'ARI':'Arizona Coyotes',
-                         'VGK':'Vegas Golden Knights'}
-
-    home_team = team_translations[home_abv]
-    away_team = team_translations[away_abv]
+    home_team = TEAM_NAMES[home_abv]
+    away_team = TEAM_NAMES[away_abv]
 
     url = f'https://www.dailyfaceoff.com/starting-goalies/{date}'
 
     # Need headers as daily faceoff will block the get request without one
     headers = {'User-Agent':'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/86.0.4240.193 Safari/537.36'}
     result = requests.get(url, headers=headers)
+    instrument.count('http_requests')
 
-    # Parse the data
-    src = result.content
-    soup = BeautifulSoup(src, 'lxml')
+    return parse_starting_goalies(result.content, home_team, away_team)
 
-    goalie_boxes = soup.find_all('div', {'class':'starting-goalies-card stat-card'})
+def parse_starting_goalies(src, home_team: str, away_team: str, backend: str=None) -> (str, str):
+    """
+    finds the starting goalies of a game on a dailyfaceoff.com starting goalies page
+
+    ...
+
+    Parameters
+    ----------
+    src: bytes or str
+        body of the starting goalies page
+    home_team: str
+        full name of the home team (ex. 'Toronto Maple Leafs')
+    away_team: str
+        full name of the away team
+    backend: str
+        'lxml' selects the goalie boxes with xpath on an lxml tree, 'bs4' parses only the goalie boxes
+        with BeautifulSoup. None uses lxml when it is installed
+
+    Returns
+    -------
+    home_goalie: str
+        home_goalie name
+    away_goalie: str
+        away goalie name
+    """
+    if backend is None:
+        backend = 'lxml' if lxml_html is not None else 'bs4'
+
+    if backend == 'lxml':
+        goalie_boxes = lxml_html.fromstring(src).xpath("//div[@class='starting-goalies-card stat-card']")
+        box_text = lambda box: box.text_content()
+        h4_text = lambda box: [''.join(h.itertext()) for h in box.iter('h4')]
+    else:
+        strainer = SoupStrainer('div', {'class': 'starting-goalies-card stat-card'})
+        soup = BeautifulSoup(src, 'lxml' if lxml_html is not None else 'html.parser', parse_only=strainer)
+        goalie_boxes = soup.find_all('div', {'class':'starting-goalies-card stat-card'})
+        box_text = lambda box: box.text
+        h4_text = lambda box: [h.text for h in box.find_all('h4')]
 
     # find the goalie box that contains the games we are looking for
     for count, box in enumerate(goalie_boxes):
-        if home_team and away_team in box.text:
+        if home_team and away_team in box_text(box):
             goalie_box = goalie_boxes[count]
         else:
             continue
     # retrieve the h4 headings which contain the starting goalies
-    h4 = goalie_box.find_all('h4')
+    h4 = h4_text(goalie_box)
     # Away goalie is at element 1 and home goalie is at element 2
-    away_goalie = h4[1].text
-    home_goalie = h4[2].text
+    away_goalie = h4[1]
+    home_goalie = h4[2]
 
     return home_goalie, away_goalie
 
@@ -0,0 +1,359 @@
+# This module defines the sportsbook odds store and the odds conversions.
+# Moneylines scraped from covers.com are kept as a typed season partitioned table so the sportsbook baseline can be
+# loaded for any date range, and every conversion works on whole numpy arrays instead of one game at a time.
+# covers.com only lists the home moneyline, so the sportsbook's margin cannot be removed and every implied
+# probability includes it.
+
+import datetime as dt
+from nhl_mlmodel.covers_scraper import covers_scraper
+from nhl_mlmodel.storage import storage
+import numpy as np
+import pandas as pd
+from typing import List
+
+# column types of the odds table
+ODDS_DTYPES = {'game_id': 'Int64', 'home_team': 'string', 'away_team': 'string', 'home_ml': 'Int32',
+               'home_score': 'Int16', 'away_score': 'Int16'}
+
+# covers.com team abbreviations that differ from the statsapi abbreviations used in our dataframes
+TEAM_ABBREVIATIONS = {'ANH': 'ANA', 'CAL': 'CGY', 'CLB': 'CBJ', 'CLS': 'CBJ', 'FLO': 'FLA', 'LA': 'LAK',
+                      'MON': 'MTL', 'NAS': 'NSH', 'NJ': 'NJD', 'PHO': 'PHX', 'SJ': 'SJS', 'TB': 'TBL',
+                      'VEG': 'VGK', 'WAS': 'WSH', 'WIN': 'WPG'}
+
+# columns that identify a game in the join index
+INDEX_KEY = ['date', 'home_team', 'away_team']
+
+def american_to_decimal(moneyline) -> np.ndarray:
+    """
+    converts american moneyline odds to decimal odds (the total payout per unit staked)
+    ...
+
+    Parameters
+    ----------
+    moneyline: array like
+        american odds (ex. -150, 130)
+
+    Returns
+    -------
+    decimal: np.ndarray
+        decimal odds (ex. 1.667, 2.3)
+    """
+    moneyline = np.asarray(moneyline, dtype=np.float64)
+    return np.where(moneyline < 0, 1 + 100 / -moneyline, 1 + moneyline / 100)
+
+def decimal_to_american(decimal) -> np.ndarray:
+    """
+    converts decimal odds to american moneyline odds
+    ...
+
+    Parameters
+    ----------
+    decimal: array like
+        decimal odds (ex. 1.667, 2.3)
+
+    Returns
+    -------
+    moneyline: np.ndarray
+        american odds (ex. -150, 130)
+    """
+    decimal = np.asarray(decimal, dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        return np.where(decimal >= 2, (decimal - 1) * 100, -100 / (decimal - 1))
+
+def implied_probability(moneyline) -> np.ndarray:
+    """
+    converts american moneyline odds to the probability they imply, including the sportsbook's margin
+    ...
+
+    Parameters
+    ----------
+    moneyline: array like
+        american odds (ex. -150, 130)
+
+    Returns
+    -------
+    probability: np.ndarray
+        implied probability (ex. 0.6, 0.435)
+    """
+    moneyline = np.asarray(moneyline, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(moneyline < 0, moneyline / (moneyline - 100), 100 / (moneyline + 100))
+
+def probability_to_american(probability) -> np.ndarray:
+    """
+    converts a probability to the american moneyline odds with no margin (the fair line)
+    ...
+
+    Parameters
+    ----------
+    probability: array like
+        win probability
+
+    Returns
+    -------
+    moneyline: np.ndarray
+        american odds
+    """
+    return decimal_to_american(1 / np.asarray(probability, dtype=np.float64))
+
+def games_to_frame(games: List[covers_scraper.NhlGame]) -> pd.DataFrame:
+    """
+    makes a typed odds dataframe from covers_scraper NhlGame objects. moneylines and scores that are
+    missing on the page become NA
+    ...
+
+    Parameters
+    ----------
+    games: List[covers_scraper.NhlGame]
+        list of NhlGame objects
+
+    Returns
+    -------
+    odds_df: pd.DataFrame
+        one row per game with date, game_id (covers event id), home_team, away_team, home_ml, home_score
+        and away_score
+    """
+    df = pd.DataFrame.from_records([g.to_dict() for g in games], columns=['date'] + list(ODDS_DTYPES))
+    df['date'] = pd.to_datetime(df['date'])
+
+    for c, dtype in ODDS_DTYPES.items():
+        if dtype != 'string':
+            df[c] = pd.to_numeric(df[c].replace('', np.nan), errors='coerce')
+        df[c] = df[c].astype(dtype)
+
+    return df
+
+def write_odds(odds_df: pd.DataFrame, data_dir: str) -> str:
+    """
+    writes odds to the season partitioned 'odds' dataset. seasons in odds_df replace the stored seasons
+    ...
+
+    Parameters
+    ----------
+    odds_df: pd.DataFrame
+        dataframe returned by games_to_frame
+    data_dir: str
+        root data directory
+
+    Returns
+    -------
+    path: str
+        directory the dataset was written to
+    """
+    return storage.write_frame(odds_df, 'odds', data_dir)
+
+def read_odds(data_dir: str, start_date: dt.datetime=None, end_date: dt.datetime=None) -> pd.DataFrame:
+    """
+    loads the stored odds between two dates
+    ...
+
+    Parameters
+    ----------
+    data_dir: str
+        root data directory
+    start_date: dt.datetime
+        only load games on or after this date
+    end_date: dt.datetime
+        only load games before this date
+
+    Returns
+    -------
+    odds_df: pd.DataFrame
+        odds with the column types of games_to_frame
+    """
+    df = storage.read_frame('odds', data_dir, start_date=start_date, end_date=end_date)
+    return df.astype(ODDS_DTYPES)
+
+def build_odds_store(seasons: List[int], data_dir: str, cache_dir: str=None) -> pd.DataFrame:
+    """
+    crawls the covers.com matchup pages of every season and writes them to the odds store
+    ...
+
+    Parameters
+    ----------
+    seasons: List[int]
+        seasons to crawl (ex. [20182019, 20192020])
+    data_dir: str
+        root data directory
+    cache_dir: str
+        directory of the covers page cache. None disables the cache
+
+    Returns
+    -------
+    odds_df: pd.DataFrame
+        odds of all the seasons
+    """
+    frames = []
+    for season in seasons:
+        odds_df = games_to_frame(covers_scraper.crawl_season(season, cache_dir))
+        write_odds(odds_df, data_dir)
+        frames.append(odds_df)
+
+    return pd.concat(frames, ignore_index=True)
+
+def sportsbook_baseline(odds_df: pd.DataFrame, exclude_tossups: bool=True) -> pd.DataFrame:
+    """
+    calculates the sportsbook's prediction for every game with a moneyline and a final score
+    ...
+
+    Parameters
+    ----------
+    odds_df: pd.DataFrame
+        odds dataframe
+    exclude_tossups: bool
+        drop games with a home moneyline of +100
+
+    Returns
+    -------
+    baseline_df: pd.DataFrame
+        odds_df with home_team_win (outcome), sb_home_win (True if the home team was favoured) and
+        sb_home_win_percent (implied probability of the home team winning, including the margin) added
+    """
+    complete = odds_df['home_ml'].notna() & odds_df['home_score'].notna() & odds_df['away_score'].notna()
+    if exclude_tossups:
+        complete &= odds_df['home_ml'] != 100
+
+    baseline_df = odds_df[complete.to_numpy(dtype=bool)].reset_index(drop=True)
+    moneyline = baseline_df['home_ml'].to_numpy(dtype=np.float64)
+
+    baseline_df['home_team_win'] = (baseline_df['home_score'] > baseline_df['away_score']).to_numpy(dtype=bool)
+    baseline_df['sb_home_win'] = moneyline < 0
+    baseline_df['sb_home_win_percent'] = implied_probability(moneyline)
+
+    return baseline_df
+
+def normalize_teams(teams: pd.Series) -> pd.Series:
+    """
+    converts covers.com team abbreviations to the statsapi abbreviations (ex. 'T.B' and 'TB' to 'TBL')
+    ...
+
+    Parameters
+    ----------
+    teams: pd.Series
+        team abbreviations
+
+    Returns
+    -------
+    teams: pd.Series
+        statsapi team abbreviations
+    """
+    teams = teams.astype('string').str.strip().str.upper().str.replace('.', '', regex=False)
+    return teams.replace(TEAM_ABBREVIATIONS)
+
+def eastern_date(dates: pd.Series) -> pd.Series:
+    """
+    converts the utc start times of statsapi games to the date in eastern time, the date the game is
+    listed under on covers.com. late games in the west start after midnight utc
+    ...
+
+    Parameters
+    ----------
+    dates: pd.Series
+        naive utc start times
+
+    Returns
+    -------
+    dates: pd.Series
+        naive dates at midnight
+    """
+    dates = pd.to_datetime(dates).dt.tz_localize('UTC').dt.tz_convert('America/New_York')
+    return dates.dt.tz_localize(None).dt.normalize()
+
+def build_game_index(odds_df: pd.DataFrame, games_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    matches covers.com games to statsapi games by the eastern date and the normalized home and away teams
+    ...
+
+    Parameters
+    ----------
+    odds_df: pd.DataFrame
+        odds dataframe, game_id holds the covers event id
+    games_df: pd.DataFrame
+        dataframe with the statsapi game_id, date (utc start time), home_team and away_team
+
+    Returns
+    -------
+    index_df: pd.DataFrame
+        one row per matched game with date, home_team, away_team, covers_id and game_id (statsapi id)
+    """
+    covers = pd.DataFrame({'date': pd.to_datetime(odds_df['date']).dt.normalize(),
+                           'home_team': normalize_teams(odds_df['home_team']),
+                           'away_team': normalize_teams(odds_df['away_team']),
+                           'covers_id': odds_df['game_id'].astype('Int64')})
+    statsapi = pd.DataFrame({'date': eastern_date(games_df['date']),
+                             'home_team': games_df['home_team'].astype('string'),
+                             'away_team': games_df['away_team'].astype('string'),
+                             'game_id': games_df['game_id'].astype('Int64')})
+
+    # a key that appears twice on either side cannot be matched with confidence
+    covers = covers.drop_duplicates(INDEX_KEY, keep=False)
+    statsapi = statsapi.drop_duplicates(INDEX_KEY, keep=False)
+
+    index_df = covers.merge(statsapi, on=INDEX_KEY, how='inner', validate='one_to_one')
+    return index_df.sort_values(by=['date', 'game_id'], kind='mergesort').reset_index(drop=True)
+
+def write_game_index(index_df: pd.DataFrame, data_dir: str) -> str:
+    """
+    writes the join index to the season partitioned 'odds_index' dataset
+    ...
+
+    Parameters
+    ----------
+    index_df: pd.DataFrame
+        dataframe returned by build_game_index
+    data_dir: str
+        root data directory
+
+    Returns
+    -------
+    path: str
+        directory the dataset was written to
+    """
+    return storage.write_frame(index_df, 'odds_index', data_dir)
+
+def read_game_index(data_dir: str, start_date: dt.datetime=None, end_date: dt.datetime=None) -> pd.DataFrame:
+    """
+    loads the stored join index between two dates
+    ...
+
+    Parameters
+    ----------
+    data_dir: str
+        root data directory
+    start_date: dt.datetime
+        only load games on or after this date (eastern time)
+    end_date: dt.datetime
+        only load games before this date (eastern time)
+
+    Returns
+    -------
+    index_df: pd.DataFrame
+        join index with date, home_team, away_team, covers_id and game_id
+    """
+    return storage.read_frame('odds_index', data_dir, start_date=start_date, end_date=end_date)
+
+def attach_odds(games_df: pd.DataFrame, odds_df: pd.DataFrame, index_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    adds the covers.com moneyline and final score to statsapi games. games without a match get NA
+    ...
+
+    Parameters
+    ----------
+    games_df: pd.DataFrame
+        dataframe with the statsapi game_id
+    odds_df: pd.DataFrame
+        odds dataframe
+    index_df: pd.DataFrame
+        join index returned by build_game_index
+
+    Returns
+    -------
+    games_df: pd.DataFrame
+        games_df with home_ml, home_score and away_score added
+    """
+    matched = index_df[['covers_id', 'game_id']].merge(
+        odds_df[['game_id', 'home_ml', 'home_score', 'away_score']].rename(columns={'game_id': 'covers_id'}),
+        on='covers_id', how='inner').drop(columns='covers_id').drop_duplicates('game_id')
+
+    games_df = games_df.assign(game_id=games_df['game_id'].astype('Int64'))
+    return games_df.merge(matched, on='game_id', how='left')
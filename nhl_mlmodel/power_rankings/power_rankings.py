@@ -5,12 +5,11 @@
 #   Glicko
 #   TrueSkill
 
-from elote import EloCompetitor
-from elote import GlickoCompetitor
+# elote and trueskill are imported by the rating functions. elote imports matplotlib, which would otherwise be paid
+# for by every import of this module even when no ratings are created
 import pickle
 import pandas as pd
 import sys
-from trueskill import Rating, quality, rate
 
 # Show full columns on dataframes
 pd.set_option('display.expand_frame_repr', False)
@@ -30,6 +29,8 @@ def fast_elo_ratings(df):
     df: pd.DataFrame
         with fast moving elo ratings added
     """
+    from elote import EloCompetitor
+
     ratings = {}
     for x in df.home_team.unique():
         ratings[x] = EloCompetitor()
@@ -47,7 +48,9 @@ def fast_elo_ratings(df):
         home_team_elo.append(ratings[r.home_team].rating)
         away_team_elo.append(ratings[r.away_team].rating)
 
-        # update ratings
+        # update ratings. games that have not been played yet do not change the ratings
+        if pd.isna(r.home_team_win):
+            continue
         if r.home_team_win:
             ratings[r.home_team].beat(ratings[r.away_team])
         else:
@@ -74,6 +77,8 @@ def slow_elo_ratings(df):
     df: pd.DataFrame
         with slow moving elo ratings added
     """
+    from elote import EloCompetitor
+
     ratings = {}
 
     # Obtain team names
@@ -95,7 +100,9 @@ def slow_elo_ratings(df):
         home_team_elo.append(ratings[r.home_team].rating)
         away_team_elo.append(ratings[r.away_team].rating)
 
-        # update ratings
+        # update ratings. games that have not been played yet do not change the ratings
+        if pd.isna(r.home_team_win):
+            continue
         if r.home_team_win:
             ratings[r.home_team].beat(ratings[r.away_team])
         else:
@@ -122,6 +129,8 @@ def glicko(df):
     df: pd.DataFrame
         with fast moving glicko added
     """
+    from elote import GlickoCompetitor
+
     ratings = {}
     for x in df.home_team.unique():
         ratings[x] = GlickoCompetitor()
@@ -138,7 +147,9 @@ def glicko(df):
         glick_exp.append(ratings[r.home_team].expected_score(ratings[r.away_team]))
         home_team_glick.append(ratings[r.home_team].rating)
         away_team_glick.append(ratings[r.away_team].rating)
-        # update ratings
+        # update ratings. games that have not been played yet do not change the ratings
+        if pd.isna(r.home_team_win):
+            continue
         if r.home_team_win:
             ratings[r.home_team].beat(ratings[r.away_team])
         else:
@@ -165,6 +176,8 @@ def trueskill(df):
     df: pd.DataFrame
         with trueskill ratings added
     """
+    from trueskill import Rating, quality, rate
+
     ratings = {}
     for x in df.home_team.unique():
         ratings[x] = Rating(25)
@@ -196,7 +209,7 @@ def trueskill(df):
         home_team_ts.append(ratings[r.home_team].mu)
         away_team_ts.append(ratings[r.away_team].mu)
 
-        if r.date < df.date.max():
+        if r.date < df.date.max() and not pd.isna(r.home_team_win):
             # update ratings dictionary with post-match ratings
             if r.home_team_win:
                 match = [(ratings[r.home_team], ratings[r.home_goalie_id]),
@@ -219,5 +232,38 @@ def trueskill(df):
 
     return df
 
+# rating systems and the columns they add to the games dataframe
+RATING_SYSTEMS = [
+    (fast_elo_ratings, ['elo_exp', 'home_team_elo', 'away_team_elo']),
+    (slow_elo_ratings, ['slow_elo_exp', 'home_team_slow_elo', 'away_team_slow_elo']),
+    (glicko, ['glick_exp', 'home_team_glick', 'away_team_glick']),
+    (trueskill, ['ts_game_quality', 'goalie_ts_diff', 'team_ts_diff', 'home_goalie_ts', 'away_goalie_ts',
+                 'home_team_ts', 'away_team_ts']),
+]
+
+def add_ratings(df, requested_cols=None):
+    """
+    adds the power rankings to the games dataframe. only the rating systems that produce one of the
+    requested columns are calculated
+    ...
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        games dataframe
+    requested_cols: List[str]
+        columns that are needed (ex. the features of the model). None adds every rating system
+
+    Returns
+    -------
+    df: pd.DataFrame
+        with the requested ratings added
+    """
+    for rating_system, columns in RATING_SYSTEMS:
+        if requested_cols is None or set(columns) & set(requested_cols):
+            df = rating_system(df)
+
+    return df
+
 if __name__ == '__main__':
     pass
\ No newline at end of file
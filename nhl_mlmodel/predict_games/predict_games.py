@@ -1,10 +1,13 @@
 import datetime as dt
+from nhl_mlmodel.game_store import game_store
+from nhl_mlmodel.instrument import instrument
+from nhl_mlmodel.model_server import model_server
 import json
 from nhl_mlmodel.power_rankings import power_rankings
-from nhl_mlmodel.predict_games import helpers
 from nhl_mlmodel.process_data import process_data
 from nhl_mlmodel.nhl_scraper import nhl_scraper
-import numpy as np
+from nhl_mlmodel.storage import storage
+import os
 import pandas as pd
 import pickle
 import requests
@@ -57,12 +60,12 @@ def pull_predict_team_stats(game_ids: List[int], string_date:str) -> List[nhl_sc
     # retrieve game by game stats for every game in the game_ids list
     team_stats = []
 
-    for i in game_ids:
+    for count, i in enumerate(game_ids, 1):
         stats_i = nhl_scraper.scrape_prediction_team_stats(i,string_date)
         team_stats += stats_i
 
-        if len(team_stats) % 500 == 0:  # Progress bar
-            print(str(0.5 * len(team_stats) / len(game_ids) * 100) + ' percent done retrieving game data/stats.')
+        # count games rather than stats, every game has two teams
+        instrument.progress('team stats', count, len(game_ids))
 
     return team_stats
 
@@ -83,12 +86,12 @@ def pull_predict_goalie_stats(game_ids: List[int], string_date:str) -> List[nhl_
         """
 
     goalie_stats=[]
-    for i in game_ids:
+    for count, i in enumerate(game_ids, 1):
         goalies_i = nhl_scraper.scrape_prediction_goalie_stats(i, string_date)
         goalie_stats += goalies_i
 
-        if len(goalie_stats) % 250 == 0:  # Progress bar # todo fix progress bar to account for more goalies than game ids
-            print(str(0.5 * len(goalie_stats) / len(game_ids) * 100) + ' percent done retrieving goalie data.')
+        # count games rather than goalies, a game can have more than two goalies
+        instrument.progress('goalie stats', count, len(game_ids))
 
     return goalie_stats
 
@@ -113,438 +116,14 @@ def pull_predict_game_info(game_ids: List[int], string_date:str) -> List[nhl_scr
     # retrieve game by game info for every game in the game_ids list
     games_info = []
 
-    for i in game_ids:
+    for count, i in enumerate(game_ids, 1):
         game_i = nhl_scraper.scrape_prediction_game_info(i, string_date)
         games_info.append(game_i)
 
-        if len(games_info) % 500 == 0:  # Progress bar
-            print(str(len(games_info) / len(game_ids) * 100) + ' percent done retrieving game data/stats.')
+        instrument.progress('game info', count, len(game_ids))
     return games_info
 
-def make_teams_df(team_stats: List[nhl_scraper.NhlTeam]) -> pd.DataFrame:
-    """
-        makes a dataframe from a list of NhlTeam objects
-        ...
-
-        Parameters
-        ----------
-        team_stats: List[nhl_scraper.NhlTeam]
-            list of NhlTeam objects
-
-        Returns
-        -------
-        teams_df: pd.DataFrame
-            each row of dataframe represents stats for 1 team in 1 game. Therefore each game will have
-            2 rows one for the home team and one for away.
-        """
-
-    teams_df = pd.DataFrame.from_records([t.to_dict() for t in team_stats])
-    return teams_df
-
-def make_goalies_df(goalie_stats: List[nhl_scraper.NhlGoalie]) -> pd.DataFrame:
-    """
-        makes a dataframe from a list of NhlGoalie objects
-        ...
-
-        Parameters
-        ----------
-        goalie_stats: List[nhl_scraper.NhlGoalie]
-            list of NhlGoalie objects
-
-        Returns
-        -------
-        goalies_df: pd.DataFrame
-            each row of dataframe represents stats for 1 goalie in 1 game. Therefore each game will have
-            at least 2 rows.
-        """
-
-    goalies_df = pd.DataFrame.from_records([g.to_dict() for g in goalie_stats])
-    return goalies_df
-
-def make_games_df(games_info: List[nhl_scraper.NhlGame]) -> pd.DataFrame:
-    """
-        main dataframe that will eventually get fed to the machine learning model
-        ...
-
-        Parameters
-        ----------
-        team_stats: List[nhl_scraper.NhlGoalie]
-            list of NhlTeam objects
-
-        Returns
-        -------
-        games_df: pd.DataFrame
-            each row of dataframe represents 1 NHL game
-        """
-    games_df = pd.DataFrame.from_records([g.to_dict() for g in games_info])
-    return games_df
-
-def convert_numerical(teams_df: pd.DataFrame, goalies_df: pd.DataFrame) -> (pd.DataFrame, pd.DataFrame):
-    """
-        convert non-numerical features in dataframes to numerical
-        ...
-
-        Parameters
-        ----------
-        teams_df: pd.DataFrame
-            dataframe containing team stats
-
-        goalies_df: pd.DataFrame
-            dataframe containing goalies stats
-
-        Returns
-        -------
-        teams_numerical_df: pd.DataFrame
-            teams_df converted to numerical
-        goalies_numerical_df: pd.DataFrame
-            goalies_numerical_df: pd.DataFrame
-        """
-    # CONVERT OBJECTS TO NUMERICAL
-    teams_numerical_df = teams_df.copy()
-    goalies_numerical_df = goalies_df.copy()
-    # powerPlayPercentage
-    teams_numerical_df['powerPlayPercentage'] = teams_numerical_df['powerPlayPercentage'].astype(float)
-    # faceOffWinPercentage
-    teams_numerical_df['faceOffWinPercentage'] = teams_numerical_df['faceOffWinPercentage'].astype(float)
-    # Convert Goalie timeOnIce to Minutes
-    goalies_numerical_df['timeOnIce'] = goalies_numerical_df['timeOnIce'].map(helpers.convert_minutes)
-
-    # Reset index
-    teams_numerical_df.reset_index(inplace=True)
-    goalies_numerical_df.reset_index(inplace=True)
-
-    return teams_numerical_df, goalies_numerical_df
-
-def add_pdo(teams_df: pd.DataFrame, goalies_df: pd.DataFrame) -> pd.DataFrame:
-    """
-        adds pdo as a stat to the teams_df. will also add evenStrengthGoals, evenStrengthShootingPercent
-        and evenStrengthShots.
-        ...
-
-        Parameters
-        ----------
-        teams_df: pd.DataFrame
-            dataframe containing team stats
-
-        goalies_df: pd.DataFrame
-            dataframe containing goalies stats
-
-        Returns
-        -------
-        teams_df: pd.DataFrame
-            teams_df with added stats
-        """
-    # get game ids
-    game_ids = teams_df['game_id'].to_list()
-    game_ids = helpers.remove_duplicates(game_ids)
-
-    pdos = []
-
-    for id in game_ids:
-        goalies_filtered_df = goalies_df[goalies_df['game_id'] == id]
-
-        # Filter to the home team goalies that played in that game
-        home_goalies_filtered_df = goalies_filtered_df[goalies_filtered_df['is_home_team'] == True]
-
-        # Filter to the away team goalies that played in that game
-        away_goalies_filtered_df = goalies_filtered_df[goalies_filtered_df['is_home_team'] == False]
-
-        # Away shots are taken from the home goalie stats and vice versa
-        away_es_shots = home_goalies_filtered_df['evenShotsAgainst'].sum()
-        home_es_shots = away_goalies_filtered_df['evenShotsAgainst'].sum()
-
-        away_es_goals = home_goalies_filtered_df['evenShotsAgainst'].sum() - home_goalies_filtered_df['evenSaves'].sum()
-        home_es_goals = away_goalies_filtered_df['evenShotsAgainst'].sum() - away_goalies_filtered_df['evenSaves'].sum()
-
-        # Calculate ES Sh%
-        home_es_sh_percent = home_es_goals / home_es_shots
-        away_es_sh_percent = away_es_goals / away_es_shots
-
-        # Calculate ES Sv%
-        home_es_sv_percent = (away_es_shots - away_es_goals) / away_es_shots
-        away_es_sv_percent = (home_es_shots - home_es_goals) / home_es_shots
-
-        # Calculate PDO
-        home_PDO = home_es_sh_percent + home_es_sv_percent
-        away_PDO = away_es_sh_percent + away_es_sv_percent
-
-        # Create dictionary 1 entry for each team
-        pdo_dict = [{'game_id': id, 'pdo': home_PDO, 'evenStrengthGoals' : home_es_goals, 'evenStrengthShots' : home_es_shots, 'evenStrengthShootingPercent' : home_es_sh_percent, 'is_home_team' : True},
-                    {'game_id': id, 'pdo': away_PDO, 'evenStrengthGoals' : away_es_goals, 'evenStrengthShots' : away_es_shots, 'evenStrengthShootingPercent' : away_es_sh_percent, 'is_home_team' : False}]
-        # Append to list
-        pdos += pdo_dict
-
-    # Create PDO dataframe
-    pdo_df = pd.DataFrame(pdos)
-
-    # Merge PDO's into teams_df
-    teams_df = pd.merge(teams_df, pdo_df, left_on=['game_id', 'is_home_team'],
-                          right_on=['game_id', 'is_home_team'], how='left')
-
-    return teams_df
-
-def add_sh_per(teams_df: pd.DataFrame) -> pd.DataFrame:
-    """
-    adds shooting percentage as a stat to the teams_df
-    ...
-
-    Parameters
-    ----------
-    teams_df: pd.DataFrame
-        dataframe containing team stats
-
-    Returns
-    -------
-    teams_df: pd.DataFrame
-        teams_df with shooting percentage added
-    """
-    teams_df['Shooting_Percent'] = teams_df['goals']/teams_df['shots']
-
-    return teams_df
-
-def add_rolling(period, df, stat_columns, is_goalie=False):
-    """
-    creates rolling average stats in in dataframe provided
-    ...
-
-    Parameters
-    ----------
-    period: int
-        the period for which we want to create rolling average
-    df: pd.DataFrame
-        dataframe to process
-    stat_columns: List['str']
-        list of columns in dataframe to create rolling stats for
-
-    Returns
-    -------
-    df: pd.DataFrame
-        dataframe with rolling stats added
-    """
-    for s in stat_columns:
-        if 'object' in str(df[s].dtype): continue
-        df[s+'_'+str(period)+'_avg'] = df.groupby('team')[s].apply(lambda x:x.rolling(period).mean())
-        df[s+'_'+str(period)+'_std'] = df.groupby('team')[s].apply(lambda x:x.rolling(period).std())
-        df[s+'_'+str(period)+'_skew'] = df.groupby('team')[s].apply(lambda x:x.rolling(period).skew())
-
-    return df
-
-def get_diff_df(df, name, is_goalie=False):
-    """
-    calculated stat differentials between home and away team
-    ...
-
-    Parameters
-    ----------
-    df: pd.DataFrame
-        dataframe to process
-    is_goalie: bool
-        if this is a goalie dataframe stats will be grouped by goalies instead of team
-
-    Returns
-    -------
-    diff_df: pd.DataFrame
-        dataframe with calculated stat differentials
-    """
-    # Sort by date
-    df = df.sort_values(by='date').copy()
-    newindex = df.groupby('date')['date'].apply(lambda x: x + np.arange(x.size).astype(np.timedelta64))
-    df = df.set_index(newindex).sort_index()
-
-    # get stat columns
-    stat_cols = [x for x in df.columns if 'int' in str(df[x].dtype)]
-    stat_cols.extend([x for x in df.columns if 'float' in str(df[x].dtype)])
-
-    #add rolling stats to the data frame
-    df = add_rolling(3, df, stat_cols)
-    df = add_rolling(7, df, stat_cols)
-    df = add_rolling(14, df, stat_cols)
-    df = add_rolling(41, df, stat_cols)
-    df = add_rolling(82, df, stat_cols)
-
-    # reset stat columns to just the sma features (removing the original stats)
-    df.drop(columns=stat_cols, inplace=True)
-    stat_cols = [x for x in df.columns if 'int' in str(df[x].dtype)]
-    stat_cols.extend([x for x in df.columns if 'float' in str(df[x].dtype)])
-
-    # shift results so that each row is a pregame stat
-    df = df.reset_index(drop=True)
-    df = df.sort_values(by='date')
-
-    for s in stat_cols:
-        if is_goalie:
-            df[s] = df.groupby('goalie_id')[s].shift(1)
-        else:
-            df[s] = df.groupby('team')[s].shift(1)
-
-    # calculate differences in pregame stats from home vs. away teams
-    away_df = df[~df['is_home_team']].copy()
-    away_df = away_df.set_index('game_id')
-    away_df = away_df[stat_cols]
-
-    home_df = df[df['is_home_team']].copy()
-    home_df = home_df.set_index('game_id')
-    home_df = home_df[stat_cols]
-
-    diff_df = home_df.subtract(away_df, fill_value=0)
-    diff_df = diff_df.reset_index()
-
-    # clean column names
-    for s in stat_cols:
-        diff_df[name + "_" + s] = diff_df[s]
-        diff_df.drop(columns=s, inplace=True)
-
-    return diff_df
-
-def impute_skew(df):
-    """
-    will impute NaN skew values with 0
-    ...
-
-    Parameters
-    ----------
-    df: pd.DataFrame
-        dataframe to process
-
-    Returns
-    -------
-    df: pd.DataFrame
-        dataframe with skew imputed
-    """
-    cols = list(df.columns.values)
-
-    for c in cols:
-        if 'Skew' in c:
-            df[c].fillna(0, inplace=True)
-        else:
-            continue
-
-    return df
-
-def goalie_rest(goalies_df: pd.DataFrame, games_df: pd.DataFrame) -> pd.DataFrame:
-    """
-    calculates how many rest days a goalie has had with a maximum value of 30 days
-    ...
-
-    Parameters
-    ----------
-    goalies_df: pd.DataFrame
-        goalies dataframe
-    games_df: pd.Dataframe
-        games dataframe
-
-    Returns
-    -------
-    games_df: pd.DataFrame
-        dataframe with goalie rest added
-    """
-    # It's easier with the way the goalie df is setup to calculate this in here than merge into the main dataframe
-    goalies_df['goalie_rest'] = goalies_df.groupby('goalie_id')['date'].diff().dt.days
-
-    # The first teams games in the DF are NaN as there are no previous reference points.
-    # We will fill these in with the max value of 30 days as these games were at the start of the season
-    goalies_df['goalie_rest'].fillna(30, inplace=True)
-
-    # If the days rest is over 30 just make it 30
-    goalies_df.loc[goalies_df["goalie_rest"] > 30, "goalie_rest"] = 30
-
-    # Make a dataframe just containing goalie rest data
-    goalie_rest = goalies_df[['game_id', 'goalie_id', 'goalie_rest']]
-    # Rename to Home and Away Goalie Rest
-    home_goalie_rest = goalie_rest.rename({'goalie_rest': 'home_goalie_rest'}, axis=1)
-    away_goalie_rest = goalie_rest.rename({'goalie_rest': 'away_goalie_rest'}, axis=1)
-
-    # Merge into main dataframe
-    games_df = pd.merge(games_df, home_goalie_rest, left_on=['game_id', 'home_goalie_id'],
-                            right_on=['game_id', 'goalie_id'], how='left')
-
-    games_df = pd.merge(games_df, away_goalie_rest, left_on=['game_id', 'away_goalie_id'],
-                            right_on=['game_id', 'goalie_id'], how='left')
-
-    # Remove some columns
-    games_df.drop(['goalie_id_x','goalie_id_y'], axis=1, inplace=True)
-
-    return games_df
-
-def team_rest(goalies_df: pd.DataFrame, games_df: pd.DataFrame) -> pd.DataFrame:
-    """
-    calculates how many rest days a teams has had with a maximum value of 7 days
-    ...
-
-    Parameters
-    ----------
-    goalies_df: pd.DataFrame
-        goalies dataframe
-    games_df: pd.Dataframe
-        games dataframe
-
-    Returns
-    -------
-    games_df: pd.DataFrame
-        dataframe with team rest added
-    """
-    # TEAM DAYS REST
-    # It's easier with the way the goalie df is setup to calculate this in here than merge into the main dataframe
-    # Convert date to datetime in goalie dataframe
-    goalies_df['team_rest'] = goalies_df.groupby('team')['date'].diff().dt.days
-    # The first teams games in the DF are NaN as there are no previous reference points.
-    # We will fill these in with the max value of 7 days as these games were at the start of the 2010 season
-    goalies_df['team_rest'].fillna(7, inplace=True)
-    # If the days rest is over 7 just make it 7
-    goalies_df.loc[goalies_df["team_rest"] > 7, "team_rest"] = 7
-    # Make a dataframe just containing team rest data
-    team_rest = goalies_df[['game_id', 'goalie_id', 'team_rest']]
-
-    # Rename to Home/Away Team Rest
-    home_team_rest = team_rest.rename({'team_rest': 'home_team_rest'}, axis=1)
-    away_team_rest = team_rest.rename({'team_rest': 'away_team_rest'}, axis=1)
-
-    # Convert data to same types
-    home_team_rest['game_id'] = home_team_rest['game_id'].astype('string')
-    home_team_rest['goalie_id'] = home_team_rest['goalie_id'].astype('string')
-    away_team_rest['game_id'] = away_team_rest['game_id'].astype('string')
-    away_team_rest['goalie_id'] = away_team_rest['goalie_id'].astype('string')
-
-    # Merge into main dataframe
-    games_df = pd.merge(games_df, home_team_rest, left_on=['game_id', 'home_goalie_id'],
-                            right_on=['game_id', 'goalie_id'], how='left')
-
-    games_df = pd.merge(games_df, away_team_rest, left_on=['game_id', 'away_goalie_id'],
-                            right_on=['game_id', 'goalie_id'], how='left')
-
-    # Drop some columns
-    games_df.drop(['goalie_id_x', 'goalie_id_y'], axis=1, inplace=True)
-
-    return games_df
-
-def rolling_win_percentage(games_df: pd.DataFrame, period: int) -> pd.DataFrame:
-    """
-    creates a moving average win percentage
-    ...
-
-    Parameters
-    ----------
-    games_df: pd.DataFrame
-        games dataframe
-    period: int
-        period for which we want to calculate win percentage
-
-    Returns
-    -------
-    games_df: pd.DataFrame
-        dataframe with rolling win percentage added
-    """
-    # Target Encoding, this will create a period SMA win percentage columns for the home and away teams
-    column_names = ['home_win_percent_'+str(period)+'_avg','away_win_percent_'+str(period)+'_avg']
-
-    for x in column_names:
-        if x == 'home_win_percent_'+str(period)+'_avg':
-            games_df[x] = games_df.groupby('home_team')['home_team_win'].apply(lambda x: x.rolling(period).mean()).shift(1)
-        else:
-            games_df[x] = games_df.groupby('away_team')['home_team_win'].apply(lambda x: x.rolling(period).mean()).shift(1)
-    return games_df
-
-def make_predictions(prediction_df: pd.DataFrame) -> pd.DataFrame:
+def make_predictions(prediction_df: pd.DataFrame, model_path: str) -> pd.DataFrame:
     """
     takes the prediction dataframe and runs XGBoost model to predict games
     ...
@@ -553,6 +132,8 @@ def make_predictions(prediction_df: pd.DataFrame) -> pd.DataFrame:
     ----------
     prediction_df: pd.DataFrame
         prediction dataframe
+    model_path: str
+        path to the exported booster. the model is only loaded the first time it is used in a process
 
     Returns
     -------
@@ -560,54 +141,45 @@ def make_predictions(prediction_df: pd.DataFrame) -> pd.DataFrame:
         prediction_df with added win percentage from XGBoost
     """
     # load model
-    with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/xgb_model_opt.pkl', 'rb') as f:
-        model = pickle.load(f)
-
-    # Create prediction set
-    X = prediction_df.drop(columns=['game_id', 'home_team', 'away_team', 'date', 'home_goalie_id', 'away_goalie_id', 'home_team_win'])
-
-    # Reorder columns so training and prediction sets match
-    cols_when_model_builds = model.get_booster().feature_names
-    X = X[cols_when_model_builds]
+    server = model_server.get_server(model_path)
 
     # Create prediction dataframe
-    predict_df = prediction_df[['game_id','home_team','away_team','date','home_goalie_id','away_goalie_id','home_goalie_name','away_goalie_name']]
+    predict_df = prediction_df[['game_id','home_team','away_team','date','home_goalie_id','away_goalie_id','home_goalie_name','away_goalie_name']].copy()
 
-    predict_df['xgb_home_win'] = model.predict(X).astype('bool')
-    predict_df['xgb_home_win_percent'] = model.predict_proba(X)[:,1]
+    predict_df['xgb_home_win'], predict_df['xgb_home_win_percent'] = server.predict(prediction_df)
 
     return(predict_df)
 
-if __name__ == '__main__':
-    predict_ids = main_get_predict_game_ids('2021-01-23') #####
-
-    string_date = '01-23-2021' ########
-
-    # retrieve game by game information for all predict game ids pulled
-    predict_games_info = pull_predict_game_info(predict_ids, string_date)
-
-    # retrieve team game by game stats for all predict game ids pulled
-    predict_team_stats = pull_predict_team_stats(predict_ids, string_date)
-
-    # retrieve goalie game by game stats for all predict game ids pulled
-    predict_goalie_stats = pull_predict_goalie_stats(predict_ids, string_date)
+def build_features(team_stats: List[nhl_scraper.NhlTeam], goalie_stats: List[nhl_scraper.NhlGoalie],
+                   games_info: List[nhl_scraper.NhlGame], features: List[str]=None,
+                   n_workers: int=1) -> pd.DataFrame:
+    """
+    creates the model features for every game in one pass. each game's features only use the games
+    played before it, so past and upcoming games can be built together
+    ...
 
-    # open databases
-    with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/team_stats.pkl', 'rb') as f:
-        team_stats = pickle.load(f)
-    with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/goalie_stats.pkl', 'rb') as f:
-        goalie_stats = pickle.load(f)
-    with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/games_info.pkl', 'rb') as f:
-        games_info = pickle.load(f)
-    # append prediction games to end of information lists
-    team_stats = team_stats + predict_team_stats
-    goalie_stats = goalie_stats + predict_goalie_stats
-    games_info = games_info + predict_games_info
+    Parameters
+    ----------
+    team_stats: List[nhl_scraper.NhlTeam]
+        team stats of the history and of the games to predict
+    goalie_stats: List[nhl_scraper.NhlGoalie]
+        goalie stats of the history and of the games to predict
+    games_info: List[nhl_scraper.NhlGame]
+        game information of the history and of the games to predict
+    features: List[str]
+        features to create (ex. model_server.model_features). None creates every feature
+    n_workers: int
+        number of processes used to create the rolling stats
 
+    Returns
+    -------
+    games_df: pd.DataFrame
+        one row per game with the features added
+    """
     # make dataframes games df
-    teams_df = make_teams_df(team_stats)
-    goalies_df = make_goalies_df(goalie_stats)
-    games_df = make_games_df(games_info)
+    teams_df = process_data.make_teams_df(team_stats)
+    goalies_df = process_data.make_goalies_df(goalie_stats)
+    games_df = process_data.make_games_df(games_info)
 
     # If it cannot find a goalie id replace the id with 0
     games_df['home_goalie_id'].fillna(value=0, inplace=True)
@@ -624,13 +196,14 @@ if __name__ == '__main__':
     # process data
 
     # convert to numerical
-    teams_df, goalies_df = convert_numerical(teams_df, goalies_df)
+    teams_df, goalies_df = process_data.convert_numerical(teams_df, goalies_df)
 
     # add pdo
-    teams_df = add_pdo(teams_df, goalies_df)
+    if process_data.needs_stats(features, 'teams', process_data.PDO_STATS):
+        teams_df = process_data.add_pdo(teams_df, goalies_df)
 
     # add shooting percent
-    teams_df = add_sh_per(teams_df)
+    teams_df = process_data.add_sh_per(teams_df)
 
     # remove columns that will not be used in teams_df and goalies_df
     teams_df.drop(['index'], axis=1, inplace=True)
@@ -652,78 +225,159 @@ if __name__ == '__main__':
 
     # create rolling stats in main games dataframe
 
-    games_df = pd.merge(left=games_df, right=get_diff_df(teams_df, 'teams'),
+    games_df = pd.merge(left=games_df, right=process_data.downcast_dtypes(process_data.get_diff_df(teams_df, 'teams', n_workers=n_workers, requested_cols=features)),
                   on='game_id', how='left')
 
-    print(games_df.shape)
-
-    games_df = pd.merge(left=games_df, right=get_diff_df(goalies_df, 'goalies', is_goalie=True),
+    games_df = pd.merge(left=games_df, right=process_data.downcast_dtypes(process_data.get_diff_df(goalies_df, 'goalies', is_goalie=True, n_workers=n_workers, requested_cols=features)),
                   on='game_id', how='left')
 
     # drop duplicates due to multiple goalies playing in one game
     # todo confirm if the first or last game should be kept
     games_df.drop_duplicates(subset=['game_id'], keep="last", inplace=True)
 
-    print(games_df.shape)
-
     # impute skews
-    games_df = impute_skew(games_df)
+    games_df = process_data.impute_skew(games_df)
 
     # add goalie rest
-    games_df = goalie_rest(goalies_df, games_df)
+    games_df = process_data.goalie_rest(goalies_df, games_df)
 
     # add team rest
-    games_df = team_rest(goalies_df, games_df)
+    games_df = process_data.team_rest(goalies_df, games_df)
 
     # add power rankings
-    games_df = power_rankings.fast_elo_ratings(games_df)
-    games_df = power_rankings.slow_elo_ratings(games_df)
-    games_df = power_rankings.glicko(games_df)
-    games_df = power_rankings.trueskill(games_df)
+    games_df = power_rankings.add_ratings(games_df, requested_cols=features)
 
     # rolling win percentage
-    # first remove the games that have not yet happened
-    rolling_win_df = games_df.drop(games_df.tail(len(predict_ids)).index)
-    rolling_win_toappend_df = games_df.tail(len(predict_ids))
+    for d in [10, 20, 41, 82]:
+        games_df = process_data.rolling_win_percentage(games_df, d)
+
+    return games_df
+
+def predict_range(start_date: dt.datetime, end_date: dt.datetime, conn, model_path: str, data_dir: str,
+                  n_workers: int=1) -> pd.DataFrame:
+    """
+    predicts every stored game between two dates, building the features for all of them in one pass
+    and scoring them with one model call. used to backfill predictions (ex. a season to compare
+    against the covers odds). the predictions are added to the 'predictions' dataset in data_dir
+    ...
+
+    Parameters
+    ----------
+    start_date: dt.datetime
+        first date to predict
+    end_date: dt.datetime
+        predict games before this date
+    conn: sqlite3.Connection
+        open connection to the game database
+    model_path: str
+        path to the exported booster
+    data_dir: str
+        root data directory
+    n_workers: int
+        number of processes used to create the rolling stats
+
+    Returns
+    -------
+    predictions: pd.DataFrame
+        dataframe returned by make_predictions with the actual result added
+    """
+    # a model trained on another version of the features would get features it was not trained on
+    model_server.check_feature_version(model_path, process_data.FEATURE_VERSION)
+
+    # later games are not needed, every feature only looks at earlier games
+    team_stats = game_store.load_team_stats(conn, end_date=end_date)
+    goalie_stats = game_store.load_goalie_stats(conn, end_date=end_date)
+    games_info = game_store.load_games_info(conn, end_date=end_date)
+
+    games_df = build_features(team_stats, goalie_stats, games_info, model_server.model_features(model_path),
+                              n_workers=n_workers)
+    prediction_df = games_df[(games_df['date'] >= start_date) & (games_df['date'] < end_date)]
+    prediction_df = prediction_df.reset_index(drop=True)
+
+    predictions = make_predictions(prediction_df, model_path)
+    predictions['home_team_win'] = prediction_df['home_team_win'].astype(float)
+
+    # earlier predictions of the same seasons are kept, a game predicted again gets the new prediction
+    storage.upsert_frame(predictions, 'predictions', data_dir)
 
-    days = [10,20,41,82]
+    return predictions
 
-    for d in days:
-        # Target Encoding, this will create a period SMA win percentage columns for the home and away teams
-        encode_me = ['home_win_percent_' + str(d) + '_avg', 'away_win_percent_' + str(d) + '_avg']
+def predict_date(date: dt.datetime, data_dir: str, n_workers: int=1) -> pd.DataFrame:
+    """
+    predicts the games scheduled on a date with the exported model in data_dir. the predictions are
+    recorded in the game database and pickled in data_dir/Predictions
+    ...
 
-        for x in encode_me:
-            if x == 'home_win_percent_' + str(d) + '_avg':
-                rolling_win_df[x] = rolling_win_df.groupby('home_team')['home_team_win'].apply(lambda x: x.rolling(d).mean())
-            else:
-                rolling_win_df[x] = rolling_win_df.groupby('away_team')['home_team_win'].apply(lambda x: x.rolling(d).mean())
+    Parameters
+    ----------
+    date: dt.datetime
+        date of the games to predict
+    data_dir: str
+        root data directory
+    n_workers: int
+        number of processes used to create the rolling stats
 
-    # Append games to predict back to bottom of dataframe so we can shift the win percentage
-    # results down into the games to predict
-    rolling_win_df = rolling_win_df.append(rolling_win_toappend_df, ignore_index=True)
-    rolling_win_df.reset_index(inplace=True)
+    Returns
+    -------
+    predictions: pd.DataFrame
+        dataframe returned by make_predictions
+    """
+    model_path = os.path.join(data_dir, 'xgb_model_opt.ubj')
+    # checked before pulling the games, a model trained on another version of the features cannot be used
+    model_server.check_feature_version(model_path, process_data.FEATURE_VERSION)
 
-    for d in days:
-        # Target Encoding, this will create a period SMA win percentage columns for the home and away teams
-        encode_me = ['home_win_percent_' + str(d) + '_avg', 'away_win_percent_' + str(d) + '_avg']
+    with instrument.stage('pull_games'):
+        predict_ids = main_get_predict_game_ids(date.strftime('%Y-%m-%d'))
 
-        for x in encode_me:
-            if x == 'home_win_percent_' + str(d) + '_avg':
-                rolling_win_df[x] = rolling_win_df.groupby('home_team')[x].shift(1)
-            else:
-                rolling_win_df[x] = rolling_win_df.groupby('away_team')[x].shift(1)
+        string_date = date.strftime('%m-%d-%Y')
 
-    games_df = rolling_win_df
+        # retrieve game by game information for all predict game ids pulled
+        predict_games_info = pull_predict_game_info(predict_ids, string_date)
 
-    # Retrieve last rows which are just the games we are predicting
-    prediction_df = games_df.tail(len(predict_ids))
+        # retrieve team game by game stats for all predict game ids pulled
+        predict_team_stats = pull_predict_team_stats(predict_ids, string_date)
 
-    prediction_df.reset_index(inplace=True, drop=True)
+        # retrieve goalie game by game stats for all predict game ids pulled
+        predict_goalie_stats = pull_predict_goalie_stats(predict_ids, string_date)
 
-    predictions = make_predictions(prediction_df)
+    # open databases
+    with instrument.stage('load_games'):
+        conn = game_store.connect(os.path.join(data_dir, 'games.db'))
+        team_stats = game_store.load_team_stats(conn)
+        goalie_stats = game_store.load_goalie_stats(conn)
+        games_info = game_store.load_games_info(conn)
+    # append prediction games to end of information lists
+    team_stats = team_stats + predict_team_stats
+    goalie_stats = goalie_stats + predict_goalie_stats
+    games_info = games_info + predict_games_info
+
+    # only the features used by the model are created
+    with instrument.stage('features'):
+        games_df = build_features(team_stats, goalie_stats, games_info, model_server.model_features(model_path),
+                                  n_workers=n_workers)
+
+    # Retrieve the games we are predicting
+    prediction_df = games_df[games_df['game_id'].isin([str(i) for i in predict_ids])]
+    prediction_df = prediction_df.reset_index(drop=True)
+
+    with instrument.stage('predict'):
+        predictions = make_predictions(prediction_df, model_path)
+    instrument.count('games_predicted', len(predictions))
     print(predictions)
 
+    # record the predictions, re-running on the same day replaces the earlier prediction for a game
+    game_store.upsert_predictions(conn, predictions)
+
     todays_date = str(dt.datetime.today()).split()[0]
 
-    with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/Predictions/'+todays_date+'predictions.pkl', 'wb') as f:
-        pickle.dump(team_stats, f)
\ No newline at end of file
+    os.makedirs(os.path.join(data_dir, 'Predictions'), exist_ok=True)
+    with open(os.path.join(data_dir, 'Predictions', todays_date + 'predictions.pkl'), 'wb') as f:
+        pickle.dump(predictions, f)
+
+    return predictions
+
+if __name__ == '__main__':
+    from nhl_mlmodel.config import config
+    settings = config.load()
+
+    predict_date(dt.datetime(2021, 1, 23), settings.data_dir, n_workers=settings.n_workers)
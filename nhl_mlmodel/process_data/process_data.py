@@ -1,16 +1,35 @@
 
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from nhl_mlmodel.game_store import game_store
+from nhl_mlmodel.instrument import instrument
+from nhl_mlmodel.model_server import model_server
 from nhl_mlmodel.nhl_scraper import nhl_scraper
 from nhl_mlmodel.power_rankings import power_rankings
 from nhl_mlmodel.process_data import helpers
+from nhl_mlmodel.storage import storage
 import numpy as np
+import os
 import pandas as pd
 import pickle
-from typing import List
+import re
+from typing import List, Set, Tuple
 
 # show full columns on dfs
 pd.set_option('display.expand_frame_repr', False)
 pd.set_option("display.max_rows", 25)
 
+# periods and aggregates of the rolling stats created by get_diff_df
+PERIODS = [3, 7, 14, 41, 82]
+AGGREGATES = ['avg', 'std', 'skew']
+
+# version of the feature definitions, saved in the schema of the exported models. raise it when a feature changes
+# meaning so that models trained on the old features are rejected until train is run again
+# 2: win percentages only use each team's earlier games and goalie ties are sorted by game and goalie
+FEATURE_VERSION = 2
+
+# stats added to teams_df by add_pdo
+PDO_STATS = ['pdo', 'evenStrengthGoals', 'evenStrengthShots', 'evenStrengthShootingPercent']
 
 def pull_game_ids(first_year: int=2010, last_year: int=2020) -> List[int]:
     """
@@ -40,10 +59,8 @@ def pull_game_ids(first_year: int=2010, last_year: int=2020) -> List[int]:
 
     # Run for loop to retrieve game IDs for all seasons required
     game_ids = []
-    for i in game_ids_url_years:
-
-        if len(game_ids) % 500 == 0:  # Progress bar
-            print(str(len(game_ids) / len(game_ids_url_years) * 100) + ' percent done retrieving game ids.')
+    for count, i in enumerate(game_ids_url_years, 1):
+        instrument.progress('game ids', count, len(game_ids_url_years), every=1)
 
         try:
             game_ids = game_ids + nhl_scraper.get_game_ids(i)
@@ -73,12 +90,12 @@ def pull_team_stats(game_ids: List[int]) -> List[nhl_scraper.NhlTeam]:
     # retrieve game by game stats for every game in the game_ids list
     team_stats = []
 
-    for i in game_ids:
+    for count, i in enumerate(game_ids, 1):
         stats_i = nhl_scraper.scrape_team_stats(i)
         team_stats += stats_i
 
-        if len(team_stats) % 500 == 0:  # Progress bar
-            print(str(0.5 * len(team_stats) / len(game_ids) * 100) + ' percent done retrieving game data/stats.')
+        # count games rather than stats, every game has two teams
+        instrument.progress('team stats', count, len(game_ids))
 
     return team_stats
 
@@ -99,12 +116,12 @@ def pull_goalie_stats(game_ids: List[int]) -> List[nhl_scraper.NhlGoalie]:
         """
 
     goalie_stats=[]
-    for i in game_ids:
+    for count, i in enumerate(game_ids, 1):
         goalies_i = nhl_scraper.scrape_goalie_stats(i)
         goalie_stats += goalies_i
 
-        if len(goalie_stats) % 250 == 0:  # Progress bar # todo fix progress bar to account for more goalies than game ids
-            print(str(0.5 * len(goalie_stats) / len(game_ids) * 100) + ' percent done retrieving goalie data.')
+        # count games rather than goalies, a game can have more than two goalies
+        instrument.progress('goalie stats', count, len(game_ids))
 
     return goalie_stats
 
@@ -127,12 +144,11 @@ def pull_game_info(game_ids: List[int]) -> List[nhl_scraper.NhlGame]:
     # retrieve game by game info for every game in the game_ids list
     games_info = []
 
-    for i in game_ids:
+    for count, i in enumerate(game_ids, 1):
         game_i = nhl_scraper.scrape_game_info(i)
         games_info.append(game_i)
 
-        if len(games_info) % 500 == 0:  # Progress bar
-            print(str(len(games_info) / len(game_ids) * 100) + ' percent done retrieving game data/stats.')
+        instrument.progress('game info', count, len(game_ids))
     return games_info
 
 def make_teams_df(team_stats: List[nhl_scraper.NhlTeam]) -> pd.DataFrame:
@@ -316,7 +332,7 @@ def add_sh_per(teams_df: pd.DataFrame) -> pd.DataFrame:
 
     return teams_df
 
-def add_rolling(period, df, stat_columns, is_goalie=False):
+def add_rolling(period, df, stat_columns, is_goalie=False, requested=None):
     """
     creates rolling average stats in in dataframe provided
     ...
@@ -329,6 +345,8 @@ def add_rolling(period, df, stat_columns, is_goalie=False):
         dataframe to process
     stat_columns: List['str']
         list of columns in dataframe to create rolling stats for
+    requested: Set[Tuple[str, int, str]]
+        (stat, period, aggregate) combinations to create. None creates every aggregate
 
     Returns
     -------
@@ -337,13 +355,135 @@ def add_rolling(period, df, stat_columns, is_goalie=False):
     """
     for s in stat_columns:
         if 'object' in str(df[s].dtype): continue
-        df[s+'_'+str(period)+'_avg'] = df.groupby('team')[s].apply(lambda x:x.rolling(period).mean())
-        df[s+'_'+str(period)+'_std'] = df.groupby('team')[s].apply(lambda x:x.rolling(period).std())
-        df[s+'_'+str(period)+'_skew'] = df.groupby('team')[s].apply(lambda x:x.rolling(period).skew())
+        if requested is None or (s, period, 'avg') in requested:
+            df[s+'_'+str(period)+'_avg'] = df.groupby('team')[s].apply(lambda x:x.rolling(period).mean())
+        if requested is None or (s, period, 'std') in requested:
+            df[s+'_'+str(period)+'_std'] = df.groupby('team')[s].apply(lambda x:x.rolling(period).std())
+        if requested is None or (s, period, 'skew') in requested:
+            df[s+'_'+str(period)+'_skew'] = df.groupby('team')[s].apply(lambda x:x.rolling(period).skew())
+
+    return df
+
+def rolling_partition(df: pd.DataFrame, periods: List[int], stat_columns: List[str],
+                      requested: Set[Tuple[str, int, str]]=None) -> pd.DataFrame:
+    """
+    creates rolling stats for every period in a dataframe. used to process one partition of teams
+    in a worker process
+    ...
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        dataframe to process. all games of a team must be in the same partition
+    periods: List[int]
+        the periods for which we want to create rolling stats
+    stat_columns: List['str']
+        list of columns in dataframe to create rolling stats for
+    requested: Set[Tuple[str, int, str]]
+        (stat, period, aggregate) combinations to create. None creates every combination
+
+    Returns
+    -------
+    df: pd.DataFrame
+        dataframe with rolling stats added
+    """
+    for period in periods:
+        df = add_rolling(period, df, stat_columns, requested=requested)
 
     return df
 
-def get_diff_df(df, name, is_goalie=False):
+def parallel_rolling(df: pd.DataFrame, periods: List[int], stat_columns: List[str],
+                     n_workers: int, requested: Set[Tuple[str, int, str]]=None) -> pd.DataFrame:
+    """
+    creates rolling stats by splitting the teams across a process pool. rolling stats are grouped by
+    team so each partition is independent. the result is identical to the serial calculation.
+    goalie dataframes are split by team as well since add_rolling groups their rolling stats by team
+    ...
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        dataframe to process. the index must be unique
+    periods: List[int]
+        the periods for which we want to create rolling stats
+    stat_columns: List['str']
+        list of columns in dataframe to create rolling stats for
+    n_workers: int
+        number of worker processes
+    requested: Set[Tuple[str, int, str]]
+        (stat, period, aggregate) combinations to create. None creates every combination
+
+    Returns
+    -------
+    df: pd.DataFrame
+        dataframe with rolling stats added in the original row order
+    """
+    # assign teams to partitions round robin in sorted order so the split is deterministic
+    teams = sorted(df['team'].unique())
+    partitions = [teams[i::n_workers] for i in range(n_workers)]
+    chunks = [df[df['team'].isin(p)] for p in partitions if p]
+
+    with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+        results = list(executor.map(rolling_partition, chunks, repeat(periods), repeat(stat_columns),
+                                    repeat(requested)))
+
+    return pd.concat(results).loc[df.index]
+
+def parse_rolling_features(columns: List[str], name: str) -> Set[Tuple[str, int, str]]:
+    """
+    finds the rolling stats get_diff_df has to create to produce a list of columns. columns are
+    named {name}_{stat}_{period}_{aggregate} (ex. teams_goals_7_avg)
+    ...
+
+    Parameters
+    ----------
+    columns: List[str]
+        requested columns (ex. the features of the model). columns that are not rolling stats of
+        name are ignored
+    name: str
+        prefix used by get_diff_df ('teams' or 'goalies')
+
+    Returns
+    -------
+    requested: Set[Tuple[str, int, str]]
+        (stat, period, aggregate) combinations
+    """
+    pattern = re.compile('^' + re.escape(name) + '_(.+)_([0-9]+)_(' + '|'.join(AGGREGATES) + ')$')
+    requested = set()
+
+    for c in columns:
+        match = pattern.match(c)
+        if match:
+            requested.add((match.group(1), int(match.group(2)), match.group(3)))
+
+    return requested
+
+def needs_stats(columns: List[str], name: str, stats: List[str]) -> bool:
+    """
+    checks if any of the requested columns is a rolling stat of one of the provided stats. used to skip
+    stages that only create inputs for unused features (ex. add_pdo)
+    ...
+
+    Parameters
+    ----------
+    columns: List[str]
+        requested columns. None means every column is requested
+    name: str
+        prefix used by get_diff_df ('teams' or 'goalies')
+    stats: List[str]
+        stats created by the stage
+
+    Returns
+    -------
+    needed: bool
+        True if the stage has to run
+    """
+    if columns is None:
+        return True
+
+    return any(stat in stats for stat, _, _ in parse_rolling_features(columns, name))
+
+def get_diff_df(df, name, is_goalie=False, n_workers=1, requested_cols=None):
     """
     calculated stat differentials between home and away team
     ...
@@ -354,15 +494,22 @@ def get_diff_df(df, name, is_goalie=False):
         dataframe to process
     is_goalie: bool
         if this is a goalie dataframe stats will be grouped by goalies instead of team
+    n_workers: int
+        number of processes used to create the rolling stats. 1 runs in the current process
+    requested_cols: List[str]
+        only create the differentials in this list (ex. the features of the model). None creates
+        every stat, period and aggregate
 
     Returns
     -------
     diff_df: pd.DataFrame
         dataframe with calculated stat differentials
     """
-    # Sort by date
-    df = df.sort_values(by='date').copy()
-    newindex = df.groupby('date')['date'].apply(lambda x: x + np.arange(x.size).astype(np.timedelta64))
+    # Sort by date. ties are ordered by game and goalie so that the rows of two goalies of a team in one game are
+    # in the same order whatever other games are in the frame
+    order = ['date', 'game_id', 'goalie_id'] if is_goalie else ['date', 'game_id']
+    df = df.sort_values(by=order, kind='mergesort').copy()
+    newindex = df.groupby('date')['date'].apply(lambda x: x + np.arange(x.size).astype('timedelta64[ns]'))
     df = df.set_index(newindex).sort_index()
 
     # get stat columns
@@ -370,11 +517,18 @@ def get_diff_df(df, name, is_goalie=False):
     stat_cols.extend([x for x in df.columns if 'float' in str(df[x].dtype)])
 
     #add rolling stats to the data frame
-    df = add_rolling(3, df, stat_cols)
-    df = add_rolling(7, df, stat_cols)
-    df = add_rolling(14, df, stat_cols)
-    df = add_rolling(41, df, stat_cols)
-    df = add_rolling(82, df, stat_cols)
+    periods = PERIODS
+    rolling_cols = stat_cols
+    requested = None
+    if requested_cols is not None:
+        requested = parse_rolling_features(requested_cols, name)
+        periods = sorted({p for _, p, _ in requested})
+        rolling_cols = [x for x in stat_cols if x in {s for s, _, _ in requested}]
+
+    if n_workers > 1:
+        df = parallel_rolling(df, periods, rolling_cols, n_workers, requested)
+    else:
+        df = rolling_partition(df, periods, rolling_cols, requested)
 
     # reset stat columns to just the sma features (removing the original stats)
     df.drop(columns=stat_cols, inplace=True)
@@ -383,7 +537,7 @@ def get_diff_df(df, name, is_goalie=False):
 
     # shift results so that each row is a pregame stat
     df = df.reset_index(drop=True)
-    df = df.sort_values(by='date')
+    df = df.sort_values(by=order, kind='mergesort')
 
     for s in stat_cols:
         if is_goalie:
@@ -533,13 +687,15 @@ def team_rest(goalies_df: pd.DataFrame, games_df: pd.DataFrame) -> pd.DataFrame:
 
 def rolling_win_percentage(games_df: pd.DataFrame, period: int) -> pd.DataFrame:
     """
-    creates a moving average win percentage
+    creates moving average home and away win percentages using only the games each team played before
+    each game. games that have not been played yet do not count. used to build both the training and the
+    prediction features
     ...
 
     Parameters
     ----------
     games_df: pd.DataFrame
-        games dataframe
+        games dataframe sorted by date
     period: int
         period for which we want to calculate win percentage
 
@@ -550,75 +706,133 @@ def rolling_win_percentage(games_df: pd.DataFrame, period: int) -> pd.DataFrame:
     """
     # Target Encoding, this will create a period SMA win percentage columns for the home and away teams
     # todo double check this is calculating actual win percent and not just home/away win percent
-    column_names = ['home_win_percent_'+str(period)+'_avg','away_win_percent_'+str(period)+'_avg']
+    home_team_win = games_df['home_team_win'].astype(float)
+
+    # the shift is done within each team so a game only sees that team's earlier results
+    games_df['home_win_percent_' + str(period) + '_avg'] = home_team_win.groupby(games_df['home_team']).transform(
+        lambda x: x.shift(1).rolling(period).mean())
+    games_df['away_win_percent_' + str(period) + '_avg'] = home_team_win.groupby(games_df['away_team']).transform(
+        lambda x: x.shift(1).rolling(period).mean())
 
-    for x in column_names:
-        if x == 'home_win_percent_'+str(period)+'_avg':
-            games_df[x] = games_df.groupby('home_team')['home_team_win'].apply(lambda x: x.rolling(period).mean()).shift(1)
-        else:
-            games_df[x] = games_df.groupby('away_team')['home_team_win'].apply(lambda x: x.rolling(period).mean()).shift(1)
     return games_df
 
-if __name__ == '__main__':
-    # pull all game ids between 2010-2020
-    if False:
-        game_ids = pull_game_ids(2010, 2020)
-        with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/game_ids.pkl', 'wb') as f:
-            pickle.dump(game_ids, f)
+def memory_usage_mb(df: pd.DataFrame) -> float:
+    """
+    returns the memory used by a dataframe in megabytes including object columns
+    ...
 
-    # retrieve team game by game stats for all game ids pulled
-    if False:
-        team_stats = pull_team_stats(game_ids)
-        with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/team_stats.pkl', 'wb') as f:
-            pickle.dump(team_stats, f)
+    Parameters
+    ----------
+    df: pd.DataFrame
+        dataframe to measure
 
-    # retrieve goalie game by game stats for all game ids pulled
-    if False:
-        with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/game_ids.pkl', 'rb') as f:
-            game_ids = pickle.load(f)
+    Returns
+    -------
+    memory: float
+        memory used in megabytes
+    """
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
 
-        goalie_stats = pull_goalie_stats(game_ids)
+def downcast_dtypes(df: pd.DataFrame, verbose: bool=False) -> pd.DataFrame:
+    """
+    reduces the memory used by a dataframe. float features are converted to float32, integers to the
+    smallest integer type that holds them, boolean object columns to bool and team codes to categoricals.
+    xgboost converts its input to float32 so predictions are unchanged.
+    ...
 
-        with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/goalie_stats.pkl', 'wb') as f:
-            pickle.dump(goalie_stats, f)
+    Parameters
+    ----------
+    df: pd.DataFrame
+        dataframe to downcast
+    verbose: bool
+        if True print the memory used before and after
 
-    # retrieve game by game information for all game ids pulled
-    if False:
-        with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/game_ids.pkl', 'rb') as f:
-            game_ids = pickle.load(f)
+    Returns
+    -------
+    df: pd.DataFrame
+        downcast dataframe
+    """
+    before = memory_usage_mb(df)
+    converted = {}
 
-        games_info = pull_game_info(game_ids)
+    for c in df.columns:
+        dtype = str(df[c].dtype)
+        if 'float' in dtype:
+            converted[c] = df[c].astype('float32')
+        elif 'int' in dtype:
+            converted[c] = pd.to_numeric(df[c], downcast='integer')
+        elif dtype == 'object' and c in ['team', 'home_team', 'away_team']:
+            converted[c] = df[c].astype('category')
+        elif dtype == 'object' and df[c].notna().all() and df[c].isin([True, False]).all():
+            converted[c] = df[c].astype('bool')
 
-        with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/games_info.pkl', 'wb') as f:
-            pickle.dump(games_info, f)
+    df = df.assign(**converted)
 
-    # make teams df
-    with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/team_stats.pkl', 'rb') as f:
-        team_stats_list = pickle.load(f)
+    if verbose:
+        print(f'memory reduced from {before:.1f} MB to {memory_usage_mb(df):.1f} MB')
 
-    teams_df = make_teams_df(team_stats_list)
+    return df
 
-    # make goalies df
-    with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/goalie_stats.pkl', 'rb') as f:
-        goalie_stats_list = pickle.load(f)
+def verify_downcast(model, df: pd.DataFrame, downcast_df: pd.DataFrame, tolerance: float=1e-6) -> float:
+    """
+    confirms that a model makes the same predictions on the original and downcast dataframes
+    ...
 
-    goalies_df = make_goalies_df(goalie_stats_list)
+    Parameters
+    ----------
+    model: xgb.Booster or xgb.XGBClassifier
+        trained model
+    df: pd.DataFrame
+        original dataframe, never downcast
+    downcast_df: pd.DataFrame
+        dataframe returned by downcast_dtypes
+    tolerance: float
+        largest allowed difference in predicted probability
 
-    # make games df
-    with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/games_info.pkl', 'rb') as f:
-        games_list = pickle.load(f)
+    Returns
+    -------
+    max_diff: float
+        largest difference in predicted probability between the two dataframes
+    """
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    feature_names = booster.feature_names
 
-    games_df = make_games_df(games_list)
+    proba = booster.inplace_predict(df[feature_names])
+    downcast_proba = booster.inplace_predict(downcast_df[feature_names])
+    max_diff = float(np.max(np.abs(proba - downcast_proba)))
 
-    # convert to numerical
-    teams_df, goalies_df = convert_numerical(teams_df, goalies_df)
+    if max_diff > tolerance:
+        raise ValueError(f'downcast changed predictions by {max_diff} (tolerance {tolerance})')
+    print(f'downcast predictions match, max difference {max_diff}')
 
-    # add pdo
-    teams_df = add_pdo(teams_df, goalies_df)
+    return max_diff
 
-    # add shooting percent
-    teams_df = add_sh_per(teams_df)
+def clean_frames(teams_df: pd.DataFrame, goalies_df: pd.DataFrame, games_df: pd.DataFrame) -> (pd.DataFrame,
+                                                                                                pd.DataFrame,
+                                                                                                pd.DataFrame):
+    """
+    removes the columns that are not used for the rolling stats and converts the ids to strings so the
+    dataframes can be merged
+    ...
 
+    Parameters
+    ----------
+    teams_df: pd.DataFrame
+        numerical team stats with pdo and shooting percentage
+    goalies_df: pd.DataFrame
+        numerical goalie stats
+    games_df: pd.DataFrame
+        game information
+
+    Returns
+    -------
+    teams_df: pd.DataFrame
+        team stats ready for get_diff_df
+    goalies_df: pd.DataFrame
+        goalie stats ready for get_diff_df
+    games_df: pd.DataFrame
+        game information with string ids
+    """
     # remove columns that will not be used in teams_df and goalies_df
     teams_df.drop(['index'], axis=1, inplace=True)
     goalies_df.drop(['index', 'assists', 'goals', 'pim', 'decision'], axis=1, inplace=True)
@@ -632,15 +846,67 @@ if __name__ == '__main__':
     games_df['home_goalie_id'] = games_df['home_goalie_id'].map(str)
     games_df['away_goalie_id'] = games_df['away_goalie_id'].map(str)
 
+    return teams_df, goalies_df, games_df
+
+def build_dataframes(team_stats_list: List[nhl_scraper.NhlTeam], goalie_stats_list: List[nhl_scraper.NhlGoalie],
+                     games_list: List[nhl_scraper.NhlGame], n_workers: int=1) -> (pd.DataFrame, pd.DataFrame,
+                                                                                 pd.DataFrame):
+    """
+    creates teams_df, goalies_df and games_df with every model feature from the scraped game lists
+    ...
+
+    Parameters
+    ----------
+    team_stats_list: List[nhl_scraper.NhlTeam]
+        team stats of every game
+    goalie_stats_list: List[nhl_scraper.NhlGoalie]
+        goalie stats of every game
+    games_list: List[nhl_scraper.NhlGame]
+        game information of every game
+    n_workers: int
+        number of processes used to create the rolling stats
+
+    Returns
+    -------
+    teams_df: pd.DataFrame
+        team stats by game
+    goalies_df: pd.DataFrame
+        goalie stats by game
+    games_df: pd.DataFrame
+        one row per game with the features, rows with missing features are dropped
+    """
+    with instrument.stage('make_dataframes'):
+        # make teams df
+        teams_df = make_teams_df(team_stats_list)
+
+        # make goalies df
+        goalies_df = make_goalies_df(goalie_stats_list)
+
+        # make games df
+        games_df = make_games_df(games_list)
+
+        # convert to numerical
+        teams_df, goalies_df = convert_numerical(teams_df, goalies_df)
+
+        # add pdo
+        teams_df = add_pdo(teams_df, goalies_df)
+
+        # add shooting percent
+        teams_df = add_sh_per(teams_df)
+
+    teams_df, goalies_df, games_df = clean_frames(teams_df, goalies_df, games_df)
+
     # create rolling stats in main games dataframe
 
-    games_df = pd.merge(left=games_df, right=get_diff_df(teams_df, 'teams'),
-                  on='game_id', how='left')
+    with instrument.stage('rolling_teams'):
+        teams_diff_df = get_diff_df(teams_df, 'teams', n_workers=n_workers)
+    games_df = pd.merge(left=games_df, right=teams_diff_df, on='game_id', how='left')
 
     print(games_df.shape)
 
-    games_df = pd.merge(left=games_df, right=get_diff_df(goalies_df, 'goalies', is_goalie=True),
-                  on='game_id', how='left')
+    with instrument.stage('rolling_goalies'):
+        goalies_diff_df = get_diff_df(goalies_df, 'goalies', is_goalie=True, n_workers=n_workers)
+    games_df = pd.merge(left=games_df, right=goalies_diff_df, on='game_id', how='left')
 
     # drop duplicates due to multiple goalies playing in one game
     # todo confirm if the first or last game should be kept
@@ -651,30 +917,154 @@ if __name__ == '__main__':
     # impute skews
     games_df = impute_skew(games_df)
 
-    # add goalie rest
-    games_df = goalie_rest(goalies_df, games_df)
+    with instrument.stage('rest'):
+        # add goalie rest
+        games_df = goalie_rest(goalies_df, games_df)
 
-    # add team rest
-    games_df = team_rest(goalies_df, games_df)
+        # add team rest
+        games_df = team_rest(goalies_df, games_df)
 
     # add power rankings
-    games_df = power_rankings.fast_elo_ratings(games_df)
-    games_df = power_rankings.slow_elo_ratings(games_df)
-    games_df = power_rankings.glicko(games_df)
-    games_df = power_rankings.trueskill(games_df)
+    with instrument.stage('ratings'):
+        games_df = power_rankings.add_ratings(games_df)
 
     # Add Win Percentage for last 10,20,41 and 82 games
     days = [10, 20, 41, 82]
 
-    for d in days:
-        games_df = rolling_win_percentage(games_df, d)
+    with instrument.stage('win_percentage'):
+        for d in days:
+            games_df = rolling_win_percentage(games_df, d)
 
     # Remove rows with NaN due to our SMA calculation
     games_df = games_df.dropna()  # Drop rows with missing values
 
     games_df.reset_index(inplace=True, drop=True)
+    instrument.count('games_processed', len(games_df))
+
+    return teams_df, goalies_df, games_df
+
+def backfill(data_dir: str, first_year: int=2010, last_year: int=2020) -> int:
+    """
+    pulls the game ids, team stats, goalie stats and game information of every season between two years,
+    pickles the lists in data_dir and loads them into the game database
+    ...
 
-    # Pickle and games_df for machine learning
-    with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/games_df.pkl', 'wb') as f:
-        pickle.dump(games_df, f)
+    Parameters
+    ----------
+    data_dir: str
+        root data directory
+    first_year: int
+        first year of the first season (ex. 2010 for 20102011)
+    last_year: int
+        first year of the last season
+
+    Returns
+    -------
+    count: int
+        number of games written to the game database
+    """
+    with instrument.stage('pull_game_ids'):
+        game_ids = pull_game_ids(first_year, last_year)
+
+    lists = {'game_ids': game_ids}
+    for name, pull in [('team_stats', pull_team_stats), ('goalie_stats', pull_goalie_stats),
+                       ('games_info', pull_game_info)]:
+        with instrument.stage('pull_' + name):
+            lists[name] = pull(game_ids)
+
+    for name, values in lists.items():
+        with open(os.path.join(data_dir, name + '.pkl'), 'wb') as f:
+            pickle.dump(values, f)
+
+    conn = game_store.connect(os.path.join(data_dir, 'games.db'))
+    return game_store.upsert_games(conn, lists['team_stats'], lists['goalie_stats'], lists['games_info'])
+
+def store_dataframes(teams_df: pd.DataFrame, goalies_df: pd.DataFrame, full_games_df: pd.DataFrame,
+                     data_dir: str, seasons: List[int]=None, verify_model_path: str=None) -> pd.DataFrame:
+    """
+    downcasts games_df, confirms the model predictions are unchanged by the downcast and stores the dataframes.
+    games_df is pickled in full and the dataframes are written as season partitioned datasets. used by
+    build_games_df and update_data.update so both write the same outputs
+    ...
+
+    Parameters
+    ----------
+    teams_df: pd.DataFrame
+        teams dataframe returned by build_dataframes
+    goalies_df: pd.DataFrame
+        goalies dataframe returned by build_dataframes
+    full_games_df: pd.DataFrame
+        games dataframe returned by build_dataframes, never downcast
+    data_dir: str
+        root data directory
+    seasons: List[int]
+        only rewrite the partitions of these seasons (ex. the seasons with new games). None rewrites every season
+    verify_model_path: str
+        model (.pkl, .json or .ubj) used to confirm the predictions are unchanged by the downcast. None skips
+        the check
+
+    Returns
+    -------
+    games_df: pd.DataFrame
+        downcast games_df
+    """
+    # reduce memory before storing. build_dataframes keeps every feature in float64 so this is the only cast
+    games_df = downcast_dtypes(full_games_df, verbose=True)
+
+    # confirm the model predictions are unchanged by the downcast
+    if verify_model_path is not None:
+        verify_downcast(model_server.ModelServer(verify_model_path).booster, full_games_df, games_df)
+    del full_games_df
+
+    with instrument.stage('store'):
+        # Pickle games_df for machine learning
+        with open(os.path.join(data_dir, 'games_df.pkl'), 'wb') as f:
+            pickle.dump(games_df, f)
+
+        # Store the dataframes as season partitioned datasets so training can load only what it needs
+        for name, df in [('teams_df', teams_df), ('goalies_df', goalies_df), ('games_df', games_df)]:
+            if seasons is not None:
+                df = df[storage.helpers.season_of(df['date']).isin(seasons)]
+            if len(df) > 0:
+                storage.write_frame(df, name, data_dir)
+
+    return games_df
+
+def build_games_df(data_dir: str, n_workers: int=1, verify_model_path: str=None) -> pd.DataFrame:
+    """
+    creates games_df from every game in the game database and stores teams_df, goalies_df and games_df
+    as season partitioned datasets. the database is seeded from the pickles on the first run
+    ...
+
+    Parameters
+    ----------
+    data_dir: str
+        root data directory
+    n_workers: int
+        number of processes used to create the rolling stats
+    verify_model_path: str
+        model (.pkl, .json or .ubj) used to confirm the predictions are unchanged by the downcast. None skips
+        the check
+
+    Returns
+    -------
+    games_df: pd.DataFrame
+        downcast games_df
+    """
+    with instrument.stage('load_games'):
+        conn = game_store.connect(os.path.join(data_dir, 'games.db'))
+        if not game_store.stored_game_ids(conn):
+            game_store.import_pickles(conn, data_dir)
+
+        lists = (game_store.load_team_stats(conn), game_store.load_goalie_stats(conn),
+                 game_store.load_games_info(conn))
+
+    teams_df, goalies_df, full_games_df = build_dataframes(*lists, n_workers=n_workers)
+
+    return store_dataframes(teams_df, goalies_df, full_games_df, data_dir, verify_model_path=verify_model_path)
+
+if __name__ == '__main__':
+    from nhl_mlmodel.config import config
+    settings = config.load()
 
+    build_games_df(settings.data_dir, n_workers=settings.n_workers)
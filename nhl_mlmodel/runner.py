@@ -1 +1,184 @@
+# This module defines the nhl-mlmodel command line entry point.
+# Every stage of the pipeline is a subcommand so a scheduler can run them independently, and the data root,
+# worker count and caches are set by options or environment variables (see nhl_mlmodel.config).
+#
+# usage: nhl-mlmodel [--data-dir DIR] [--workers N] [--no-cache] [--metrics FILE] [--trace-memory]
+#                    [--profile {cprofile,sampling}] [--profile-stage NAME]
+#                    {backfill,update,features,train,predict,evaluate}
 
+import argparse
+import datetime as dt
+from nhl_mlmodel.config import config
+from nhl_mlmodel.instrument import instrument
+import sys
+from typing import List
+
+# evaluations run by evaluate
+EVALUATIONS = ['sportsbook', 'backtest', 'betting']
+
+# seasons with covers.com odds used by evaluate
+ODDS_SEASONS = [20102011, 20112012, 20122013, 20132014, 20142015, 20152016, 20162017, 20172018, 20182019,
+                20192020]
+
+def parse_date(value: str) -> dt.datetime:
+    '''This function parses a YYYY-MM-DD command line date'''
+    try:
+        return dt.datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'{value} is not a date in the format YYYY-MM-DD')
+
+def parse_evaluation(value: str) -> str:
+    '''This function checks a command line evaluation name'''
+    if value not in EVALUATIONS:
+        raise argparse.ArgumentTypeError(f'{value} is not one of {", ".join(EVALUATIONS)}')
+    return value
+
+def run_backfill(args, settings):
+    '''This function pulls every game between two years into the game database'''
+    from nhl_mlmodel.process_data import process_data
+    count = process_data.backfill(settings.data_dir, args.first_year, args.last_year)
+    print(f'{count} games written')
+
+def run_update(args, settings):
+    '''This function adds the new games of a season and refreshes the stored datasets and model'''
+    from nhl_mlmodel.update_data import update_data
+    new_game_ids = update_data.update(settings.data_dir, args.season, n_workers=settings.n_workers)
+    print(f'{len(new_game_ids)} new games')
+
+def run_features(args, settings):
+    '''This function rebuilds games_df from the game database'''
+    from nhl_mlmodel.process_data import process_data
+    games_df = process_data.build_games_df(settings.data_dir, n_workers=settings.n_workers,
+                                           verify_model_path=args.verify_model)
+    print(f'{len(games_df)} games stored')
+
+def run_train(args, settings):
+    '''This function trains, tunes and exports the model'''
+    from nhl_mlmodel.train_xgb import train_xgb
+    train_xgb.train(settings.data_dir, hyperopt_runs=args.hyperopt_runs, n_workers=settings.n_workers,
+                    cache_dir=settings.cache_dir('dmatrix_cache'))
+
+def run_predict(args, settings):
+    '''This function predicts the games of a date, or backfills the predictions of a date range'''
+    from nhl_mlmodel.predict_games import predict_games
+
+    if args.start is None:
+        predict_games.predict_date(args.date, settings.data_dir, n_workers=settings.n_workers)
+        return
+
+    from nhl_mlmodel.game_store import game_store
+    conn = game_store.connect(settings.path('games.db'))
+    predict_games.predict_range(args.start, args.end or dt.datetime.today(), conn,
+                                settings.path('xgb_model_opt.ubj'), settings.data_dir,
+                                n_workers=settings.n_workers)
+
+def run_evaluate(args, settings):
+    '''This function runs the sportsbook baseline, walk forward backtest and betting backtest'''
+    evaluations = args.evaluations or ['sportsbook']
+
+    if 'sportsbook' in evaluations:
+        from nhl_mlmodel.sb_evaluation import sb_evaluation
+        with instrument.stage('sportsbook', seasons=len(args.seasons)):
+            sb_evaluation.evaluate_sportsbook(args.seasons, settings.data_dir,
+                                              cache_dir=settings.cache_dir('covers_cache'))
+
+    if 'backtest' in evaluations:
+        from nhl_mlmodel.model_server import model_server
+        from nhl_mlmodel.walk_forward import walk_forward
+        # the backtest retrains with the parameters tuned by train
+        params = model_server.model_params(settings.path('xgb_model_opt.ubj'))
+        with instrument.stage('backtest', window_days=args.window_days):
+            walk_forward.run_backtest(settings.data_dir, params,
+                                      n_workers=settings.n_workers,
+                                      cache_dir=settings.cache_dir('backtest_cache'),
+                                      window_days=args.window_days)
+
+    if 'betting' in evaluations:
+        from nhl_mlmodel.betting import betting
+        with instrument.stage('betting'):
+            betting.run_betting(settings.data_dir, n_workers=settings.n_workers)
+
+def make_parser() -> argparse.ArgumentParser:
+    """
+    creates the command line parser
+    ...
+
+    Returns
+    -------
+    parser: argparse.ArgumentParser
+        parser with one subcommand per stage
+    """
+    parser = argparse.ArgumentParser(prog='nhl-mlmodel', description='NHL XGBoost model pipeline')
+    parser.add_argument('--data-dir', help=f'root data directory (default ${config.DATA_DIR_ENV} or ./data)')
+    parser.add_argument('--workers', type=int,
+                        help=f'number of processes (default ${config.WORKERS_ENV} or the number of cpus)')
+    parser.add_argument('--no-cache', action='store_true', help='disable the page, dmatrix and backtest caches')
+    parser.add_argument('--metrics', help=f'json lines file the stage timings are appended to '
+                                          f'(default ${config.METRICS_ENV})')
+    parser.add_argument('--trace-memory', action='store_true', help='record the peak memory of every stage')
+    parser.add_argument('--profile', choices=instrument.PROFILERS, help='profile the stages')
+    parser.add_argument('--profile-stage', action='append',
+                        help='name of a stage to profile, can be repeated (default the whole command)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    backfill = subparsers.add_parser('backfill', help='pull every game between two years')
+    backfill.add_argument('--first-year', type=int, default=2010, help='first year of the first season')
+    backfill.add_argument('--last-year', type=int, default=2020, help='first year of the last season')
+    backfill.set_defaults(func=run_backfill)
+
+    update = subparsers.add_parser('update', help='add the new games of a season')
+    update.add_argument('--season', type=int, default=20202021, help='season to update (ex. 20202021)')
+    update.set_defaults(func=run_update)
+
+    features = subparsers.add_parser('features', help='rebuild games_df from the game database')
+    features.add_argument('--verify-model', help='model (.pkl, .json or .ubj) used to check the downcast games_df')
+    features.set_defaults(func=run_features)
+
+    train = subparsers.add_parser('train', help='train, tune and export the model')
+    train.add_argument('--hyperopt-runs', type=int, default=100, help='number of hyperopt trials')
+    train.set_defaults(func=run_train)
+
+    predict = subparsers.add_parser('predict', help='predict the games of a date or a date range')
+    predict.add_argument('--date', type=parse_date, default=dt.datetime.today(),
+                         help='date of the games to predict (default today)')
+    predict.add_argument('--start', type=parse_date, help='first date of a range of played games to predict')
+    predict.add_argument('--end', type=parse_date, help='date after the last date of the range (default today)')
+    predict.set_defaults(func=run_predict)
+
+    evaluate = subparsers.add_parser('evaluate', help='evaluate the sportsbook, the model and betting strategies')
+    evaluate.add_argument('evaluations', nargs='*', type=parse_evaluation,
+                          help=f'evaluations to run, any of {", ".join(EVALUATIONS)} (default sportsbook)')
+    evaluate.add_argument('--seasons', type=int, nargs='+', default=ODDS_SEASONS,
+                          help='seasons to store the odds of')
+    evaluate.add_argument('--window-days', type=int,
+                          help='backtest on windows of this many days instead of seasons')
+    evaluate.set_defaults(func=run_evaluate)
+
+    return parser
+
+def main(argv: List[str]=None) -> int:
+    """
+    runs the stage given on the command line
+    ...
+
+    Parameters
+    ----------
+    argv: List[str]
+        command line arguments. None uses sys.argv
+
+    Returns
+    -------
+    status: int
+        exit status
+    """
+    args = make_parser().parse_args(argv)
+    settings = config.load(args.data_dir, args.workers, False if args.no_cache else None, args.metrics)
+    instrument.configure(settings.metrics_path, trace_memory=args.trace_memory, profiler=args.profile,
+                         profile_stages=args.profile_stage, profile_dir=settings.path('profiles'))
+
+    with instrument.stage(args.command, workers=settings.n_workers):
+        args.func(args, settings)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
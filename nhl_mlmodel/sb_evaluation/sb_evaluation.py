@@ -1,11 +1,12 @@
 # This module defines the functions for evaluating historical sportsbook results.
 
+import datetime as dt
 import pickle
-import matplotlib.pyplot as plt
 from nhl_mlmodel.covers_scraper import covers_scraper
+from nhl_mlmodel.metrics import metrics
+from nhl_mlmodel.odds import odds
+from nhl_mlmodel.storage import storage
 import os
-from sklearn.metrics import accuracy_score, brier_score_loss
-from sklearn.calibration import calibration_curve
 import sys
 from typing import List, Tuple
 
@@ -32,36 +33,21 @@ def sportsbook_accuracy(game_data: List[covers_scraper.NhlGame]) -> float:
     probabilities: List[float]
         the implied probability of the home team winning based on the moneyline odds
     """
-    outcomes = []  # The actual outcome of the game. True if the home team wins
-    predictions = []  # The sportsbook's "prediction". True if the home team was favoured.
-    probabilities = []  # The implied probabilities determined from the moneyline odds
+    # tossups are excluded for the calibration curve
+    baseline_df = odds.sportsbook_baseline(odds.games_to_frame(game_data), exclude_tossups=True)
 
-    for d in game_data:
-        moneyline = int(d.home_ml)
-        home_score = int(d.home_score)
-        away_score = int(d.away_score)
+    outcomes = baseline_df['home_team_win'].tolist()  # The actual outcome of the game. True if the home team wins
+    predictions = baseline_df['sb_home_win'].tolist()  # The sportsbook's "prediction". True if the home team was favoured.
+    probabilities = baseline_df['sb_home_win_percent'].tolist()  # The implied probabilities determined from the moneyline odds
 
-        if moneyline == 100:
-            # We will exclude tossups for the calibration curve
-            continue
-
-        # Convert moneyline odds to their implied probabilities
-        if moneyline < 0:
-            probabilities.append(moneyline / (moneyline - 100))
-        elif moneyline > 100:
-            probabilities.append(100 / (moneyline + 100))
-
-        outcomes.append(home_score > away_score)
-        predictions.append(moneyline < 0)
-
-    accuracy = 100 * accuracy_score(outcomes, predictions)
+    accuracy = 100 * metrics.accuracy(outcomes, predictions)
 
     return accuracy, outcomes, predictions, probabilities
 
 def cal_curve(data, bins):
     """
     creates a calibration curve. X axis is the implied probability while the y axis is the percentage
-    of time that prediction was correct
+    of time that prediction was correct. the figure is saved to sb_evaluation.png
 
     ...
 
@@ -69,11 +55,37 @@ def cal_curve(data, bins):
     ----------
     data: List[Tuple[List[Boolean], List[Boolean], List[Float], str]]
         the data that will be used to create the calibration curve. (Outcomes, Predictions, Probabilities, Name)
+    bins: int
+        number of bins of the calibration curve
+
+    Returns
+    -------
+    scores_df: pd.DataFrame
+        the accuracy and brier score of each series
+    """
+    return metrics.cal_curve(data, bins, 'sb_evaluation.png')
+
+def evaluate_sportsbook(seasons: List[int], data_dir: str, cache_dir: str=None,
+                        baseline_season: int=20182019) -> Tuple[List[bool], List[bool], List[float]]:
+    """
+    stores the covers.com odds of every season, matches them to the statsapi game ids and saves the
+    sportsbook baseline of one season to baseline.pkl along with its calibration curve
+    ...
+
+    Parameters
+    ----------
+    seasons: List[int]
+        seasons to store the odds of (ex. [20182019, 20192020])
+    data_dir: str
+        root data directory
+    cache_dir: str
+        directory of the covers page cache. re-running only downloads dates that are not cached. None
+        disables the cache
+    baseline_season: int
+        season saved to baseline.pkl
 
     Returns
     -------
-    accuracy: float
-        the accuracy of the sportsbooks predictions
     outcomes: List[Boolean]
         True if the home team wins
     predictions: List[Boolean]
@@ -81,49 +93,33 @@ def cal_curve(data, bins):
     probabilities: List[float]
         the implied probability of the home team winning based on the moneyline odds
     """
+    # store the odds of every season
+    odds.build_odds_store(seasons, data_dir, cache_dir=cache_dir)
+
+    # match the covers games to the statsapi game ids so the sportsbook can be compared with the model game by game
+    games_df = storage.read_frame('games_df', data_dir, columns=['game_id', 'date', 'home_team', 'away_team'])
+    odds.write_game_index(odds.build_game_index(odds.read_odds(data_dir), games_df), data_dir)
+
+    # sportsbook baseline for one season
+    first_year = baseline_season // 10000
+    baseline_df = odds.sportsbook_baseline(odds.read_odds(data_dir, dt.datetime(first_year, 9, 1),
+                                                          dt.datetime(first_year + 1, 9, 1)))
+    outcomes = baseline_df['home_team_win'].tolist()
+    predictions = baseline_df['sb_home_win'].tolist()
+    probabilities = baseline_df['sb_home_win_percent'].tolist()
+    data = [(outcomes, predictions, probabilities, 'Sportsbook')]
 
-    fig = plt.figure(1, figsize=(12, 8))
-    ax1 = plt.subplot2grid((3, 1), (0, 0), rowspan=2)
-    ax2 = plt.subplot2grid((3, 1), (2, 0))
-
-    ax1.plot([0, 1], [0, 1], "k:", label="Perfectly Calibrated")
-
-    for y_test, y_pred, y_proba, name in data:
-        brier = brier_score_loss(y_test, y_proba)
-        print("{}\tAccuracy:{:.4f}\t Brier Loss: {:.4f}".format(
-            name, accuracy_score(y_test, y_pred), brier))
-        fraction_of_positives, mean_predicted_value = calibration_curve(y_test, y_proba, n_bins=bins)
-
-        ax1.plot(mean_predicted_value, fraction_of_positives, label="%s (%1.4f)" % (name, brier))
-        ax2.hist(y_proba, range=(0, 1), bins=bins, label=name, histtype="step", lw=2)
-
-    ax1.set_ylabel("Fraction of positives")
-    ax1.set_ylim([-0.05, 1.05])
-    ax1.legend(loc="lower right")
-    ax1.set_title('Calibration plots  (reliability curve)')
-
-    ax2.set_xlabel("Mean predicted value")
-    ax2.set_ylabel("Count")
-    ax2.legend(loc="lower right")
+    with open(os.path.join(data_dir, 'baseline.pkl'), 'wb') as f:
+        pickle.dump((outcomes, predictions, probabilities), f)
 
-    plt.tight_layout()
+    # create calibration curve and save figure in data folder
+    cal_curve(data,15)
 
-    fig.savefig('sb_evaluation.png')
+    return outcomes, predictions, probabilities
 
 if __name__ == '__main__':
-    # get dates that nhl games were played on in the 2018/2019 season
-    dates = covers_scraper.get_nhl_dates(20182019)
+    from nhl_mlmodel.config import config
+    settings = config.load()
 
-    games = [] # will hold NhlGame objects for all games played in the 2018/2019 season
-
-    for d in dates:
-        games += covers_scraper.nhl_games_date(d)
-
-    accuracy, outcomes, predictions, probabilities = sportsbook_accuracy(games)
-    data = [(outcomes, predictions, probabilities, 'Sportsbook')]
-
-    with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/baseline.pkl', 'wb') as f:
-        pickle.dump((outcomes, predictions, probabilities), f)
-
-    # create calibration curve and save figure in data folder
-    cal_curve(data,15)
\ No newline at end of file
+    evaluate_sportsbook([20102011, 20112012, 20122013, 20132014, 20142015, 20152016, 20162017, 20172018,
+                         20182019, 20192020], settings.data_dir, cache_dir=settings.cache_dir('covers_cache'))
@@ -0,0 +1,49 @@
+import datetime as dt
+import pandas as pd
+from typing import List
+
+# month each season starts in when it is not september. the 2019/2020 playoffs were played in august and
+# september 2020 and the 2020/2021 season started in january 2021
+SEASON_START_MONTHS = {2020: 12}
+
+def season_of(dates: pd.Series) -> pd.Series:
+    """
+    returns the nhl season each date belongs to in the format 20192020. games played from september
+    onwards belong to the season starting that year, earlier games belong to the season that started
+    the previous year. years in SEASON_START_MONTHS use their own start month
+    ...
+
+    Parameters
+    ----------
+    dates: pd.Series
+        series of dates
+
+    Returns
+    -------
+    seasons: pd.Series
+        series of seasons as integers (ex. 20192020)
+    """
+    dates = pd.to_datetime(dates)
+    start_month = dates.dt.year.map(SEASON_START_MONTHS).fillna(9)
+    first_year = dates.dt.year.where(dates.dt.month >= start_month, dates.dt.year - 1)
+    return (first_year * 10000 + first_year + 1).astype('int32')
+
+def seasons_between(start_date: dt.datetime, end_date: dt.datetime) -> List[int]:
+    """
+    returns all nhl seasons that overlap the provided date range
+    ...
+
+    Parameters
+    ----------
+    start_date: dt.datetime
+        first date in the range
+    end_date: dt.datetime
+        last date in the range
+
+    Returns
+    -------
+    seasons: List[int]
+        list of seasons (ex. [20182019, 20192020])
+    """
+    first, last = season_of(pd.Series([start_date, end_date])).tolist()
+    return [y * 10000 + y + 1 for y in range(first // 10000, last // 10000 + 1)]
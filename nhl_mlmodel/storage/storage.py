@@ -0,0 +1,248 @@
+# This module defines the functions to store dataframes as partitioned columnar datasets
+# Datasets are written to data_dir/<name>/season=<season>/ as either parquet or arrow ipc files so that
+# a load can read a subset of columns, seasons or dates instead of unpickling an entire file.
+
+import datetime as dt
+from nhl_mlmodel.storage import helpers
+import os
+import pandas as pd
+import pickle
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+from typing import List
+
+# file extensions for the supported formats
+EXTENSIONS = {'parquet': 'parquet', 'ipc': 'arrow'}
+
+def dataset_path(name: str, data_dir: str) -> str:
+    """
+    returns the directory a named dataset is stored in
+    ...
+
+    Parameters
+    ----------
+    name: str
+        name of the dataset (ex. 'games_df')
+    data_dir: str
+        root data directory
+
+    Returns
+    -------
+    path: str
+        directory of the dataset
+    """
+    return os.path.join(data_dir, name)
+
+def objects_to_frame(objects: list) -> pd.DataFrame:
+    """
+    makes a dataframe from a list of scraped objects (NhlTeam, NhlGoalie, NhlGame)
+    ...
+
+    Parameters
+    ----------
+    objects: list
+        list of objects that implement to_dict()
+
+    Returns
+    -------
+    df: pd.DataFrame
+        each row of the dataframe represents one object
+    """
+    return pd.DataFrame.from_records([o.to_dict() for o in objects])
+
+def frame_to_objects(df: pd.DataFrame, cls: type) -> list:
+    """
+    makes a list of objects from a dataframe created by objects_to_frame
+    ...
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        dataframe with one column per constructor argument of cls
+    cls: type
+        class to build (ex. nhl_scraper.NhlTeam)
+
+    Returns
+    -------
+    objects: list
+        list of cls objects
+    """
+    df = df.drop(columns=['season'], errors='ignore')
+    df = df.astype(object).where(df.notna(), None)
+    return [cls(**r) for r in df.to_dict('records')]
+
+def write_frame(df: pd.DataFrame, name: str, data_dir: str, partition_by: str='season',
+                file_format: str='parquet') -> str:
+    """
+    writes a dataframe as a partitioned dataset. partitions present in df replace the partitions
+    already on disk, all other partitions are left untouched.
+    ...
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        dataframe to write. must contain a date column when partitioning by season
+    name: str
+        name of the dataset (ex. 'games_df')
+    data_dir: str
+        root data directory
+    partition_by: str
+        column to partition the dataset by. 'season' is derived from the date column. None writes
+        a single partition
+    file_format: str
+        'parquet' or 'ipc' (arrow ipc, can be memory mapped on read)
+
+    Returns
+    -------
+    path: str
+        directory the dataset was written to
+    """
+    path = dataset_path(name, data_dir)
+
+    df = df.reset_index(drop=True)
+    if partition_by == 'season' and 'season' not in df.columns:
+        df = df.assign(season=helpers.season_of(df['date']))
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    partitioning = None
+    if partition_by is not None:
+        partitioning = ds.partitioning(pa.schema([table.schema.field(partition_by)]), flavor='hive')
+
+    ds.write_dataset(table, path, format=file_format, partitioning=partitioning,
+                     basename_template='part-{i}.' + EXTENSIONS[file_format],
+                     existing_data_behavior='delete_matching')
+    return path
+
+def upsert_frame(df: pd.DataFrame, name: str, data_dir: str, key: str='game_id',
+                 file_format: str='parquet') -> str:
+    """
+    writes rows to a season partitioned dataset without losing the stored rows of the same seasons. stored
+    rows with the key of a new row are replaced, the other rows of the seasons in df are kept
+    ...
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        rows to write. must contain a date column and the key column
+    name: str
+        name of the dataset (ex. 'predictions')
+    data_dir: str
+        root data directory
+    key: str
+        column identifying a row
+    file_format: str
+        'parquet' or 'ipc'
+
+    Returns
+    -------
+    path: str
+        directory the dataset was written to
+    """
+    # write_frame replaces every season it writes, so the stored rows of those seasons are written again
+    if os.path.isdir(dataset_path(name, data_dir)):
+        stored = read_frame(name, data_dir, seasons=helpers.season_of(df['date']).unique().tolist(),
+                            file_format=file_format)
+        df = pd.concat([stored, df], ignore_index=True).drop_duplicates(subset=key, keep='last')
+        df = df.sort_values(by='date', kind='mergesort')
+
+    return write_frame(df, name, data_dir, file_format=file_format)
+
+def read_frame(name: str, data_dir: str, columns: List[str]=None, start_date: dt.datetime=None,
+               end_date: dt.datetime=None, seasons: List[int]=None, file_format: str='parquet',
+               memory_map: bool=False) -> pd.DataFrame:
+    """
+    reads a dataset written by write_frame. only the requested columns, seasons and dates are loaded.
+    ...
+
+    Parameters
+    ----------
+    name: str
+        name of the dataset (ex. 'games_df')
+    data_dir: str
+        root data directory
+    columns: List[str]
+        columns to load. None loads all columns
+    start_date: dt.datetime
+        only load rows on or after this date
+    end_date: dt.datetime
+        only load rows before this date
+    seasons: List[int]
+        only load these seasons (ex. [20182019, 20192020])
+    file_format: str
+        'parquet' or 'ipc'
+    memory_map: bool
+        memory map the files instead of reading them into memory. most useful with 'ipc'
+
+    Returns
+    -------
+    df: pd.DataFrame
+        the loaded dataframe
+    """
+    dataset = ds.dataset(dataset_path(name, data_dir), format=file_format, partitioning='hive',
+                         filesystem=fs.LocalFileSystem(use_mmap=memory_map))
+    partitioned = 'season' in dataset.schema.names
+
+    # restrict the seasons to scan so that partitions outside of the date range are never opened
+    if partitioned and (start_date is not None or end_date is not None):
+        first = start_date if start_date is not None else dt.datetime(1917, 12, 19)
+        last = end_date if end_date is not None else dt.datetime.today()
+        date_seasons = helpers.seasons_between(first, last)
+        seasons = date_seasons if seasons is None else [s for s in seasons if s in date_seasons]
+
+    expression = None
+    conditions = []
+    if partitioned and seasons is not None:
+        conditions.append(ds.field('season').isin(list(seasons)))
+    if start_date is not None:
+        conditions.append(ds.field('date') >= pd.Timestamp(start_date).to_pydatetime())
+    if end_date is not None:
+        conditions.append(ds.field('date') < pd.Timestamp(end_date).to_pydatetime())
+    for c in conditions:
+        expression = c if expression is None else expression & c
+
+    table = dataset.to_table(columns=columns, filter=expression)
+    df = table.to_pandas()
+
+    # season is a storage detail, only return it if it was asked for
+    if columns is None or 'season' not in columns:
+        df = df.drop(columns=['season'], errors='ignore')
+
+    if 'date' in df.columns:
+        df = df.sort_values(by='date', kind='mergesort').reset_index(drop=True)
+
+    return df
+
+def migrate_pickles(data_dir: str, file_format: str='parquet') -> List[str]:
+    """
+    converts the pickled dataframes and object lists in data_dir to partitioned datasets
+    ...
+
+    Parameters
+    ----------
+    data_dir: str
+        root data directory containing the pickles
+    file_format: str
+        'parquet' or 'ipc'
+
+    Returns
+    -------
+    written: List[str]
+        names of the datasets written
+    """
+    written = []
+    for name in ['teams_df', 'goalies_df', 'games_df', 'team_stats', 'goalie_stats', 'games_info']:
+        pickle_path = os.path.join(data_dir, name + '.pkl')
+        if not os.path.exists(pickle_path):
+            continue
+
+        with open(pickle_path, 'rb') as f:
+            data = pickle.load(f)
+        if isinstance(data, list):
+            data = objects_to_frame(data)
+
+        write_frame(data, name, data_dir, file_format=file_format)
+        written.append(name)
+
+    return written
@@ -0,0 +1,15 @@
+import xgboost as xgb
+
+def build_dmatrices(X_train, y_train, X_valid, y_valid):
+    '''This function builds quantized train and valid matrices once so they can be reused by every trial'''
+    dtrain = xgb.QuantileDMatrix(X_train, label=y_train)
+    dvalid = xgb.QuantileDMatrix(X_valid, label=y_valid, ref=dtrain)
+    return dtrain, dvalid
+
+def train_booster(params, dtrain, dvalid):
+    '''This function trains a booster with the low level api and hist tree method'''
+    params = dict(params, objective='binary:logistic', eval_metric='logloss', tree_method='hist', seed=13)
+    booster = xgb.train(params, dtrain, num_boost_round=999,
+                        evals=[(dtrain, 'train'), (dvalid, 'valid')],
+                        early_stopping_rounds=15, verbose_eval=False)
+    return booster
@@ -1,144 +1,306 @@
-from hyperopt import fmin, tpe, hp, Trials
-import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+from nhl_mlmodel.instrument import instrument
+from nhl_mlmodel.metrics import metrics
+from nhl_mlmodel.model_server import model_server
+from nhl_mlmodel.odds import odds
+from nhl_mlmodel.process_data import process_data
+from nhl_mlmodel.storage import storage
+from nhl_mlmodel.train_xgb import helpers
+from nhl_mlmodel.walk_forward import walk_forward
 import numpy as np
+import os
 import pandas as pd
 import pickle
-from sklearn.metrics import accuracy_score, brier_score_loss
-from sklearn.calibration import calibration_curve
-import xgboost as xgb
 import sys
+import xgboost as xgb
 
 # show full columns on dfs
 pd.set_option('display.expand_frame_repr', False)
 pd.set_option("display.max_rows", 25)
 
 def cal_curve(data, bins, name):
-    # obtained from:
-    #https://scikit-learn.org/stable/auto_examples/calibration/plot_calibration_curve.html
-    fig = plt.figure(1, figsize=(12, 8))
-    ax1 = plt.subplot2grid((3, 1), (0, 0), rowspan=2)
-    ax2 = plt.subplot2grid((3, 1), (2, 0))
-
-    ax1.plot([0, 1], [0, 1], "k:", label="Perfectly calibrated")
-
-    for y_test, y_pred, y_proba, name in data:
-        brier = brier_score_loss(y_test, y_proba)
-        print("{}\t\tAccuracy:{:.4f}\t Brier Loss: {:.4f}".format(
-            name, accuracy_score(y_test, y_pred), brier))
-        fraction_of_positives, mean_predicted_value = \
-            calibration_curve(y_test, y_proba, n_bins=bins)
-        ax1.plot(mean_predicted_value, fraction_of_positives,
-                 label="%s (%1.4f)" % (name, brier))
-        ax2.hist(y_proba, range=(0, 1), bins=bins, label=name,
-                 histtype="step", lw=2)
-
-    ax1.set_ylabel("Fraction of positives")
-    ax1.set_ylim([-0.05, 1.05])
-    ax1.legend(loc="lower right")
-    ax1.set_title('Calibration plots  (reliability curve)')
-
-    ax2.set_xlabel("Mean predicted value")
-    ax2.set_ylabel("Count")
-    ax2.legend(loc="lower right")
-
-    plt.tight_layout()
-    fig.savefig(name)
-
-if __name__ == '__main__':
-    '''This module will train and evaluate an xgboost model along with hyper parameter optimization'''
-    pd.set_option('display.max_columns', None)
-    with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/games_df.pkl', 'rb') as f:
-        df = pickle.load(f)
-
-    # Shuffle data
-    np.random.seed(42)
-    df = df.reindex(np.random.permutation(df.index))
-    df.reset_index(inplace=True, drop=True)  # Reset index
-
-    # create test, train splits
-    X = df.drop(columns=['game_id', 'home_team', 'away_team', 'date', 'home_goalie_id', 'away_goalie_id',
-                         'home_team_win', 'home_goalie_name', 'away_goalie_name'])
-    y = df.home_team_win
-
-    X_train = X[:-2500]
-    y_train = y[:-2500]
-    X_valid = X[-2500:-500]
-    y_valid = y[-2500:-500]
-    X_test = X[-500:]
-    y_test = y[-500:]
-
-    # Train Model without optimizing hyperparameters
-    params = {'learning_rate': 0.05, 'max_depth': 5}
-    gbm = xgb.XGBClassifier(**params)
-    model = gbm.fit(X_train, y_train,
-                    eval_set=[[X_train, y_train],
-                              [X_valid, y_valid]],
-                    eval_metric='logloss',
-                    early_stopping_rounds=10)
-    xgb_test_preds = model.predict(X_test)
-    xgb_test_proba = model.predict_proba(X_test)[:, 1]
-
-    # Evaluate model
-    with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/baseline.pkl', 'rb') as f:
-        outcomes, predictions, probabilities = pickle.load(f)
-
-    data = [
-        (outcomes, predictions, probabilities, 'Sportsbook'),
-        (y_test, xgb_test_preds, xgb_test_proba, 'XGBoostStd')
+    '''This function prints the accuracy and brier score of each series and saves a calibration plot to name'''
+    return metrics.cal_curve(data, bins, name)
+
+######### Hyper Parameter Optimization Functions #########
+
+def cache_dmatrices(data, cache_dir):
+    '''This function saves the train and valid features and labels as float32 numpy arrays named after the
+    data_key of the data. Later runs on the same data load the arrays instead of converting the dataframes again.
+    Cached or not, the matrices are built by helpers.build_dmatrices so the trial losses do not depend on the
+    cache. Each file is written under a temporary name and renamed once complete, an interrupted run never leaves
+    a partial file that later searches would load.'''
+    key = data_key(data)
+    paths = tuple(os.path.join(cache_dir, f'{name}_{key}.npy') for name in ['X_train', 'y_train', 'X_valid',
+                                                                           'y_valid'])
+
+    if not all(os.path.exists(p) for p in paths):
+        os.makedirs(cache_dir, exist_ok=True)
+        for part, path in zip(data, paths):
+            with open(path + '.tmp', 'wb') as f:
+                np.save(f, part.to_numpy(dtype=np.float32))
+            os.replace(path + '.tmp', path)
+    return paths
+
+def predict_test(booster, X):
+    '''This function returns the predicted class and probability of each game from the trees up to the best
+    iteration of a booster trained with early stopping'''
+    proba = booster.predict(xgb.DMatrix(X), iteration_range=(0, booster.best_iteration + 1))
+    return (proba > 0.5).astype(int), proba
+
+def xgb_objective(params, dtrain, dvalid):
+    '''This function will evaluate the trained xgboost model based on the brier loss score'''
+    params['max_depth'] = int(params['max_depth'])
+    booster = helpers.train_booster(params, dtrain, dvalid)
+    xgb_test_proba = booster.predict(dvalid, iteration_range=(0, booster.best_iteration + 1))
+    score = metrics.brier_score(dvalid.get_label(), xgb_test_proba)
+    return (score)
+
+# train and valid matrices held by each worker process of the parallel search
+_worker_data = None
+
+def init_worker(data, cache_paths):
+    '''This function builds or loads the training matrices once in each worker process'''
+    global _worker_data
+    if cache_paths is not None:
+        _worker_data = helpers.build_dmatrices(*(np.load(p, mmap_mode='r') for p in cache_paths))
+    else:
+        _worker_data = helpers.build_dmatrices(*data)
+
+def run_trial(params):
+    '''This function evaluates one set of hyperparameters in a worker process'''
+    return xgb_objective(params, *_worker_data)
+
+def data_key(data):
+    '''This function returns a hash of the train and valid features, labels and feature names. Trials and cached
+    matrices are only reused for the same key.'''
+    key = hashlib.md5(','.join(data[0].columns).encode())
+    for part in data:
+        key.update(pd.util.hash_pandas_object(part, index=False).values)
+    return key.hexdigest()[:12]
+
+def save_trials(trials, trials_path, key):
+    '''This function saves the trials with the key of their data, replacing the previous file only once the new
+    one is written'''
+    with open(trials_path + '.tmp', 'wb') as f:
+        pickle.dump({'key': key, 'trials': trials}, f)
+    os.replace(trials_path + '.tmp', trials_path)
+
+def load_trials(trials_path, key):
+    '''This function loads the saved trials of a search on the same data. Trials of other data or features are
+    discarded since their losses were scored on different games.'''
+    from hyperopt import Trials
+
+    if trials_path is None or not os.path.exists(trials_path):
+        return Trials()
+
+    with open(trials_path, 'rb') as f:
+        saved = pickle.load(f)
+    if not isinstance(saved, dict) or saved.get('key') != key:
+        print('discarding saved trials of different data or features')
+        return Trials()
+
+    print(f'resuming search from {len(saved["trials"].trials)} trials')
+    return saved['trials']
+
+def parallel_search(space, data, max_evals, n_workers=4, trials_path=None, cache_dir=None, seed=42):
+    '''This function will tune hyperparameters evaluating n_workers trials at a time on a process pool.
+    The cpu threads are split between the workers. If trials_path is given the trials are saved after every
+    batch and a search that was interrupted resumes from the saved trials, as long as the data and features are
+    unchanged. If cache_dir is given the training matrices are saved there and reused by later searches on the
+    same data.'''
+    from hyperopt import tpe, space_eval, Domain, JOB_STATE_DONE, STATUS_OK
+    from hyperopt.base import spec_from_misc
+
+    key = data_key(data)
+    trials = load_trials(trials_path, key)
+
+    domain = Domain(run_trial, space)
+    rstate = np.random.default_rng(seed + len(trials.trials))
+    nthread = max(1, (os.cpu_count() or 1) // n_workers)
+
+    # only send the dataframes to the workers when there are no cached matrices to load
+    cache_paths = cache_dmatrices(data, cache_dir) if cache_dir is not None else None
+    initargs = (None if cache_paths else data, cache_paths)
+
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=init_worker, initargs=initargs) as executor:
+        while len(trials.trials) < max_evals:
+            # suggest a batch of points from the completed trials
+            new_ids = trials.new_trial_ids(min(n_workers, max_evals - len(trials.trials)))
+            docs = []
+            for tid in new_ids:
+                docs += tpe.suggest([tid], domain, trials, rstate.integers(2 ** 31 - 1))
+            batch = [space_eval(space, spec_from_misc(d['misc'])) for d in docs]
+            for params in batch:
+                params['nthread'] = nthread
+
+            losses = list(executor.map(run_trial, batch))
+
+            for d, loss in zip(docs, losses):
+                d['state'] = JOB_STATE_DONE
+                d['result'] = {'loss': loss, 'status': STATUS_OK}
+            trials.insert_trial_docs(docs)
+            trials.refresh()
+
+            if trials_path is not None:
+                save_trials(trials, trials_path, key)
+            print(f'{len(trials.trials)}/{max_evals} trials, best loss {min(trials.losses()):.5f}')
+
+    params = space_eval(space, trials.argmin)
+    params['max_depth'] = int(params['max_depth'])
+    return params, trials
+
+def select_features(booster, X, max_correlation=0.95, importance_share=0.99):
+    '''This function prunes the feature list of a trained booster. Features are taken in order of total gain until
+    they account for importance_share of the model's gain, features the model never split on are dropped and a
+    feature is skipped if it has an absolute correlation above max_correlation with a feature already kept. A booster
+    without any splits (ex. all features constant) gives no gain to rank by, so every feature is kept.'''
+    gain = pd.Series(booster.get_score(importance_type='total_gain'), dtype=np.float64).sort_values(ascending=False)
+    if gain.empty:
+        print('the model has no splits, keeping all {} features'.format(X.shape[1]))
+        return X.columns.tolist()
+
+    cumulative_share = gain.cumsum() / gain.sum()
+    # keep the feature that crosses the share threshold
+    candidates = gain.index[:int((cumulative_share < importance_share).sum()) + 1].tolist()
+
+    corr = np.abs(np.corrcoef(X[candidates].to_numpy(dtype=np.float64), rowvar=False))
+    corr = np.nan_to_num(corr)
+
+    kept = []
+    for i, feature in enumerate(candidates):
+        if all(corr[i, j] <= max_correlation for j in kept):
+            kept.append(i)
+
+    selected = [candidates[i] for i in kept]
+    # keep the games_df column order
+    return [c for c in X.columns if c in set(selected)]
+
+def brier_score(booster, dmatrix):
+    '''This function scores a booster on a labelled matrix with the brier loss score'''
+    return metrics.brier_score(dmatrix.get_label(), booster.predict(dmatrix))
+
+def incremental_retrain(model_path, df, valid_size=500, stop_size=250, rounds=50, mode='add',
+                        full_retrain_days=28):
+    '''This function refreshes an exported booster with the games played since it was last trained. mode 'add'
+    continues boosting new trees from the saved model and mode 'refresh' keeps the trees and updates their leaf
+    values. The most recent valid_size games are held out and the new model is only saved if its brier score on
+    them is no worse than the saved model's. The stop_size games before them are held out for early stopping, so
+    the games that decide the promotion are never used to select the new model. Once full_retrain_days have passed
+    since the last full retrain the model is instead trained from scratch with the parameters saved in its schema.
+    The full retrain does not search the parameters again, run train to tune them on the new games.'''
+    # the games are built with the current features, the saved model must have been trained on the same version
+    model_server.check_feature_version(model_path, process_data.FEATURE_VERSION)
+    booster, schema = model_server.load_booster(model_path)
+    features = schema['feature_names']
+    params = schema.get('params', {})
+
+    train_df, stop_df, valid_df = walk_forward.chronological_split(df, valid_size=stop_size, test_size=valid_size)
+    dvalid = xgb.DMatrix(valid_df[features], label=valid_df.home_team_win)
+    trained_through = pd.Timestamp(schema.get('trained_through', '1900-01-01'))
+    last_full_retrain = pd.Timestamp(schema.get('last_full_retrain', '1900-01-01'))
+
+    if schema['best_iteration'] is not None:
+        booster = booster[:schema['best_iteration'] + 1]
+    previous_score = brier_score(booster, dvalid)
+
+    if train_df.date.max() - last_full_retrain >= pd.Timedelta(days=full_retrain_days):
+        dtrain, dstop = helpers.build_dmatrices(train_df[features], train_df.home_team_win,
+                                                stop_df[features], stop_df.home_team_win)
+        candidate = helpers.train_booster(params, dtrain, dstop)
+        candidate = candidate[:candidate.best_iteration + 1]
+        last_full_retrain = train_df.date.max()
+        mode = 'full'
+    else:
+        new_df = train_df[train_df.date > trained_through]
+        if len(new_df) == 0:
+            print('no new games to train on')
+            return False
+        dnew = xgb.DMatrix(new_df[features], label=new_df.home_team_win)
+
+        if mode == 'refresh':
+            refresh_params = dict(params, process_type='update', updater='refresh', refresh_leaf=True)
+            candidate = xgb.train(refresh_params, dnew, num_boost_round=booster.num_boosted_rounds(),
+                                  xgb_model=booster)
+        else:
+            dstop = xgb.DMatrix(stop_df[features], label=stop_df.home_team_win)
+            add_params = dict(params, objective='binary:logistic', eval_metric='logloss', tree_method='hist')
+            candidate = xgb.train(add_params, dnew, num_boost_round=rounds, xgb_model=booster,
+                                  evals=[(dstop, 'stop')], early_stopping_rounds=15, verbose_eval=False)
+            candidate = candidate[:candidate.best_iteration + 1]
+
+    candidate_score = brier_score(candidate, dvalid)
+    print(f'{mode} retrain: brier {previous_score:.5f} -> {candidate_score:.5f}')
+
+    if candidate_score > previous_score:
+        print('keeping the previous model')
+        return False
+
+    # the candidate is already cut to its best iteration
+    model_server.export_booster(candidate, model_path,
+                                metadata={'best_iteration': None, 'params': params,
+                                          'trained_through': str(train_df.date.max()),
+                                          'last_full_retrain': str(last_full_retrain),
+                                          'feature_version': process_data.FEATURE_VERSION})
+    return True
+
+def same_game_comparison(test_df, preds, proba, name, data_dir):
+    '''This function returns the calibration curve data of the sportsbook and the model on the test games that have odds'''
+    index_df = odds.read_game_index(data_dir, odds.eastern_date(test_df.date).min(),
+                                    odds.eastern_date(test_df.date).max() + pd.Timedelta(days=1))
+    odds_df = odds.read_odds(data_dir, index_df.date.min(), index_df.date.max() + pd.Timedelta(days=1))
+    model_df = test_df[['game_id', 'home_team_win']].assign(preds=np.asarray(preds), proba=np.asarray(proba))
+    baseline_df = odds.sportsbook_baseline(odds.attach_odds(model_df, odds_df, index_df))
+
+    print(f'comparing on the {len(baseline_df)} of {len(test_df)} test games with a moneyline')
+    return [
+        (baseline_df.home_team_win, baseline_df.sb_home_win, baseline_df.sb_home_win_percent, 'Sportsbook'),
+        (baseline_df.home_team_win, baseline_df.preds, baseline_df.proba, name)
     ]
-    cal_curve(data, 15, 'unoptimized.png')
-
-    with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/xgb_model_unopt.pkl', 'wb') as f:
-        pickle.dump(model, f)
-
-
-    ######### Hyper Parameter Optimization Functions #########
 
-    def get_xgb_model(params):
-        '''This function will train the xgboost model'''
-        # comment the next 2 lines out to disable gpu
-        # params['gpu_id'] = 0
-        # params['tree_method'] = 'gpu_hist'
-        params['seed'] = 13
+def train(data_dir, hyperopt_runs=100, n_workers=4, cache_dir=None):
+    '''This function will train and evaluate an xgboost model along with hyper parameter optimization'''
+    from hyperopt import hp
 
-        gbm = xgb.XGBClassifier(**params, n_estimators=999)
-        model = gbm.fit(X_train, y_train,
-                        verbose=False,
-                        eval_set=[[X_train, y_train],
-                                  [X_valid, y_valid]],
-                        eval_metric='logloss',
-                        early_stopping_rounds=15)
-        return model
-
-
-    def xgb_objective(params):
-        '''This function will evaluate the trained xgboost model based on the brier loss score'''
-        params['max_depth'] = int(params['max_depth'])
-        model = get_xgb_model(params)
-        xgb_test_proba = model.predict_proba(X_valid)[:, 1]
-        score = brier_score_loss(y_valid, xgb_test_proba)
-        return (score)
+    pd.set_option('display.max_columns', None)
+    df = storage.read_frame('games_df', data_dir)
 
+    # split by date so that the model is never trained on games played after the games it is evaluated on
+    train_df, valid_df, test_df = walk_forward.chronological_split(df, valid_size=2000, test_size=500)
+    features = walk_forward.feature_columns(df)
 
-    trials = Trials()
+    X_train = train_df[features]
+    y_train = train_df.home_team_win
+    X_valid = valid_df[features]
+    y_valid = valid_df.home_team_win
+    X_test = test_df[features]
+    y_test = test_df.home_team_win
 
+    # Train Model without optimizing hyperparameters. both models are trained with train_booster, the learner the
+    # hyperparameters are tuned with
+    params = {'learning_rate': 0.05, 'max_depth': 5}
+    with instrument.stage('fit_unoptimized'):
+        booster = helpers.train_booster(params, *helpers.build_dmatrices(X_train, y_train, X_valid, y_valid))
+    xgb_test_preds, xgb_test_proba = predict_test(booster, X_test)
 
-    def get_xgbparams(space, evals=15):
-        '''This function will tune hyperparameters'''
-        params = fmin(xgb_objective,
-                      space=space,
-                      algo=tpe.suggest,
-                      max_evals=evals,
-                      trials=trials)
-        params['max_depth'] = int(params['max_depth'])
-        return params
+    # Evaluate model
+    # the sportsbook and the model are scored on the same games
+    data = same_game_comparison(test_df, xgb_test_preds, xgb_test_proba, 'XGBoostStd', data_dir)
+    cal_curve(data, 15, 'unoptimized.png')
 
+    model_server.export_booster(booster, os.path.join(data_dir, 'xgb_model_unopt.ubj'),
+                                metadata={'feature_version': process_data.FEATURE_VERSION})
 
-    ######################################################
+    # prune the features the model does not use or that duplicate a more important feature. the optimized model is
+    # trained on the selected features only and its exported schema holds the selected list
+    features = select_features(booster, X_train)
+    print(f'selected {len(features)} of {X_train.shape[1]} features')
+    X_train = X_train[features]
+    X_valid = X_valid[features]
+    X_test = X_test[features]
 
     # Train Model and optimize hyper parameters
-    hyperopt_runs = 100
-
     space = {
         'max_depth': hp.quniform('max_depth', 1, 8, 1),
         'min_child_weight': hp.quniform('min_child_weight', 3, 15, 1),
@@ -147,23 +309,37 @@ if __name__ == '__main__':
         'colsample_bytree': hp.quniform('colsample_bytree', 0.5, 1.0, .1),
         'reg_alpha': hp.qloguniform('reg_alpha', np.log(1e-2), np.log(1e2), 1e-2)
     }
-    xgb_params = get_xgbparams(space, hyperopt_runs)
-    xgb_params
-    pickle.dump(trials, open('xgb_params.pkl', 'wb'))
+    # trials are saved after every batch, re-running on the same games and features resumes the search. new games
+    # or a different feature selection start a new search
+    with instrument.stage('hyperopt', runs=hyperopt_runs):
+        xgb_params, trials = parallel_search(space, (X_train, y_train, X_valid, y_valid), hyperopt_runs,
+                                             n_workers=n_workers,
+                                             trials_path=os.path.join(data_dir, 'xgb_trials.pkl'),
+                                             cache_dir=cache_dir)
+    print(xgb_params)
 
     # Evaluate model
-    model = get_xgb_model(xgb_params)
-    xgb_test_preds = model.predict(X_test)
-    xgb_test_proba = model.predict_proba(X_test)[:, 1]
+    with instrument.stage('fit_optimized'):
+        booster = helpers.train_booster(xgb_params, *helpers.build_dmatrices(X_train, y_train, X_valid, y_valid))
+    xgb_test_preds, xgb_test_proba = predict_test(booster, X_test)
 
-    with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/baseline.pkl', 'rb') as f:
-        outcomes, predictions, probabilities = pickle.load(f)
-
-    data = [
-        (outcomes, predictions, probabilities, 'Sportsbook'),
-        (y_test, xgb_test_preds, xgb_test_proba, 'XGBoostOpt')
-    ]
+    # the sportsbook and the model are scored on the same games
+    data = same_game_comparison(test_df, xgb_test_preds, xgb_test_proba, 'XGBoostOpt', data_dir)
     cal_curve(data, 15, 'optimized.png')
 
-    with open('/Users/patrickpetanca/PycharmProjects/nhl_mlmodel/data/xgb_model_opt.pkl', 'wb') as f:
-        pickle.dump(model, f)
\ No newline at end of file
+    # the schema keeps the parameters and training dates used by incremental_retrain
+    model_server.export_booster(booster, os.path.join(data_dir, 'xgb_model_opt.ubj'),
+                                metadata={'params': xgb_params,
+                                          'trained_through': str(train_df.date.max()),
+                                          'last_full_retrain': str(train_df.date.max()),
+                                          'feature_version': process_data.FEATURE_VERSION})
+
+    return booster
+
+if __name__ == '__main__':
+    '''This module will train and evaluate an xgboost model along with hyper parameter optimization'''
+    from nhl_mlmodel.config import config
+    settings = config.load()
+
+    train(settings.data_dir, hyperopt_runs=100, n_workers=settings.n_workers,
+          cache_dir=settings.cache_dir('dmatrix_cache'))
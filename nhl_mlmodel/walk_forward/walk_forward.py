@@ -0,0 +1,334 @@
+# This module defines the walk forward backtest used to evaluate the model.
+# For every window the model is trained only on games played before the window and then predicts the games in
+# the window, so the evaluation never uses future games the way a shuffled split does.
+
+from concurrent.futures import ProcessPoolExecutor
+import datetime as dt
+import hashlib
+from nhl_mlmodel.metrics import metrics
+from nhl_mlmodel.storage import helpers
+from nhl_mlmodel.train_xgb import helpers as xgb_helpers
+import numpy as np
+import os
+import pandas as pd
+from typing import Dict, List, Tuple
+
+# columns of games_df that identify a game or hold the outcome rather than a model feature
+NON_FEATURE_COLUMNS = ['game_id', 'home_team', 'away_team', 'date', 'home_goalie_id', 'away_goalie_id',
+                       'home_team_win', 'home_goalie_name', 'away_goalie_name']
+
+def feature_columns(df: pd.DataFrame) -> List[str]:
+    """
+    returns the model feature columns of games_df
+    ...
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        games_df
+
+    Returns
+    -------
+    columns: List[str]
+        feature column names in games_df order
+    """
+    return [c for c in df.columns if c not in NON_FEATURE_COLUMNS]
+
+def chronological_split(df: pd.DataFrame, valid_size: int, test_size: int) -> (pd.DataFrame, pd.DataFrame,
+                                                                                  pd.DataFrame):
+    """
+    splits games_df into train, valid and test sets by date. the test set holds the most recent games and
+    the valid set the games just before them
+    ...
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        games_df
+    valid_size: int
+        number of games in the valid set
+    test_size: int
+        number of games in the test set
+
+    Returns
+    -------
+    train_df: pd.DataFrame
+        oldest games
+    valid_df: pd.DataFrame
+        games between the train and test sets
+    test_df: pd.DataFrame
+        most recent games
+    """
+    df = df.sort_values(by='date', kind='mergesort').reset_index(drop=True)
+    valid_start = len(df) - valid_size - test_size
+    test_start = len(df) - test_size
+
+    return df[:valid_start], df[valid_start:test_start], df[test_start:]
+
+def season_windows(dates: pd.Series, min_train_seasons: int=2) -> List[Tuple[dt.datetime, dt.datetime]]:
+    """
+    makes one window per season: train on all previous seasons, test on the season
+    ...
+
+    Parameters
+    ----------
+    dates: pd.Series
+        dates of the games
+    min_train_seasons: int
+        number of seasons to train on before the first test window
+
+    Returns
+    -------
+    windows: List[Tuple[dt.datetime, dt.datetime]]
+        list of (test_start, test_end). games before test_start are used for training
+    """
+    dates = pd.to_datetime(dates)
+    seasons = helpers.season_of(dates)
+    starts = dates.groupby(seasons).min().sort_index()
+
+    windows = []
+    for i in range(min_train_seasons, len(starts)):
+        test_end = starts.iloc[i + 1] if i + 1 < len(starts) else dates.max() + pd.Timedelta(days=1)
+        windows.append((starts.iloc[i].to_pydatetime(), test_end.to_pydatetime()))
+
+    return windows
+
+def date_windows(dates: pd.Series, first_test_date: dt.datetime,
+                 days: int=30) -> List[Tuple[dt.datetime, dt.datetime]]:
+    """
+    makes windows of a fixed number of days starting at first_test_date: train on all games before the
+    window, test on the games in the window
+    ...
+
+    Parameters
+    ----------
+    dates: pd.Series
+        dates of the games
+    first_test_date: dt.datetime
+        start of the first test window
+    days: int
+        length of each window in days
+
+    Returns
+    -------
+    windows: List[Tuple[dt.datetime, dt.datetime]]
+        list of (test_start, test_end). windows without games are skipped
+    """
+    dates = pd.to_datetime(dates)
+    last = dates.max()
+
+    windows = []
+    start = pd.Timestamp(first_test_date)
+    while start <= last:
+        end = start + pd.Timedelta(days=days)
+        if ((dates >= start) & (dates < end)).any():
+            windows.append((start.to_pydatetime(), end.to_pydatetime()))
+        start = end
+
+    return windows
+
+def cache_features(df: pd.DataFrame, cache_dir: str) -> Dict[str, str]:
+    """
+    saves the feature matrix, outcomes and dates of games_df as .npy files named after a hash of the
+    data. workers memory map the files instead of receiving a copy of the dataframe, and later backtests
+    on the same data reuse them
+    ...
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        games_df sorted by date
+    cache_dir: str
+        directory to save the files to
+
+    Returns
+    -------
+    paths: Dict[str, str]
+        paths of the 'X', 'y' and 'dates' arrays
+    """
+    key = hashlib.md5(pd.util.hash_pandas_object(df, index=False).values).hexdigest()[:12]
+    paths = {name: os.path.join(cache_dir, f'{name}_{key}.npy') for name in ['X', 'y', 'dates']}
+
+    if not all(os.path.exists(p) for p in paths.values()):
+        os.makedirs(cache_dir, exist_ok=True)
+        X, y, dates = feature_arrays(df)
+        np.save(paths['X'], X)
+        np.save(paths['y'], y)
+        np.save(paths['dates'], dates)
+
+    return paths
+
+def feature_arrays(df: pd.DataFrame) -> (np.ndarray, np.ndarray, np.ndarray):
+    """
+    converts games_df to the arrays used by the backtest
+    ...
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        games_df sorted by date
+
+    Returns
+    -------
+    X: np.ndarray
+        float32 feature matrix
+    y: np.ndarray
+        1 if the home team won
+    dates: np.ndarray
+        datetime64 dates of the games
+    """
+    X = df[feature_columns(df)].to_numpy(dtype=np.float32)
+    y = df['home_team_win'].to_numpy(dtype=np.int8)
+    dates = pd.to_datetime(df['date']).to_numpy(dtype='datetime64[ns]')
+    return X, y, dates
+
+# arrays and settings held by each worker process of the backtest
+_worker_data = None
+
+def init_worker(arrays, paths, params, valid_fraction):
+    '''This function loads the backtest arrays once in each worker process'''
+    global _worker_data
+    if paths is not None:
+        arrays = tuple(np.load(paths[name], mmap_mode='r') for name in ['X', 'y', 'dates'])
+    _worker_data = (arrays, params, valid_fraction)
+
+def evaluate_window(arrays: tuple, window: Tuple[dt.datetime, dt.datetime], params: dict,
+                    valid_fraction: float=0.1) -> dict:
+    """
+    trains a model on the games before a window and scores its predictions for the games in the window.
+    the most recent valid_fraction of the training games are held out for early stopping
+    ...
+
+    Parameters
+    ----------
+    arrays: tuple
+        X, y and dates returned by feature_arrays
+    window: Tuple[dt.datetime, dt.datetime]
+        (test_start, test_end)
+    params: dict
+        xgboost parameters
+    valid_fraction: float
+        fraction of the training games used for early stopping
+
+    Returns
+    -------
+    result: dict
+        window dates, number of games and the brier score, log loss and accuracy on the window
+    """
+    X, y, dates = arrays
+    test_start, test_end = window
+    train_end = int(np.searchsorted(dates, np.datetime64(test_start), side='left'))
+    test_stop = int(np.searchsorted(dates, np.datetime64(test_end), side='left'))
+    valid_start = int(train_end * (1 - valid_fraction))
+
+    dtrain, dvalid = xgb_helpers.build_dmatrices(X[:valid_start], y[:valid_start],
+                                                 X[valid_start:train_end], y[valid_start:train_end])
+    booster = xgb_helpers.train_booster(params, dtrain, dvalid)
+
+    y_test = np.asarray(y[train_end:test_stop])
+    proba = booster.inplace_predict(np.asarray(X[train_end:test_stop]),
+                                    iteration_range=(0, booster.best_iteration + 1))
+
+    return {'test_start': test_start, 'test_end': test_end, 'n_train': train_end,
+            'n_test': test_stop - train_end, 'best_iteration': booster.best_iteration,
+            'brier': metrics.brier_score(y_test, proba),
+            'log_loss': metrics.log_loss(y_test, proba),
+            'accuracy': metrics.accuracy(y_test, proba)}
+
+def run_window(window):
+    '''This function evaluates one window in a worker process'''
+    arrays, params, valid_fraction = _worker_data
+    return evaluate_window(arrays, window, params, valid_fraction)
+
+def backtest(df: pd.DataFrame, windows: List[Tuple[dt.datetime, dt.datetime]], params: dict,
+             n_workers: int=4, cache_dir: str=None, valid_fraction: float=0.1) -> pd.DataFrame:
+    """
+    runs a walk forward backtest, evaluating the windows in parallel on a process pool
+    ...
+
+    Parameters
+    ----------
+    df: pd.DataFrame
+        games_df
+    windows: List[Tuple[dt.datetime, dt.datetime]]
+        windows from season_windows or date_windows
+    params: dict
+        xgboost parameters (ex. the tuned parameters from train_xgb)
+    n_workers: int
+        number of windows to evaluate at the same time
+    cache_dir: str
+        directory to cache the feature matrix in. None sends the arrays to each worker instead
+    valid_fraction: float
+        fraction of each training window used for early stopping
+
+    Returns
+    -------
+    results_df: pd.DataFrame
+        one row per window with the brier score, log loss and accuracy of its predictions
+    """
+    df = df.sort_values(by='date', kind='mergesort').reset_index(drop=True)
+
+    # split the cpu threads between the workers so that parallel windows do not oversubscribe the cpu
+    params = dict(params, nthread=max(1, (os.cpu_count() or 1) // n_workers))
+    params['max_depth'] = int(params.get('max_depth', 6))
+
+    if cache_dir is not None:
+        initargs = (None, cache_features(df, cache_dir), params, valid_fraction)
+    else:
+        initargs = (feature_arrays(df), None, params, valid_fraction)
+
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=init_worker, initargs=initargs) as executor:
+        results = list(executor.map(run_window, windows))
+
+    return pd.DataFrame(results)
+
+def run_backtest(data_dir: str, params: dict, n_workers: int=4, cache_dir: str=None,
+                 window_days: int=None) -> pd.DataFrame:
+    """
+    runs a walk forward backtest of the stored games_df
+    ...
+
+    Parameters
+    ----------
+    data_dir: str
+        root data directory
+    params: dict
+        xgboost parameters
+    n_workers: int
+        number of windows to evaluate at the same time
+    cache_dir: str
+        directory to cache the feature matrix in
+    window_days: int
+        test on windows of this many days over the last 180 days. None tests on every season after the
+        first two
+
+    Returns
+    -------
+    results_df: pd.DataFrame
+        dataframe returned by backtest
+    """
+    from nhl_mlmodel.storage import storage
+
+    df = storage.read_frame('games_df', data_dir)
+
+    if window_days is None:
+        windows = season_windows(df['date'])
+    else:
+        windows = date_windows(df['date'], df['date'].max() - pd.Timedelta(days=180), days=window_days)
+
+    results_df = backtest(df, windows, params, n_workers=n_workers, cache_dir=cache_dir)
+    print(results_df)
+    print(results_df[['brier', 'log_loss', 'accuracy']].mean())
+
+    return results_df
+
+if __name__ == '__main__':
+    '''This module will run a walk forward backtest of the model over every season in games_df'''
+    from nhl_mlmodel.config import config
+    from nhl_mlmodel.model_server import model_server
+    settings = config.load()
+
+    # the backtest retrains with the parameters tuned by train
+    params = model_server.model_params(settings.path('xgb_model_opt.ubj'))
+    run_backtest(settings.data_dir, params, n_workers=settings.n_workers,
+                 cache_dir=settings.cache_dir('backtest_cache'))
@@ -1,9 +1,11 @@
-from setuptools import setup
+
+from setuptools import find_packages, setup
 
 setup(
     name='nhl_mlmodel',
     version='0.0.1',
-    packages=['nhl_mlmodel', 'nhl_mlmodel.covers_scraper'],
+    packages=find_packages(include=['nhl_mlmodel', 'nhl_mlmodel.*']),
+    entry_points={'console_scripts': ['nhl-mlmodel=nhl_mlmodel.runner:main']},
     url='https://github.com/patrick1601/nhl_mlmodel',
     license='MIT License 2021',
     author='Patrick Petanca',
@@ -0,0 +1,73 @@
+from benchmarks import equivalence
+from benchmarks import synthetic
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+import unittest
+
+class TestCompareFrames(unittest.TestCase):
+    def setUp(self):
+        self.legacy = pd.DataFrame({'game_id': ['3', '1', '2', '2'],
+                                    'team': ['TOR', 'MTL', 'BOS', 'BUF'],
+                                    'goals_3_avg': [2.0, np.nan, 3.5, 1.25]})
+
+    def test_equivalent(self):
+        """
+        test that rows are matched by key and that float32 rounding is within the tolerance
+        :return:
+        """
+        candidate = self.legacy.iloc[[2, 3, 0, 1]].copy()
+        candidate['goals_3_avg'] = candidate['goals_3_avg'].astype(np.float32)
+
+        report, rows = equivalence.compare_frames(self.legacy, candidate, ['game_id'])
+
+        self.assertTrue((report.status == 'ok').all())
+        self.assertEqual(rows['legacy_only'], 0)
+        self.assertEqual(report.set_index('column').loc['goals_3_avg', 'candidate_dtype'], 'float32')
+
+    def test_differences(self):
+        """
+        test that values out of tolerance, NaN patterns and missing columns are reported
+        :return:
+        """
+        candidate = self.legacy.drop(columns='team')
+        candidate['goals_3_avg'] = [2.5, 1.0, 3.5, 1.25]
+
+        report, _ = equivalence.compare_frames(self.legacy, candidate, ['game_id'])
+        report = report.set_index('column')
+
+        self.assertEqual(report.loc['team', 'status'], 'missing')
+        self.assertEqual(report.loc['goals_3_avg', 'status'], 'differs')
+        self.assertEqual(report.loc['goals_3_avg', 'nan_mismatches'], 1)
+        self.assertEqual(report.loc['goals_3_avg', 'mismatches'], 1)
+        self.assertAlmostEqual(report.loc['goals_3_avg', 'max_abs_diff'], 0.5)
+        self.assertAlmostEqual(report.loc['goals_3_avg', 'max_rel_diff'], 0.25)
+
+    def test_rows(self):
+        """
+        test that rows found in only one output are counted
+        :return:
+        """
+        report, rows = equivalence.compare_frames(self.legacy, self.legacy.iloc[:3], ['game_id'])
+
+        self.assertEqual(rows, {'legacy': 4, 'candidate': 3, 'legacy_only': 1, 'candidate_only': 0})
+        self.assertTrue((report.status == 'ok').all())
+
+class TestRunStage(unittest.TestCase):
+    def test_same_implementation(self):
+        """
+        test that a stage run twice on the prepared inputs is equivalent to itself
+        :return:
+        """
+        with contextlib.redirect_stdout(io.StringIO()):
+            inputs = equivalence.prepare_inputs(*synthetic.make_seasons(1, n_teams=6))
+            first = equivalence.run_stage('get_diff_df_goalies', {k: v.copy() for k, v in inputs.items()})
+            second = equivalence.run_stage('get_diff_df_goalies', {k: v.copy() for k, v in inputs.items()})
+
+        report, rows = equivalence.compare_frames(first, second, equivalence.STAGE_KEYS['get_diff_df_goalies'])
+        self.assertTrue((report.status == 'ok').all())
+        self.assertEqual(rows['candidate_only'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
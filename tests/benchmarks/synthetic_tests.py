@@ -0,0 +1,59 @@
+from benchmarks import synthetic
+import collections
+import unittest
+
+class TestMakeSeasons(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.team_stats, cls.goalie_stats, cls.games_info = synthetic.make_seasons(2, n_teams=8, seed=3)
+
+    def test_deterministic(self):
+        """
+        test that the same seed returns the same games and another seed different games
+        :return:
+        """
+        team_stats, goalie_stats, games_info = synthetic.make_seasons(2, n_teams=8, seed=3)
+        self.assertEqual([g.to_dict() for g in goalie_stats], [g.to_dict() for g in self.goalie_stats])
+        self.assertEqual([g.to_dict() for g in games_info], [g.to_dict() for g in self.games_info])
+
+        other = synthetic.make_seasons(2, n_teams=8, seed=4)[2]
+        self.assertNotEqual([g.to_dict() for g in other], [g.to_dict() for g in self.games_info])
+
+    def test_schedule(self):
+        """
+        test that every team plays a full season per year with about half of its games at home
+        :return:
+        """
+        played = collections.Counter((str(t.game_id)[:4], t.team) for t in self.team_stats)
+        home = collections.Counter((str(t.game_id)[:4], t.team) for t in self.team_stats if t.is_home_team)
+
+        self.assertEqual(len(played), 16)
+        self.assertEqual(set(played.values()), {synthetic.SEASON_GAMES})
+        self.assertLessEqual(max(abs(n - synthetic.SEASON_GAMES // 2) for n in home.values()), 1)
+        self.assertEqual(len(self.team_stats), 2 * len(self.games_info))
+
+    def test_goalies(self):
+        """
+        test that the goalie stats add up to the shots and goals of the other team and that the starters
+        play most of the games
+        :return:
+        """
+        teams = {(t.game_id, t.is_home_team): t for t in self.team_stats}
+        faced = collections.defaultdict(lambda: [0, 0])
+        for g in self.goalie_stats:
+            self.assertEqual(g.saves, g.evenSaves + g.powerPlaySaves + g.shortHandedSaves)
+            self.assertEqual(g.shots, g.evenShotsAgainst + g.powerPlayShotsAgainst + g.shortHandedShotsAgainst)
+            faced[(g.game_id, not g.is_home_team)][0] += g.shots
+            faced[(g.game_id, not g.is_home_team)][1] += g.shots - g.saves
+
+        for key, team in teams.items():
+            self.assertEqual(faced[key], [team.shots, team.goals])
+
+        starts = collections.Counter((str(t.game_id)[:4], t.team, t.goalie_id) for t in self.team_stats)
+        most = collections.Counter()
+        for (season, team, _), n in starts.items():
+            most[(season, team)] = max(most[(season, team)], n)
+        self.assertGreater(sum(most.values()) / len(self.team_stats), 0.55)
+
+if __name__ == '__main__':
+    unittest.main()
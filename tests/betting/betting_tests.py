@@ -0,0 +1,89 @@
+from nhl_mlmodel.betting import betting
+import numpy as np
+import pandas as pd
+import unittest
+
+class TestSimulate(unittest.TestCase):
+    def setUp(self):
+        # the model sees an edge on the first two games only
+        self.proba = np.array([0.6, 0.6, 0.4])
+        self.home_ml = np.array([100, 100, -150])
+        self.outcomes = np.array([True, False, True])
+
+    def test_flat(self):
+        """
+        test that flat stakes are only placed above the edge and add up from the starting bankroll
+        :return:
+        """
+        grid = betting.strategy_grid(edges=[0.05, 0.2], flat_stakes=[0.1])
+        bankroll, staked = betting.simulate(self.proba, self.home_ml, self.outcomes, grid)
+        np.testing.assert_allclose(bankroll[:, 0], [1.1, 1.0, 1.0])
+        np.testing.assert_allclose(staked[:, 0], [0.1, 0.1, 0.0])
+        np.testing.assert_allclose(bankroll[:, 1], [1.0, 1.0, 1.0])
+
+    def test_kelly(self):
+        """
+        test that kelly stakes are a fraction of the current bankroll
+        :return:
+        """
+        grid = betting.strategy_grid(edges=[0.0], kelly_fractions=[1.0, 0.5])
+        bankroll, staked = betting.simulate(self.proba, self.home_ml, self.outcomes, grid)
+        # kelly at even odds with a 0.6 probability stakes 20% of the bankroll
+        np.testing.assert_allclose(bankroll[:, 0], [1.2, 0.96, 0.96])
+        np.testing.assert_allclose(staked[:, 0], [0.2, 0.24, 0.0])
+        np.testing.assert_allclose(bankroll[:, 1], [1.1, 0.99, 0.99])
+
+    def test_home_only(self):
+        """
+        test that only the home team is bet on, even when the model favours the away team
+        :return:
+        """
+        grid = betting.strategy_grid(edges=[0.0], flat_stakes=[1.0])
+        bankroll, staked = betting.simulate([0.3, 0.6], [-110, 100], [False, True], grid)
+        np.testing.assert_allclose(staked[:, 0], [0.0, 1.0])
+        np.testing.assert_allclose(bankroll[:, 0], [1.0, 2.0])
+
+class TestSummarize(unittest.TestCase):
+    def test_drawdown(self):
+        """
+        test the roi and max drawdown of a bankroll curve
+        :return:
+        """
+        grid = betting.strategy_grid(edges=[0.0], flat_stakes=[0.5])
+        bankroll = np.array([[1.5], [1.0], [1.25]])
+        staked = np.array([[0.5], [0.5], [0.5]])
+        results_df = betting.summarize(grid, bankroll, staked)
+        self.assertAlmostEqual(results_df['roi'].iloc[0], 0.25 / 1.5)
+        self.assertAlmostEqual(results_df['max_drawdown'].iloc[0], 1.0 / 1.5 - 1)
+        self.assertEqual(results_df['bets'].iloc[0], 3)
+
+    def test_empty(self):
+        """
+        test that a grid run on no games places no bets and keeps the starting bankroll
+        :return:
+        """
+        bets_df = pd.DataFrame({'xgb_home_win_percent': pd.Series(dtype=float), 'home_ml': pd.Series(dtype=float),
+                                'home_team_win': pd.Series(dtype=bool)})
+        grid = betting.strategy_grid(edges=[0.0, 0.02], flat_stakes=[0.01], kelly_fractions=[0.25])
+        results_df = betting.run_grid(bets_df, grid, n_workers=1)
+        self.assertEqual(len(results_df), len(grid))
+        self.assertTrue((results_df['bets'] == 0).all())
+        self.assertTrue((results_df['final_bankroll'] == 1.0).all())
+        self.assertTrue((results_df['max_drawdown'] == 0.0).all())
+
+    def test_run_grid(self):
+        """
+        test that the grid gives the same results split in chunks
+        :return:
+        """
+        rng = np.random.default_rng(0)
+        bets_df = pd.DataFrame({'xgb_home_win_percent': rng.uniform(0.3, 0.7, 200),
+                                'home_ml': rng.choice([-150, -120, 110, 130], 200),
+                                'home_team_win': rng.uniform(size=200) < 0.55})
+        grid = betting.strategy_grid(edges=[0.0, 0.02, 0.05], flat_stakes=[0.01], kelly_fractions=[0.25, 1.0])
+        whole = betting.run_grid(bets_df, grid, n_workers=1, chunk_size=len(grid)).sort_index()
+        chunked = betting.run_grid(bets_df, grid, n_workers=1, chunk_size=2).sort_index()
+        pd.testing.assert_frame_equal(whole, chunked)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+from nhl_mlmodel.config import config
+import os
+import unittest
+from unittest import mock
+
+class TestLoad(unittest.TestCase):
+    def test_environment(self):
+        """
+        test that the settings are read from the environment variables
+        :return:
+        """
+        env = {config.DATA_DIR_ENV: '/tmp/nhl_data', config.WORKERS_ENV: '3', config.CACHE_ENV: '0'}
+        with mock.patch.dict(os.environ, env):
+            settings = config.load()
+        self.assertEqual(settings.data_dir, '/tmp/nhl_data')
+        self.assertEqual(settings.n_workers, 3)
+        self.assertIsNone(settings.cache_dir('covers_cache'))
+
+    def test_arguments(self):
+        """
+        test that arguments override the environment variables
+        :return:
+        """
+        with mock.patch.dict(os.environ, {config.DATA_DIR_ENV: '/tmp/nhl_data', config.WORKERS_ENV: '3'}):
+            settings = config.load('/tmp/other', n_workers=1, use_cache=True)
+        self.assertEqual(settings.path('games.db'), '/tmp/other/games.db')
+        self.assertEqual(settings.n_workers, 1)
+        self.assertEqual(settings.cache_dir('covers_cache'), '/tmp/other/covers_cache')
+
+if __name__ == '__main__':
+    unittest.main()
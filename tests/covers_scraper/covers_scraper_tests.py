@@ -11,5 +11,34 @@ class TestGetNhlDates(unittest.TestCase):
         result = covers_scraper.get_nhl_dates(20172018)
         self.assertEqual(result[6], dt.datetime(2017,10,10,0,0))
 
+class TestParseMatchups(unittest.TestCase):
+    def test_game_box(self):
+        """
+        test that a game box is parsed into an NhlGame
+        :return:
+        """
+        html = '<div class="cmg_matchup_game_box" data-event-id="77" data-home-team-shortname-search="TOR" ' \
+               'data-away-team-shortname-search="MTL" data-game-odd="-150">' \
+               '<div class="cmg_matchup_list_score_home">3</div><div class="cmg_matchup_list_score_away">2</div></div>'
+        result = covers_scraper.parse_matchups(html, dt.datetime(2019, 10, 2))
+        self.assertEqual(len(result), 1)
+        self.assertEqual((result[0].date, result[0].home_team, result[0].home_ml, result[0].home_score),
+                         ('2019-10-02', 'TOR', '-150', '3'))
+    def test_backends(self):
+        """
+        test that the lxml and BeautifulSoup backends parse boxes with extra classes and missing scores the same
+        :return:
+        """
+        html = '<div><div class="cmg_matchup_game_box extra" data-event-id="1" data-home-team-shortname-search="BOS" ' \
+               'data-away-team-shortname-search="OTT" data-game-odd="120">' \
+               '<div class="cmg_matchup_list_score_home"> 1 </div><div class="cmg_matchup_list_score_away">4</div></div>' \
+               '<div class="cmg_matchup_game_box" data-event-id="2" data-home-team-shortname-search="TOR" ' \
+               'data-away-team-shortname-search="MTL" data-game-odd="-150"></div></div>'
+        date = dt.datetime(2019, 10, 2)
+        lxml_games = [vars(g) for g in covers_scraper.parse_matchups(html, date, 'lxml')]
+        bs4_games = [vars(g) for g in covers_scraper.parse_matchups(html, date, 'bs4')]
+        self.assertEqual(lxml_games, bs4_games)
+        self.assertEqual([(g['game_id'], g['home_score']) for g in lxml_games], [('1', '1'), ('2', '')])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
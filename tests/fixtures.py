@@ -0,0 +1,28 @@
+# This module builds the games_df shaped frames shared by the tests from the synthetic seasons of
+# benchmarks.synthetic, so the tests do not each need their own random frame and do not pay for
+# process_data.build_dataframes when they only need a few features.
+#
+# usage: games_df = fixtures.make_games_df(n_seasons=2, seed=0)
+
+from benchmarks import synthetic
+from nhl_mlmodel.storage import storage
+import numpy as np
+
+def make_games_df(n_seasons=1, n_teams=8, first_year=2019, seed=0):
+    '''returns one row per synthetic game with the columns of a games_df. teams_goals_10_avg_diff is half the goal
+    difference of the game plus noise so it predicts the outcome, home_rest is the days the home team rested
+    (at most 4) and goalies_saves_20_std_diff is small noise'''
+    team_stats, _, games_info = synthetic.make_seasons(n_seasons, n_teams=n_teams, first_year=first_year, seed=seed)
+    teams_df = storage.objects_to_frame(team_stats)
+    games_df = storage.objects_to_frame(games_info)[['game_id', 'date', 'home_team', 'away_team', 'home_team_win']]
+
+    teams_df['rest'] = (teams_df.groupby('team').date.diff().dt.days - 1).fillna(4).clip(upper=4).astype(int)
+    home = teams_df[teams_df.is_home_team].set_index('game_id')
+    away = teams_df[~teams_df.is_home_team].set_index('game_id')
+    goal_diff = (home.goals - away.goals).reindex(games_df.game_id).to_numpy()
+
+    rng = np.random.default_rng(seed)
+    n = len(games_df)
+    return games_df.assign(home_rest=home.rest.reindex(games_df.game_id).to_numpy(),
+                           teams_goals_10_avg_diff=goal_diff / 2 + rng.normal(0, 1, n),
+                           goalies_saves_20_std_diff=rng.normal(0, 1e-3, n))
@@ -0,0 +1,77 @@
+import datetime as dt
+from nhl_mlmodel.game_store import game_store
+from nhl_mlmodel.nhl_scraper import nhl_scraper
+import pandas as pd
+import unittest
+
+def make_game(game_id, date, home_team_win):
+    team = nhl_scraper.NhlTeam(date=date, game_id=game_id, team='TOR', is_home_team=True,
+                               home_team_win=home_team_win, goals=3, pim=4, shots=30,
+                               powerPlayPercentage='50.0', powerPlayGoals=1.0, powerPlayOpportunities=2.0,
+                               faceOffWinPercentage='52.1', blocked=10, takeaways=5, giveaways=7, hits=20,
+                               goalie_id=8475883, goalie_name='Frederik Andersen')
+    goalie = nhl_scraper.NhlGoalie(date=date, game_id=game_id, team='TOR', is_home_team=True,
+                                   goalie_name='Frederik Andersen', goalie_id=8475883, timeOnIce='60:00',
+                                   assists=0, goals=0, pim=0, shots=30, saves=28, powerPlaySaves=3,
+                                   shortHandedSaves=0, evenSaves=25, shortHandedShotsAgainst=0,
+                                   evenShotsAgainst=26, powerPlayShotsAgainst=4, decision='W',
+                                   savePercentage=93.3, evenStrengthSavePercentage=96.2)
+    game = nhl_scraper.NhlGame(date=date, game_id=game_id, home_team='TOR', away_team='MTL',
+                               home_team_win=home_team_win, home_goalie_id=8475883, away_goalie_id=8471679,
+                               home_goalie_name='Frederik Andersen', away_goalie_name='Carey Price')
+    return [team], [goalie], [game]
+
+class TestUpsertGames(unittest.TestCase):
+    def test_idempotent(self):
+        """
+        test that writing the same game twice stores it once
+        :return:
+        """
+        conn = game_store.connect(':memory:')
+        game_store.upsert_games(conn, *make_game(2020020001, dt.datetime(2021, 1, 14, 0, 0), True))
+        game_store.upsert_games(conn, *make_game(2020020001, dt.datetime(2021, 1, 14, 0, 0), True))
+        self.assertEqual(game_store.stored_game_ids(conn), {2020020001})
+    def test_round_trip(self):
+        """
+        test that stored objects are loaded with the same values and types
+        :return:
+        """
+        conn = game_store.connect(':memory:')
+        teams, goalies, games = make_game(2020020001, dt.datetime(2021, 1, 14, 0, 0), False)
+        game_store.upsert_games(conn, teams, goalies, games)
+        result = game_store.load_team_stats(conn)
+        self.assertEqual(result[0].to_dict(), teams[0].to_dict())
+    def test_date_range(self):
+        """
+        test that games can be filtered by date and team
+        :return:
+        """
+        conn = game_store.connect(':memory:')
+        game_store.upsert_games(conn, *make_game(2020020001, dt.datetime(2021, 1, 14, 0, 0), True))
+        game_store.upsert_games(conn, *make_game(2020020002, dt.datetime(2021, 1, 16, 0, 0), True))
+        result = game_store.load_games_info(conn, start_date=dt.datetime(2021, 1, 15), team='MTL')
+        self.assertEqual([g.game_id for g in result], [2020020002])
+
+class TestUpsertPredictions(unittest.TestCase):
+    def test_dates(self):
+        """
+        test that predictions dated with a date and a datetime are both queried back as datetimes
+        :return:
+        """
+        conn = game_store.connect(':memory:')
+        predict_df = pd.DataFrame({'game_id': [2020020001, 2020020002],
+                                   'date': [dt.datetime(2021, 1, 14, 0, 0), dt.datetime(2021, 1, 16, 0, 0)],
+                                   'home_team': ['TOR', 'TOR'], 'away_team': ['MTL', 'OTT'],
+                                   'home_goalie_id': [8475883, 8475883], 'away_goalie_id': [8471679, 8467950],
+                                   'home_goalie_name': ['Frederik Andersen'] * 2,
+                                   'away_goalie_name': ['Carey Price', 'Matt Murray'],
+                                   'xgb_home_win': [True, False], 'xgb_home_win_percent': [0.6, 0.4]})
+        # a column of dates stays as dt.date objects, pandas converts a column with datetimes to timestamps
+        game_store.upsert_predictions(conn, predict_df[:1].assign(date=[dt.date(2021, 1, 14)]))
+        game_store.upsert_predictions(conn, predict_df[1:])
+        result = game_store.query(conn, 'predictions', start_date=dt.datetime(2021, 1, 14))
+        self.assertEqual([r['date'] for r in result], [dt.datetime(2021, 1, 14), dt.datetime(2021, 1, 16)])
+        self.assertEqual([r['xgb_home_win'] for r in result], [True, False])
+
+if __name__ == '__main__':
+    unittest.main()
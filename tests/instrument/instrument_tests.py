@@ -0,0 +1,78 @@
+from nhl_mlmodel.instrument import instrument
+import json
+import os
+import tempfile
+import unittest
+
+class TestStage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'metrics.jsonl')
+        instrument.configure(self.path)
+
+    def tearDown(self):
+        instrument.configure()
+        self.tmp.cleanup()
+
+    def test_nested(self):
+        """
+        test that nested stages are named by their path and record the counters incremented inside them
+        :return:
+        """
+        with instrument.stage('features', season=20192020):
+            instrument.count('games_processed', 2)
+            with instrument.stage('rolling_teams'):
+                instrument.count('games_processed', 3)
+
+        with open(self.path) as f:
+            lines = [json.loads(line) for line in f]
+
+        self.assertEqual([r['stage'] for r in lines], ['features/rolling_teams', 'features'])
+        self.assertEqual(lines[0]['counters'], {'games_processed': 3})
+        self.assertEqual(lines[1]['counters'], {'games_processed': 5})
+        self.assertEqual(lines[1]['season'], 20192020)
+        self.assertEqual(lines[1]['status'], 'ok')
+        self.assertGreaterEqual(lines[1]['wall_s'], lines[0]['wall_s'])
+
+    def test_error(self):
+        """
+        test that a stage that raises is recorded with an error status
+        :return:
+        """
+        with self.assertRaises(ValueError):
+            with instrument.stage('train'):
+                raise ValueError('no games')
+
+        self.assertEqual(instrument.records()[-1]['status'], 'error')
+
+    def test_memory(self):
+        """
+        test that the peak memory of a nested stage is included in the peak of the enclosing stage
+        :return:
+        """
+        instrument.configure(trace_memory=True)
+        with instrument.stage('outer'):
+            with instrument.stage('inner'):
+                data = bytearray(8 * 2 ** 20)
+            del data
+
+        inner, outer = instrument.records()[-2:]
+        self.assertGreaterEqual(inner['peak_mb'], 8)
+        self.assertGreaterEqual(outer['peak_mb'], inner['peak_mb'])
+
+    def test_profile(self):
+        """
+        test that a profiled stage saves its profile
+        :return:
+        """
+        instrument.configure(profiler='cprofile', profile_stages=['inner'], profile_dir=self.tmp.name)
+        with instrument.stage('outer'):
+            with instrument.stage('inner'):
+                sum(range(1000))
+
+        inner, outer = instrument.records()[-2:]
+        self.assertTrue(os.path.exists(inner['profile']))
+        self.assertNotIn('profile', outer)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+from nhl_mlmodel.metrics import metrics
+import numpy as np
+import unittest
+
+class TestBrierScore(unittest.TestCase):
+    def test_groups(self):
+        """
+        test the brier score of two models over two groups
+        :return:
+        """
+        y = [True, False, True, False]
+        proba = np.array([[1.0, 0.5], [0.0, 0.5], [0.5, 1.0], [0.5, 1.0]])
+        result = metrics.brier_score(y, proba, groups=['a', 'a', 'b', 'b'])
+        np.testing.assert_allclose(result, [[0.0, 0.25], [0.25, 0.5]])
+
+class TestReliabilityBins(unittest.TestCase):
+    def test_bins(self):
+        """
+        test the mean probability and fraction of positives of each bin
+        :return:
+        """
+        mean_predicted, fraction_positive, counts = metrics.reliability_bins([1, 0, 1, 1], [0.1, 0.2, 0.8, 0.9],
+                                                                             n_bins=2)
+        np.testing.assert_allclose(mean_predicted[0, 0], [0.15, 0.85])
+        np.testing.assert_allclose(fraction_positive[0, 0], [0.5, 1.0])
+        np.testing.assert_array_equal(counts[0, 0], [2, 2])
+
+class TestExpectedCalibrationError(unittest.TestCase):
+    def test_perfect(self):
+        """
+        test that probabilities matching the outcome frequency have no calibration error
+        :return:
+        """
+        result = metrics.expected_calibration_error([1, 0, 1, 0], [0.5, 0.5, 0.5, 0.5], n_bins=10)
+        self.assertAlmostEqual(result, 0.0)
+
+class TestBootstrapCi(unittest.TestCase):
+    def test_chunks(self):
+        """
+        test that the interval does not depend on the chunk size and matches resampling one sample at a time
+        :return:
+        """
+        rng = np.random.default_rng(0)
+        y = rng.integers(0, 2, 300)
+        proba = rng.uniform(0, 1, (300, 3))
+        low, high = metrics.bootstrap_ci(y, proba, n_boot=500)
+
+        samples = np.random.default_rng(42).integers(0, 300, size=(500, 300))
+        losses = (proba - y[:, None]) ** 2
+        means = np.stack([losses[s].mean(axis=0) for s in samples])
+        np.testing.assert_allclose(low, np.quantile(means, 0.025, axis=0))
+        np.testing.assert_allclose(high, np.quantile(means, 0.975, axis=0))
+        for chunk_size in [1, 7, 500, 1000]:
+            result = metrics.bootstrap_ci(y, proba, n_boot=500, chunk_size=chunk_size)
+            np.testing.assert_allclose(result, (low, high))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import json
+from nhl_mlmodel.model_server import model_server
+import numpy as np
+import os
+import pandas as pd
+import pickle
+import tempfile
+from tests import fixtures
+import unittest
+import xgboost as xgb
+
+FEATURES = ['teams_goals_10_avg_diff', 'goalies_saves_20_std_diff', 'home_rest']
+
+def train_tiny_booster(df):
+    '''trains a small booster with early stopping on the first 200 games'''
+    dtrain = xgb.DMatrix(df[FEATURES][:200], label=df.home_team_win[:200])
+    dvalid = xgb.DMatrix(df[FEATURES][200:], label=df.home_team_win[200:])
+    return xgb.train({'objective': 'binary:logistic', 'max_depth': 2, 'eta': 0.3}, dtrain, num_boost_round=50,
+                     evals=[(dvalid, 'valid')], early_stopping_rounds=5, verbose_eval=False)
+
+class TestModelServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.df = fixtures.make_games_df()
+        self.booster = train_tiny_booster(self.df)
+        self.model_path = os.path.join(self.tmp.name, 'model.ubj')
+        model_server.export_booster(self.booster, self.model_path)
+
+    def tearDown(self):
+        model_server._servers.clear()
+        self.tmp.cleanup()
+
+    def test_feature_matrix(self):
+        """
+        test that the feature matrix follows the model feature order whatever the column order of the dataframe
+        :return:
+        """
+        server = model_server.ModelServer(self.model_path)
+        shuffled = self.df[['home_team_win', 'home_rest', 'game_id', 'home_team', 'goalies_saves_20_std_diff',
+                            'teams_goals_10_avg_diff']]
+        result = server.feature_matrix(shuffled)
+        self.assertEqual(result.dtype, np.float32)
+        np.testing.assert_array_equal(result, self.df[FEATURES].to_numpy(dtype=np.float32))
+    def test_predict(self):
+        """
+        test that the probabilities derived from the margin match booster.predict up to the best iteration
+        :return:
+        """
+        server = model_server.ModelServer(self.model_path)
+        home_win, home_win_percent = server.predict(self.df.iloc[:, ::-1])
+        expected = self.booster.predict(xgb.DMatrix(self.df[FEATURES]),
+                                        iteration_range=(0, self.booster.best_iteration + 1))
+        np.testing.assert_allclose(home_win_percent, expected, rtol=1e-5)
+        np.testing.assert_array_equal(home_win, expected > 0.5)
+    def test_get_server(self):
+        """
+        test that get_server keeps the loaded server until the model or its schema is replaced
+        :return:
+        """
+        server = model_server.get_server(self.model_path)
+        self.assertIs(model_server.get_server(self.model_path), server)
+
+        # a new schema listing the same features, with a later modification time
+        path = model_server.schema_path(self.model_path)
+        with open(path) as f:
+            schema = json.load(f)
+        with open(path, 'w') as f:
+            json.dump(dict(schema, trained_through='2021-01-01'), f)
+        os.utime(path, (server.mtime[1] + 10, server.mtime[1] + 10))
+        reloaded = model_server.get_server(self.model_path)
+        self.assertIsNot(reloaded, server)
+
+        os.utime(self.model_path, (server.mtime[0] + 10, server.mtime[0] + 10))
+        self.assertIsNot(model_server.get_server(self.model_path), reloaded)
+
+class TestExportBooster(unittest.TestCase):
+    def test_round_trip(self):
+        """
+        test that the feature names, feature types and best iteration survive a .json and .ubj round trip and that
+        the exported model predicts the same probabilities as the pickled model
+        :return:
+        """
+        df = fixtures.make_games_df()
+        model = xgb.XGBClassifier(n_estimators=50, max_depth=2, learning_rate=0.3, early_stopping_rounds=5)
+        model.fit(df[FEATURES][:200], df.home_team_win[:200], eval_set=[(df[FEATURES][200:],
+                                                                          df.home_team_win[200:])], verbose=False)
+        expected = model.predict_proba(df[FEATURES])[:, 1]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            pickle_path = os.path.join(tmp, 'model.pkl')
+            with open(pickle_path, 'wb') as f:
+                pickle.dump(model, f)
+            np.testing.assert_allclose(model_server.ModelServer(pickle_path).predict(df)[1], expected, rtol=1e-5)
+
+            for extension in ['.json', '.ubj']:
+                model_path = os.path.join(tmp, 'model' + extension)
+                model_server.export_booster(model, model_path, metadata={'trained_through': '2021-01-01',
+                                                                          'params': {'max_depth': 2}})
+                booster, schema = model_server.load_booster(model_path)
+
+                self.assertEqual(booster.feature_names, FEATURES)
+                self.assertEqual(booster.feature_types, model.get_booster().feature_types)
+                self.assertEqual(schema['best_iteration'], model.best_iteration)
+                self.assertEqual(schema['trained_through'], '2021-01-01')
+                self.assertEqual(model_server.model_features(model_path), FEATURES)
+                self.assertEqual(model_server.model_params(model_path), {'max_depth': 2})
+
+                server = model_server.ModelServer(model_path)
+                self.assertEqual(server.iteration_range, (0, model.best_iteration + 1))
+                np.testing.assert_allclose(server.predict(df)[1], expected, rtol=1e-5)
+
+if __name__ == '__main__':
+    unittest.main()
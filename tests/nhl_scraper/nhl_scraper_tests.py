@@ -0,0 +1,106 @@
+import json
+from nhl_mlmodel.nhl_scraper import nhl_scraper
+import unittest
+from unittest import mock
+
+def skater_stats(goals):
+    '''returns the teamSkaterStats of one team'''
+    return {'goals': goals, 'pim': 6, 'shots': 30, 'powerPlayPercentage': '50.0', 'powerPlayGoals': 1.0,
+            'powerPlayOpportunities': 2.0, 'faceOffWinPercentage': '52.1', 'blocked': 12, 'takeaways': 7,
+            'giveaways': 9, 'hits': 20}
+
+def boxscore_team(abbreviation, goals, goalie_ids):
+    '''returns one team of the boxscore with its goalies'''
+    players = {f'ID{i}': {'person': {'id': i, 'fullName': f'Goalie {i}'}, 'position': {'code': 'G'},
+                          'stats': {'goalieStats': {'timeOnIce': '60:00', 'saves': 28, 'shots': 30}}}
+               for i in goalie_ids}
+    return {'team': {'id': goals, 'abbreviation': abbreviation}, 'teamStats': {'teamSkaterStats': skater_stats(goals)},
+            'goalies': goalie_ids, 'players': players}
+
+GAME_ID = 2019020001
+BOXSCORE = {'teams': {'home': boxscore_team('TOR', 5, [1, 2]), 'away': boxscore_team('OTT', 3, [3])}}
+LINESCORE = {'hasShootout': False, 'shootoutInfo': {'home': {'scores': 0}, 'away': {'scores': 0}}}
+TEAMS = {side: BOXSCORE['teams'][side]['team'] for side in ['home', 'away']}
+FEED = {'gameData': {'datetime': {'dateTime': '2019-10-02T23:00:00Z'}, 'teams': TEAMS},
+        'liveData': {'plays': {'allPlays': [{'result': {'event': 'Goal'}}] * 50}, 'linescore': LINESCORE,
+                     'boxscore': BOXSCORE}}
+SCHEDULE = {'dates': [{'games': [{'gamePk': GAME_ID, 'gameDate': '2019-10-02T23:00:00Z', 'linescore': LINESCORE,
+                                  'teams': {'home': {'team': TEAMS['home']}, 'away': {'team': TEAMS['away']}}}]}]}
+
+class FakeSession:
+    '''serves the documents of one game and keeps the requested urls'''
+    def __init__(self):
+        self.urls = []
+    def get(self, url):
+        self.urls.append(url)
+        if url == nhl_scraper.FEED_URL.format(GAME_ID):
+            document = FEED
+        elif url == nhl_scraper.BOXSCORE_URL.format(GAME_ID):
+            document = BOXSCORE
+        elif url.startswith(nhl_scraper.GAME_SCHEDULE_URL.format(GAME_ID)):
+            document = SCHEDULE
+        else:
+            raise ValueError(url)
+        return mock.Mock(content=json.dumps(document).encode())
+
+class TestFetchGame(unittest.TestCase):
+    def scrape(self, scraper, mode, *args):
+        '''runs a scraper with the fake session and returns the result and the requested urls'''
+        session = FakeSession()
+        with mock.patch.object(nhl_scraper, 'make_session', return_value=session):
+            result = scraper(GAME_ID, *args, mode=mode)
+        return result, session.urls
+
+    def test_same_records(self):
+        """
+        test that the boxscore mode creates the same teams, goalies and games as the feed mode
+        :return:
+        """
+        scrapers = [(nhl_scraper.scrape_team_stats,), (nhl_scraper.scrape_goalie_stats,),
+                    (nhl_scraper.scrape_game_info,), (nhl_scraper.retrieve_team, True),
+                    (nhl_scraper.retrieve_date,)]
+        for scraper, *args in scrapers:
+            feed, _ = self.scrape(scraper, 'feed', *args)
+            boxscore, urls = self.scrape(scraper, 'boxscore', *args)
+            if isinstance(feed, list):
+                feed, boxscore = [vars(r) for r in feed], [vars(r) for r in boxscore]
+            elif hasattr(feed, '__dict__'):
+                feed, boxscore = vars(feed), vars(boxscore)
+            self.assertEqual(feed, boxscore, scraper.__name__)
+            self.assertNotIn(nhl_scraper.FEED_URL.format(GAME_ID), urls)
+    def test_requests(self):
+        """
+        test that the boxscore mode only requests the endpoints holding the parts of a record type
+        :return:
+        """
+        _, urls = self.scrape(nhl_scraper.scrape_team_stats, 'boxscore')
+        self.assertEqual(urls, [nhl_scraper.BOXSCORE_URL.format(GAME_ID),
+                                nhl_scraper.GAME_SCHEDULE_URL.format(GAME_ID) + '&hydrate=linescore'])
+        _, urls = self.scrape(nhl_scraper.scrape_goalie_stats, 'boxscore')
+        self.assertEqual(urls, [nhl_scraper.BOXSCORE_URL.format(GAME_ID), nhl_scraper.GAME_SCHEDULE_URL.format(GAME_ID)])
+        _, urls = self.scrape(nhl_scraper.retrieve_team, 'boxscore', False)
+        self.assertEqual(urls, [nhl_scraper.GAME_SCHEDULE_URL.format(GAME_ID) + '&hydrate=team'])
+    def test_unknown_mode(self):
+        """
+        test that an unknown fetch mode raises a ValueError
+        :return:
+        """
+        with self.assertRaises(ValueError):
+            nhl_scraper.fetch_game(GAME_ID, 'team_stats', 'plays', session=FakeSession())
+
+class TestMakeSession(unittest.TestCase):
+    def test_retry(self):
+        """
+        test that both schemes retry connections, reads and server errors and keep the requested pool size
+        :return:
+        """
+        session = nhl_scraper.make_session(pool_maxsize=16)
+        for prefix in ['http://', 'https://']:
+            adapter = session.get_adapter(prefix + 'statsapi.web.nhl.com')
+            self.assertEqual((adapter.max_retries.connect, adapter.max_retries.read, adapter.max_retries.status),
+                             (3, 3, 3))
+            self.assertIn(503, adapter.max_retries.status_forcelist)
+            self.assertEqual(adapter._pool_maxsize, 16)
+
+if __name__ == '__main__':
+    unittest.main()
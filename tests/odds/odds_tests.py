@@ -0,0 +1,90 @@
+from nhl_mlmodel.covers_scraper import covers_scraper
+import datetime as dt
+from nhl_mlmodel.odds import odds
+import numpy as np
+import pandas as pd
+import tempfile
+import unittest
+
+class TestConversions(unittest.TestCase):
+    def test_implied_probability(self):
+        """
+        test the implied probability of favourites, underdogs and tossups
+        :return:
+        """
+        np.testing.assert_allclose(odds.implied_probability([-150, 130, 100]), [0.6, 100 / 230, 0.5])
+
+    def test_round_trip(self):
+        """
+        test that american odds survive a conversion to decimal odds and back
+        :return:
+        """
+        moneyline = np.array([-250, -110, 100, 145])
+        np.testing.assert_allclose(odds.decimal_to_american(odds.american_to_decimal(moneyline)), moneyline)
+
+class TestSportsbookBaseline(unittest.TestCase):
+    def setUp(self):
+        date = dt.datetime(2019, 1, 5)
+        self.games = [covers_scraper.NhlGame(date, '1', 'TOR', 'MTL', '-150', '4', '2'),
+                      covers_scraper.NhlGame(date, '2', 'BOS', 'NYR', '120', '1', '3'),
+                      covers_scraper.NhlGame(date, '3', 'CGY', 'EDM', '100', '2', '1'),
+                      covers_scraper.NhlGame(date, '4', 'VAN', 'SEA', '', '', '')]
+
+    def test_games_to_frame(self):
+        """
+        test that missing moneylines and scores become NA
+        :return:
+        """
+        df = odds.games_to_frame(self.games)
+        self.assertEqual(str(df['home_ml'].dtype), 'Int32')
+        self.assertTrue(df['home_ml'].isna().iloc[3])
+        self.assertTrue(df['home_score'].isna().iloc[3])
+
+    def test_baseline(self):
+        """
+        test that games without odds or a score and tossups are excluded
+        :return:
+        """
+        baseline_df = odds.sportsbook_baseline(odds.games_to_frame(self.games))
+        self.assertEqual(baseline_df['game_id'].tolist(), [1, 2])
+        self.assertEqual(baseline_df['home_team_win'].tolist(), [True, False])
+        self.assertEqual(baseline_df['sb_home_win'].tolist(), [True, False])
+        np.testing.assert_allclose(baseline_df['sb_home_win_percent'], [0.6, 100 / 220])
+
+    def test_store(self):
+        """
+        test that odds read back from the store match the odds written
+        :return:
+        """
+        df = odds.games_to_frame(self.games)
+        with tempfile.TemporaryDirectory() as data_dir:
+            odds.write_odds(df, data_dir)
+            stored = odds.read_odds(data_dir)
+        self.assertEqual(stored['game_id'].tolist(), [1, 2, 3, 4])
+        self.assertTrue(stored['home_ml'].isna().iloc[3])
+
+class TestGameIndex(unittest.TestCase):
+    def test_build_game_index(self):
+        """
+        test that games are matched on the eastern date with normalized abbreviations, including a late
+        west coast game that starts after midnight utc
+        :return:
+        """
+        date = dt.datetime(2019, 1, 5)
+        odds_df = odds.games_to_frame([covers_scraper.NhlGame(date, '10', 'TB', 'MTL', '-150', '4', '2'),
+                                       covers_scraper.NhlGame(date, '11', 'L.A', 'SJ', '110', '1', '3'),
+                                       covers_scraper.NhlGame(date, '12', 'BOS', 'NYR', '120', '1', '3')])
+        games_df = pd.DataFrame({'game_id': [2018020601, 2018020602, 2018020603],
+                                 'date': [dt.datetime(2019, 1, 6, 0, 0), dt.datetime(2019, 1, 6, 3, 30),
+                                          dt.datetime(2019, 1, 7, 0, 0)],
+                                 'home_team': ['TBL', 'LAK', 'BOS'], 'away_team': ['MTL', 'SJS', 'NYR']})
+        index_df = odds.build_game_index(odds_df, games_df)
+        self.assertEqual(index_df['covers_id'].tolist(), [10, 11])
+        self.assertEqual(index_df['game_id'].tolist(), [2018020601, 2018020602])
+
+        attached = odds.attach_odds(games_df, odds_df, index_df)
+        self.assertEqual(attached['home_ml'].tolist()[:2], [-150, 110])
+        self.assertTrue(attached['home_ml'].isna().iloc[2])
+
+if __name__ == '__main__':
+    unittest.main()
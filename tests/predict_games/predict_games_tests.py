@@ -0,0 +1,72 @@
+from benchmarks import synthetic
+import contextlib
+import datetime as dt
+import io
+from nhl_mlmodel.game_store import game_store
+from nhl_mlmodel.model_server import model_server
+from nhl_mlmodel.predict_games import predict_games
+from nhl_mlmodel.process_data import process_data
+from nhl_mlmodel.storage import storage
+import numpy as np
+import os
+import pandas as pd
+import tempfile
+import unittest
+import xgboost as xgb
+
+FEATURES = ['teams_goals_14_avg', 'teams_goals_41_std', 'goalies_saves_14_avg', 'home_team_rest', 'away_team_rest',
+            'home_win_percent_10_avg', 'away_win_percent_10_avg', 'home_win_percent_82_avg',
+            'away_win_percent_82_avg']
+
+class TestPredictRange(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.team_stats, cls.goalie_stats, cls.games_info = synthetic.make_seasons(3, n_teams=8, seed=3)
+        with contextlib.redirect_stdout(io.StringIO()):
+            cls.games_df = process_data.build_dataframes(cls.team_stats, cls.goalie_stats, cls.games_info)[2]
+
+    def test_training_features(self):
+        """
+        test that the stored games are predicted from the same features the model is trained on, that the
+        predictions are saved and that a model trained on an older version of the features is rejected
+        :return:
+        """
+        start_date, end_date = dt.datetime(2013, 3, 1), dt.datetime(2013, 4, 13)
+        train_df = self.games_df[self.games_df.date < start_date]
+        booster = xgb.train({'objective': 'binary:logistic', 'max_depth': 2},
+                            xgb.DMatrix(train_df[FEATURES], label=train_df.home_team_win), num_boost_round=10)
+
+        with tempfile.TemporaryDirectory() as data_dir:
+            model_path = os.path.join(data_dir, 'xgb_model_opt.ubj')
+            model_server.export_booster(booster, model_path, metadata={'feature_version': 1})
+            conn = game_store.connect(':memory:')
+            with self.assertRaises(ValueError):
+                predict_games.predict_range(start_date, end_date, conn, model_path, data_dir)
+
+            model_server.export_booster(booster, model_path,
+                                        metadata={'feature_version': process_data.FEATURE_VERSION})
+            game_store.upsert_games(conn, self.team_stats, self.goalie_stats, self.games_info)
+
+            # a season backfilled in two ranges keeps the predictions of both
+            with contextlib.redirect_stdout(io.StringIO()):
+                first = predict_games.predict_range(start_date, dt.datetime(2013, 3, 20), conn, model_path, data_dir)
+                second = predict_games.predict_range(dt.datetime(2013, 3, 20), end_date, conn, model_path,
+                                                     data_dir)
+            predictions = pd.concat([first, second], ignore_index=True)
+            saved = storage.read_frame('predictions', data_dir)
+
+        expected_ids = {g.game_id for g in self.games_info if start_date <= g.date < end_date}
+        self.assertEqual(set(predictions.game_id.astype(int)), expected_ids)
+        self.assertGreater(len(first), 0)
+        self.assertEqual(sorted(saved.game_id), sorted(predictions.game_id))
+
+        # the games kept for training get the probabilities the model gives their training features
+        expected_df = self.games_df[self.games_df.date >= start_date]
+        self.assertGreater(len(expected_df), 0)
+        result = predictions.set_index(predictions.game_id.astype(int)).loc[expected_df.game_id.astype(int)]
+        np.testing.assert_allclose(result.xgb_home_win_percent,
+                                   booster.predict(xgb.DMatrix(expected_df[FEATURES])), rtol=1e-5)
+        np.testing.assert_array_equal(result.home_team_win, expected_df.home_team_win.astype(float))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+from nhl_mlmodel.process_data import process_data
+import numpy as np
+import pandas as pd
+from tests import fixtures
+import unittest
+
+def make_games_df():
+    '''returns two synthetic seasons with the object outcome column build_dataframes returns'''
+    df = fixtures.make_games_df(n_seasons=2, first_year=2018)
+    return df.assign(home_team_win=pd.Series(df.home_team_win.tolist(), dtype=object))
+
+class TestParseRollingFeatures(unittest.TestCase):
+    def test_parse(self):
+        """
+        test that stat names containing underscores are parsed and other columns are ignored
+        :return:
+        """
+        columns = ['teams_Shooting_Percent_7_avg', 'teams_goals_82_skew', 'goalies_saves_3_std', 'elo_exp']
+        result = process_data.parse_rolling_features(columns, 'teams')
+        self.assertEqual(result, {('Shooting_Percent', 7, 'avg'), ('goals', 82, 'skew')})
+
+class TestNeedsStats(unittest.TestCase):
+    def test_pdo(self):
+        """
+        test that pdo is only needed when a requested column is a rolling pdo stat
+        :return:
+        """
+        self.assertTrue(process_data.needs_stats(['teams_pdo_14_avg'], 'teams', process_data.PDO_STATS))
+        self.assertFalse(process_data.needs_stats(['teams_goals_14_avg'], 'teams', process_data.PDO_STATS))
+        self.assertTrue(process_data.needs_stats(None, 'teams', process_data.PDO_STATS))
+
+class TestDowncast(unittest.TestCase):
+    def test_dtypes(self):
+        """
+        test that floats become float32, integers the smallest integer type, team codes categoricals and boolean
+        object columns bool
+        :return:
+        """
+        result = process_data.downcast_dtypes(make_games_df())
+        self.assertEqual(result.dtypes.astype(str).to_dict(),
+                         {'game_id': 'int32', 'date': 'datetime64[ns]', 'home_team': 'category',
+                          'away_team': 'category', 'home_team_win': 'bool', 'home_rest': 'int8',
+                          'teams_goals_10_avg_diff': 'float32', 'goalies_saves_20_std_diff': 'float32'})
+    def test_round_trip(self):
+        """
+        test that the downcast values convert back to the original values within float32 precision
+        :return:
+        """
+        df = make_games_df()
+        result = process_data.downcast_dtypes(df)
+        back = result.astype({c: str(t) for c, t in df.dtypes.items() if c != 'home_team_win'})
+        pd.testing.assert_frame_equal(back.drop(columns=['home_team_win']), df.drop(columns=['home_team_win']),
+                                      check_exact=False, rtol=1e-6)
+        self.assertEqual(result.home_team_win.tolist(), df.home_team_win.tolist())
+    def test_verify(self):
+        """
+        test that a model predicts the same probabilities on the float64 and downcast frames, and that a changed
+        frame is rejected
+        :return:
+        """
+        import xgboost as xgb
+
+        df = make_games_df()
+        features = ['home_rest', 'teams_goals_10_avg_diff', 'goalies_saves_20_std_diff']
+        model = xgb.XGBClassifier(n_estimators=20, max_depth=3).fit(df[features], df.home_team_win.astype(bool))
+        downcast_df = process_data.downcast_dtypes(df)
+
+        self.assertLessEqual(process_data.verify_downcast(model, df, downcast_df), 1e-6)
+        self.assertLessEqual(process_data.verify_downcast(model.get_booster(), df, downcast_df), 1e-6)
+        with self.assertRaises(ValueError):
+            process_data.verify_downcast(model, df, downcast_df.assign(teams_goals_10_avg_diff=0.0))
+
+class TestStoreDataframes(unittest.TestCase):
+    def test_outputs(self):
+        """
+        test that the full downcast games_df is pickled, only the requested seasons are rewritten and the downcast
+        is verified against the model
+        :return:
+        """
+        import os
+        import pickle
+        import tempfile
+        import xgboost as xgb
+        from nhl_mlmodel.model_server import model_server
+        from nhl_mlmodel.storage import storage
+
+        df = make_games_df()
+        features = ['home_rest', 'teams_goals_10_avg_diff', 'goalies_saves_20_std_diff']
+        model = xgb.XGBClassifier(n_estimators=20, max_depth=3).fit(df[features], df.home_team_win.astype(bool))
+        small_df = df[['game_id', 'date']]
+
+        with tempfile.TemporaryDirectory() as data_dir:
+            model_path = os.path.join(data_dir, 'xgb_model.ubj')
+            model_server.export_booster(model, model_path)
+            games_df = process_data.store_dataframes(small_df, small_df, df, data_dir, seasons=[20192020],
+                                                     verify_model_path=model_path)
+            with open(os.path.join(data_dir, 'games_df.pkl'), 'rb') as f:
+                pd.testing.assert_frame_equal(pickle.load(f), games_df)
+            self.assertEqual(len(games_df), len(df))
+            stored = storage.read_frame('games_df', data_dir)
+            self.assertEqual(stored.game_id.tolist(), df.game_id[df.date >= pd.Timestamp('2019-09-01')].tolist())
+            self.assertEqual(len(storage.read_frame('teams_df', data_dir)), len(stored))
+
+def make_stats_df(n_games=60, seed=0):
+    '''returns team stats shaped like clean_frames output, two rows per game with a goalie per team'''
+    rng = np.random.default_rng(seed)
+    teams = ['TOR', 'MTL', 'OTT', 'BOS', 'BUF']
+    rows = []
+    for g in range(n_games):
+        home, away = rng.choice(teams, 2, replace=False)
+        date = pd.Timestamp('2019-10-01') + pd.Timedelta(days=g // 2)
+        for team, is_home in [(home, True), (away, False)]:
+            rows.append({'date': date, 'game_id': str(2019020001 + g), 'team': team, 'is_home_team': is_home,
+                         'goalie_id': team + str(rng.integers(2)), 'goals': int(rng.integers(0, 6)),
+                         'shots': float(rng.integers(20, 40))})
+    return pd.DataFrame(rows)
+
+class TestParallelRolling(unittest.TestCase):
+    requested_cols = ['teams_goals_3_avg', 'teams_goals_5_std', 'teams_shots_3_skew', 'goalies_shots_5_avg']
+
+    def test_partitions(self):
+        """
+        test that rolling stats created on a process pool equal the serial calculation in the original row order
+        :return:
+        """
+        df = make_stats_df().sample(frac=1, random_state=1)
+        serial = process_data.rolling_partition(df.copy(), [3, 5], ['goals', 'shots'])
+        parallel = process_data.parallel_rolling(df.copy(), [3, 5], ['goals', 'shots'], n_workers=3)
+        pd.testing.assert_frame_equal(parallel, serial)
+    def test_diff_df(self):
+        """
+        test that get_diff_df gives the same team and goalie differentials with one and several workers
+        :return:
+        """
+        df = make_stats_df()
+        for name, is_goalie in [('teams', False), ('goalies', True)]:
+            serial = process_data.get_diff_df(df.copy(), name, is_goalie=is_goalie,
+                                              requested_cols=self.requested_cols)
+            parallel = process_data.get_diff_df(df.copy(), name, is_goalie=is_goalie, n_workers=2,
+                                                requested_cols=self.requested_cols)
+            pd.testing.assert_frame_equal(parallel, serial)
+            self.assertGreater(serial.drop(columns=['game_id']).notna().sum().min(), 0)
+
+class TestRollingWinPercentage(unittest.TestCase):
+    def test_pregame(self):
+        """
+        test that each team's win percentage only uses that team's earlier games and that unplayed games do not count
+        :return:
+        """
+        df = pd.DataFrame({'home_team': ['TOR', 'MTL', 'TOR', 'MTL', 'TOR', 'TOR'],
+                           'away_team': ['OTT', 'OTT', 'OTT', 'BOS', 'BOS', 'OTT'],
+                           'home_team_win': [True, False, False, True, True, None]})
+        result = process_data.rolling_win_percentage(df, 2)
+        np.testing.assert_array_equal(result.home_win_percent_2_avg, [np.nan, np.nan, np.nan, np.nan, 0.5, 0.5])
+        np.testing.assert_array_equal(result.away_win_percent_2_avg, [np.nan, np.nan, 0.5, np.nan, np.nan, 0.0])
+
+if __name__ == '__main__':
+    unittest.main()
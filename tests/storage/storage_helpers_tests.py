@@ -0,0 +1,42 @@
+import datetime as dt
+from nhl_mlmodel.storage import helpers
+import pandas as pd
+import unittest
+
+class TestSeasonOf(unittest.TestCase):
+    def test_fall_and_spring(self):
+        """
+        test that fall and spring dates map to the same season
+        :return:
+        """
+        data = pd.Series([dt.datetime(2019, 10, 2), dt.datetime(2020, 3, 11)])
+        result = helpers.season_of(data)
+        self.assertEqual(result.tolist(), [20192020, 20192020])
+    def test_late_start(self):
+        """
+        test that the january start of the 2020/2021 season maps to 20202021
+        :return:
+        """
+        data = pd.Series([dt.datetime(2021, 1, 13)])
+        result = helpers.season_of(data)
+        self.assertEqual(result.tolist(), [20202021])
+    def test_bubble_playoffs(self):
+        """
+        test that the august and september 2020 playoff games map to 20192020
+        :return:
+        """
+        data = pd.Series([dt.datetime(2020, 8, 1), dt.datetime(2020, 9, 28), dt.datetime(2019, 9, 30)])
+        result = helpers.season_of(data)
+        self.assertEqual(result.tolist(), [20192020, 20192020, 20192020])
+
+class TestSeasonsBetween(unittest.TestCase):
+    def test_range(self):
+        """
+        test the seasons overlapping a date range
+        :return:
+        """
+        result = helpers.seasons_between(dt.datetime(2018, 1, 1), dt.datetime(2019, 11, 1))
+        self.assertEqual(result, [20172018, 20182019, 20192020])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import datetime as dt
+from nhl_mlmodel.nhl_scraper import nhl_scraper
+from nhl_mlmodel.storage import storage
+import os
+import pandas as pd
+import pickle
+import tempfile
+from tests import fixtures
+import unittest
+
+def make_games_df():
+    '''returns two synthetic games a season over three seasons and a playoff game of the 2020 bubble'''
+    df = fixtures.make_games_df(n_seasons=3, n_teams=2, first_year=2017)
+    df = df.groupby(storage.helpers.season_of(df.date)).head(2)
+    bubble = df.iloc[[-1]].assign(game_id=2019030411, date=pd.Timestamp('2020-08-01'))
+    return pd.concat([df, bubble], ignore_index=True)
+
+class TestFrames(unittest.TestCase):
+    def test_round_trip(self):
+        """
+        test that a frame written by write_frame is read back unchanged in both formats
+        :return:
+        """
+        df = make_games_df()
+        for file_format in storage.EXTENSIONS:
+            with tempfile.TemporaryDirectory() as data_dir:
+                storage.write_frame(df, 'games_df', data_dir, file_format=file_format)
+                result = storage.read_frame('games_df', data_dir, file_format=file_format)
+                pd.testing.assert_frame_equal(result, df)
+                self.assertEqual(sorted(os.listdir(os.path.join(data_dir, 'games_df'))),
+                                 ['season=20172018', 'season=20182019', 'season=20192020'])
+    def test_filters(self):
+        """
+        test that read_frame only loads the requested columns, seasons and dates
+        :return:
+        """
+        df = make_games_df()
+        with tempfile.TemporaryDirectory() as data_dir:
+            storage.write_frame(df, 'games_df', data_dir)
+            result = storage.read_frame('games_df', data_dir, columns=['game_id', 'date'],
+                                        start_date=dt.datetime(2018, 9, 1), end_date=dt.datetime(2019, 12, 1))
+            self.assertEqual(result.columns.tolist(), ['game_id', 'date'])
+            self.assertEqual(result.game_id.tolist(), [2018020001, 2018020002, 2019020001, 2019020002])
+            result = storage.read_frame('games_df', data_dir, seasons=[20192020])
+            self.assertEqual(result.game_id.tolist(), [2019020001, 2019020002, 2019030411])
+    def test_replace_partitions(self):
+        """
+        test that writing a season replaces only that season
+        :return:
+        """
+        df = make_games_df()
+        with tempfile.TemporaryDirectory() as data_dir:
+            storage.write_frame(df, 'games_df', data_dir)
+            storage.write_frame(df[df.game_id == 2019020001].assign(home_team='WPG'), 'games_df', data_dir)
+            result = storage.read_frame('games_df', data_dir)
+            self.assertEqual(result.game_id.tolist(), df.game_id[df.game_id < 2019020000].tolist() + [2019020001])
+            self.assertEqual(result.home_team.tolist()[:-1], df.home_team[:4].tolist())
+            self.assertEqual(result.home_team.tolist()[-1], 'WPG')
+
+    def test_upsert(self):
+        """
+        test that upserting rows of a season keeps the other stored rows of that season and replaces matching keys
+        :return:
+        """
+        df = make_games_df()
+        with tempfile.TemporaryDirectory() as data_dir:
+            storage.upsert_frame(df[df.game_id == 2019020001], 'games_df', data_dir)
+            storage.upsert_frame(df[df.game_id != 2019020001], 'games_df', data_dir)
+            storage.upsert_frame(df[df.game_id == 2019030411].assign(home_team='WPG'), 'games_df', data_dir)
+            result = storage.read_frame('games_df', data_dir)
+        self.assertEqual(result.game_id.tolist(), df.game_id.tolist())
+        self.assertEqual(result.home_team.tolist(), df.home_team.tolist()[:-1] + ['WPG'])
+
+class TestMigratePickles(unittest.TestCase):
+    def test_migrate(self):
+        """
+        test that pickled dataframes and object lists are converted to datasets that read back the same
+        :return:
+        """
+        df = make_games_df()
+        games = [nhl_scraper.NhlGame(game_id=2019020001, date=dt.datetime(2019, 10, 2), home_team='OTT',
+                                     away_team='TOR', home_team_win=False, home_goalie_id=1, away_goalie_id=2,
+                                     home_goalie_name='Goalie 1', away_goalie_name='Goalie 2')]
+        with tempfile.TemporaryDirectory() as data_dir:
+            with open(os.path.join(data_dir, 'games_df.pkl'), 'wb') as f:
+                pickle.dump(df, f)
+            with open(os.path.join(data_dir, 'games_info.pkl'), 'wb') as f:
+                pickle.dump(games, f)
+
+            self.assertEqual(storage.migrate_pickles(data_dir), ['games_df', 'games_info'])
+            pd.testing.assert_frame_equal(storage.read_frame('games_df', data_dir), df)
+            result = storage.frame_to_objects(storage.read_frame('games_info', data_dir), nhl_scraper.NhlGame)
+            self.assertEqual([g.to_dict() for g in result], [g.to_dict() for g in games])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,276 @@
+import contextlib
+import io
+import json
+from nhl_mlmodel.model_server import model_server
+from nhl_mlmodel.process_data import process_data
+from nhl_mlmodel.storage import storage
+from nhl_mlmodel.train_xgb import helpers
+from nhl_mlmodel.train_xgb import train_xgb
+import numpy as np
+import os
+import pandas as pd
+import tempfile
+from tests import fixtures
+import unittest
+from unittest import mock
+
+def make_data(seed=0):
+    '''returns train and valid features and labels of 200 games where the first feature predicts the outcome'''
+    df = make_games_df(seed=seed)[:200]
+    X, y = df[['teams_goals_10_avg_diff', 'home_rest']], df.home_team_win
+    return X[:150], y[:150], X[150:], y[150:]
+
+def make_games_df(n_seasons=1, seed=0):
+    '''returns the synthetic games of 32 teams with a feature that predicts the outcome and the home team rest'''
+    df = fixtures.make_games_df(n_seasons=n_seasons, n_teams=32, seed=seed)
+    return df[['date', 'teams_goals_10_avg_diff', 'home_rest', 'home_team_win']].astype({'home_team_win': int})
+
+class TestParallelSearch(unittest.TestCase):
+    def search(self, data, max_evals, trials_path):
+        '''runs a search on a tiny space with one worker'''
+        from hyperopt import hp
+        space = {'max_depth': hp.quniform('max_depth', 1, 3, 1),
+                 'learning_rate': hp.quniform('learning_rate', 0.1, 0.5, 0.1)}
+        with contextlib.redirect_stdout(io.StringIO()):
+            return train_xgb.parallel_search(space, data, max_evals, n_workers=1, trials_path=trials_path)
+
+    def test_resume(self):
+        """
+        test that a search on the same data resumes from the saved trials
+        :return:
+        """
+        data = make_data()
+        with tempfile.TemporaryDirectory() as tmp:
+            trials_path = os.path.join(tmp, 'xgb_trials.pkl')
+            _, trials = self.search(data, 2, trials_path)
+            first = [t['misc']['vals'] for t in trials.trials]
+
+            params, trials = self.search(data, 3, trials_path)
+            self.assertEqual(len(trials.trials), 3)
+            self.assertEqual([t['misc']['vals'] for t in trials.trials[:2]], first)
+            self.assertIsInstance(params['max_depth'], int)
+    def test_invalidate(self):
+        """
+        test that saved trials are discarded when the games or the features change
+        :return:
+        """
+        data = make_data()
+        with tempfile.TemporaryDirectory() as tmp:
+            trials_path = os.path.join(tmp, 'xgb_trials.pkl')
+            self.search(data, 3, trials_path)
+
+            _, trials = self.search(make_data(seed=1), 2, trials_path)
+            self.assertEqual(len(trials.trials), 2)
+            self.assertNotEqual(train_xgb.data_key(make_data(seed=1)), train_xgb.data_key(data))
+
+            X_train, y_train, X_valid, y_valid = data
+            features = ['teams_goals_10_avg_diff']
+            selected = (X_train[features], y_train, X_valid[features], y_valid)
+            self.assertNotEqual(train_xgb.data_key(selected), train_xgb.data_key(data))
+            _, trials = self.search(selected, 1, trials_path)
+            self.assertEqual(len(trials.trials), 1)
+
+class TestCacheDmatrices(unittest.TestCase):
+    def test_key(self):
+        """
+        test that the cached matrices are reused for the same data and not for other labels or feature names
+        :return:
+        """
+        X_train, y_train, X_valid, y_valid = make_data()
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = train_xgb.cache_dmatrices((X_train, y_train, X_valid, y_valid), tmp)
+            self.assertTrue(all(os.path.exists(p) for p in paths))
+            self.assertEqual(train_xgb.cache_dmatrices((X_train, y_train, X_valid, y_valid), tmp), paths)
+
+            flipped = train_xgb.cache_dmatrices((X_train, 1 - y_train, X_valid, y_valid), tmp)
+            renamed = train_xgb.cache_dmatrices((X_train.rename(columns={'home_rest': 'away_rest'}), y_train,
+                                                 X_valid.rename(columns={'home_rest': 'away_rest'}), y_valid), tmp)
+            self.assertEqual(len({paths, flipped, renamed}), 3)
+            self.assertFalse([f for f in os.listdir(tmp) if f.endswith('.tmp')])
+    def test_same_loss(self):
+        """
+        test that a trial scores the same loss on cached and uncached matrices
+        :return:
+        """
+        data = make_data()
+        params = {'max_depth': 2, 'learning_rate': 0.3}
+        with tempfile.TemporaryDirectory() as tmp:
+            train_xgb.init_worker(data, None)
+            uncached = train_xgb.run_trial(dict(params))
+            train_xgb.init_worker(None, train_xgb.cache_dmatrices(data, tmp))
+            cached = train_xgb.run_trial(dict(params))
+        self.assertEqual(cached, uncached)
+
+class TestTrainBooster(unittest.TestCase):
+    def test_predict_test(self):
+        """
+        test that the tuned learner predicts the test games from the trees up to its best iteration
+        :return:
+        """
+        import xgboost as xgb
+
+        X_train, y_train, X_valid, y_valid = make_data()
+        booster = helpers.train_booster({'learning_rate': 0.3, 'max_depth': 2},
+                                        *helpers.build_dmatrices(X_train, y_train, X_valid, y_valid))
+        self.assertLess(booster.best_iteration + 1, booster.num_boosted_rounds())
+
+        preds, proba = train_xgb.predict_test(booster, X_valid)
+        expected = booster.predict(xgb.DMatrix(X_valid), iteration_range=(0, booster.best_iteration + 1))
+        np.testing.assert_allclose(proba, expected)
+        np.testing.assert_array_equal(preds, (expected > 0.5).astype(int))
+
+def plant_columns(df):
+    '''adds a rescaled copy of the predictive feature and a constant feature the model can never split on'''
+    return df.assign(teams_goals_20_avg_diff=df.teams_goals_10_avg_diff * 2, away_rest=1.0)
+
+class TestSelectFeatures(unittest.TestCase):
+    def fit(self, df):
+        '''trains a booster on all the features of df'''
+        X = df.drop(columns=['date', 'home_team_win'])
+        booster = helpers.train_booster({'max_depth': 3}, *helpers.build_dmatrices(
+            X[:-200], df.home_team_win[:-200], X[-200:], df.home_team_win[-200:]))
+        return booster, X
+
+    def test_prune(self):
+        """
+        test that the constant feature and one of the duplicated features are dropped and the rest keep their order
+        :return:
+        """
+        booster, X = self.fit(plant_columns(make_games_df()))
+        result = train_xgb.select_features(booster, X)
+        self.assertNotIn('away_rest', result)
+        self.assertEqual(len({'teams_goals_10_avg_diff', 'teams_goals_20_avg_diff'} & set(result)), 1)
+        self.assertIn('home_rest', result)
+        self.assertEqual(result, [c for c in X.columns if c in result])
+
+        # without the correlation pruning both copies are kept if the model split on both
+        gain = booster.get_score(importance_type='total_gain')
+        result = train_xgb.select_features(booster, X, max_correlation=1.0)
+        self.assertEqual(set(result), set(gain))
+    def test_no_splits(self):
+        """
+        test that every feature is kept when the booster never split
+        :return:
+        """
+        df = make_games_df().assign(teams_goals_10_avg_diff=1.0, home_rest=2)
+        booster, X = self.fit(df)
+        self.assertEqual(booster.get_score(importance_type='total_gain'), {})
+        self.assertEqual(train_xgb.select_features(booster, X), X.columns.tolist())
+    def test_cutoff(self):
+        """
+        test that the features are cut off once the kept features account for the importance share
+        :return:
+        """
+        booster, X = self.fit(plant_columns(make_games_df()))
+        gain = pd.Series(booster.get_score(importance_type='total_gain')).sort_values(ascending=False)
+        share = gain.iloc[0] / gain.sum()
+        self.assertLess(share, 1)
+        self.assertEqual(train_xgb.select_features(booster, X, importance_share=share / 2), [gain.index[0]])
+        # the feature that crosses the threshold is kept
+        result = train_xgb.select_features(booster, X, max_correlation=1.0, importance_share=share + 1e-6)
+        self.assertEqual(set(result), set(gain.index[:2]))
+    def test_schema(self):
+        """
+        test that train fits the optimized model on the selected features and that its schema lists them
+        :return:
+        """
+        df = plant_columns(make_games_df(n_seasons=3))
+        with tempfile.TemporaryDirectory() as data_dir:
+            storage.write_frame(df, 'games_df', data_dir)
+            with mock.patch.object(train_xgb, 'same_game_comparison', return_value=[]), \
+                    mock.patch.object(train_xgb, 'cal_curve'), contextlib.redirect_stdout(io.StringIO()):
+                booster = train_xgb.train(data_dir, hyperopt_runs=1, n_workers=1)
+            unoptimized = model_server.model_features(os.path.join(data_dir, 'xgb_model_unopt.ubj'))
+            optimized = model_server.model_features(os.path.join(data_dir, 'xgb_model_opt.ubj'))
+        self.assertEqual(unoptimized, ['teams_goals_10_avg_diff', 'home_rest', 'teams_goals_20_avg_diff',
+                                       'away_rest'])
+        self.assertEqual(booster.feature_names, optimized)
+        self.assertNotIn('away_rest', optimized)
+        self.assertEqual(len({'teams_goals_10_avg_diff', 'teams_goals_20_avg_diff'} & set(optimized)), 1)
+
+class TestIncrementalRetrain(unittest.TestCase):
+    features = ['teams_goals_10_avg_diff', 'home_rest']
+    trained_through = pd.Timestamp('2019-12-15')
+
+    def export(self, df, model_path):
+        '''trains and exports a model on the games up to trained_through'''
+        old = df[df.date <= self.trained_through]
+        booster = helpers.train_booster({'max_depth': 2}, *helpers.build_dmatrices(
+            old[self.features][:-50], old.home_team_win[:-50], old[self.features][-50:], old.home_team_win[-50:]))
+        model_server.export_booster(booster[:booster.best_iteration + 1], model_path,
+                                    metadata={'best_iteration': None, 'params': {'max_depth': 2},
+                                              'trained_through': str(self.trained_through),
+                                              'last_full_retrain': str(self.trained_through),
+                                              'feature_version': process_data.FEATURE_VERSION})
+
+    def retrain(self, games_df, new_df, mode):
+        '''exports a model trained on games_df and retrains it on new_df, returns the result and the schema'''
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = os.path.join(tmp, 'xgb_model_opt.ubj')
+            self.export(games_df, model_path)
+            with contextlib.redirect_stdout(io.StringIO()):
+                promoted = train_xgb.incremental_retrain(model_path, new_df, valid_size=200, stop_size=100,
+                                                         mode=mode, full_retrain_days=365)
+            return promoted, model_server.load_booster(model_path)[1]
+
+    def test_promotion(self):
+        """
+        test that a model trained on shuffled outcomes is replaced after training on the new games in both modes
+        :return:
+        """
+        df = make_games_df()
+        shuffled = df.assign(home_team_win=df.home_team_win.sample(frac=1, random_state=0).values)
+        for mode in ['add', 'refresh']:
+            promoted, schema = self.retrain(shuffled, df, mode)
+            self.assertTrue(promoted, mode)
+            self.assertGreater(pd.Timestamp(schema['trained_through']), self.trained_through)
+            self.assertEqual(schema['last_full_retrain'], str(self.trained_through))
+    def test_rejection(self):
+        """
+        test that the saved model is kept when the new games make it worse on the held out games in both modes
+        :return:
+        """
+        df = make_games_df()
+        # flip the outcomes of the new games outside of the early stopping and held out games
+        new = (df.date > self.trained_through) & (df.index < len(df) - 300)
+        flipped = df.assign(home_team_win=np.where(new, 1 - df.home_team_win, df.home_team_win))
+        for mode in ['add', 'refresh']:
+            promoted, schema = self.retrain(df, flipped, mode)
+            self.assertFalse(promoted, mode)
+            self.assertEqual(pd.Timestamp(schema['trained_through']), self.trained_through)
+    def test_full_retrain(self):
+        """
+        test that the model is trained from scratch with the saved parameters once the full retrain is due
+        :return:
+        """
+        df = make_games_df()
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = os.path.join(tmp, 'xgb_model_opt.ubj')
+            self.export(df.assign(home_team_win=df.home_team_win.sample(frac=1, random_state=0).values),
+                        model_path)
+            with contextlib.redirect_stdout(io.StringIO()):
+                promoted = train_xgb.incremental_retrain(model_path, df, valid_size=200, stop_size=100,
+                                                         full_retrain_days=7)
+            schema = model_server.load_booster(model_path)[1]
+        self.assertTrue(promoted)
+        self.assertEqual(schema['last_full_retrain'], schema['trained_through'])
+        self.assertEqual(schema['params'], {'max_depth': 2})
+        self.assertEqual(schema['feature_version'], process_data.FEATURE_VERSION)
+    def test_feature_version(self):
+        """
+        test that a model trained on an older version of the features is not retrained on the new features
+        :return:
+        """
+        df = make_games_df()
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = os.path.join(tmp, 'xgb_model_opt.ubj')
+            self.export(df, model_path)
+            schema = model_server.load_booster(model_path)[1]
+            del schema['feature_version']
+            with open(model_server.schema_path(model_path), 'w') as f:
+                json.dump(schema, f)
+            with self.assertRaises(ValueError):
+                train_xgb.incremental_retrain(model_path, df, valid_size=200, stop_size=100)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import datetime as dt
+from nhl_mlmodel.walk_forward import walk_forward
+import pandas as pd
+import unittest
+
+class TestSeasonWindows(unittest.TestCase):
+    def test_windows(self):
+        """
+        test that each season after the training seasons becomes a window ending at the next season
+        :return:
+        """
+        dates = pd.Series([dt.datetime(2017, 10, 4), dt.datetime(2018, 10, 3), dt.datetime(2019, 10, 2),
+                           dt.datetime(2020, 3, 11)])
+        result = walk_forward.season_windows(dates, min_train_seasons=1)
+        self.assertEqual(result, [(dt.datetime(2018, 10, 3), dt.datetime(2019, 10, 2)),
+                                  (dt.datetime(2019, 10, 2), dt.datetime(2020, 3, 12))])
+    def test_bubble_playoffs(self):
+        """
+        test that the august 2020 playoff games stay in the 20192020 window
+        :return:
+        """
+        dates = pd.Series([dt.datetime(2018, 10, 3), dt.datetime(2019, 10, 2), dt.datetime(2020, 8, 1),
+                           dt.datetime(2021, 1, 13)])
+        result = walk_forward.season_windows(dates, min_train_seasons=1)
+        self.assertEqual(result, [(dt.datetime(2019, 10, 2), dt.datetime(2021, 1, 13)),
+                                  (dt.datetime(2021, 1, 13), dt.datetime(2021, 1, 14))])
+
+class TestDateWindows(unittest.TestCase):
+    def test_skip_empty(self):
+        """
+        test that windows without games are skipped
+        :return:
+        """
+        dates = pd.Series([dt.datetime(2020, 1, 1), dt.datetime(2020, 1, 5), dt.datetime(2020, 1, 25)])
+        result = walk_forward.date_windows(dates, dt.datetime(2020, 1, 2), days=7)
+        self.assertEqual(result, [(dt.datetime(2020, 1, 2), dt.datetime(2020, 1, 9)),
+                                  (dt.datetime(2020, 1, 23), dt.datetime(2020, 1, 30))])
+
+class TestChronologicalSplit(unittest.TestCase):
+    def test_order(self):
+        """
+        test that the test set holds the most recent games
+        :return:
+        """
+        df = pd.DataFrame({'date': pd.date_range('2020-01-01', periods=10)[::-1], 'x': range(10)})
+        train_df, valid_df, test_df = walk_forward.chronological_split(df, valid_size=3, test_size=2)
+        self.assertEqual(len(train_df), 5)
+        self.assertTrue(train_df['date'].max() < valid_df['date'].min())
+        self.assertEqual(test_df['x'].tolist(), [1, 0])
+
+if __name__ == '__main__':
+    unittest.main()